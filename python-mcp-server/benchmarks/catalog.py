@@ -0,0 +1,267 @@
+"""蔬果價格工具在大型合成目錄上的效能測試
+
+產生合成的價格歷史檔（預設 10,000 種產品 × 5 年每日價格），以此啟動
+fruit_price_server，分別直接呼叫工具函數與經由 FastMCP 的分派路徑呼叫，
+量測每秒呼叫次數、p50／p99 延遲與記憶體峰值，結果寫成 JSON 檔以便比較不同版本。
+
+用法：
+    python benchmarks/catalog.py [--products 10000] [--days 1826] [--calls 200] [--output result.json]
+    python benchmarks/catalog.py --compare before.json after.json
+
+合成的歷史檔預設放在暫存目錄並重複使用，產品數與天數相同時不會重新產生。
+"""
+import argparse
+import asyncio
+import gc
+import inspect
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from datetime import date
+from typing import Awaitable, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from price_history import PriceHistoryFile  # noqa: E402
+from price_store import to_epoch_day  # noqa: E402
+
+TOOLS = ("get_price_chart", "compare_prices", "analyze_price_trend", "get_fruit_info", "list_fruits")
+
+
+def product_key(index: int) -> str:
+    return f"p{index:05d}"
+
+
+def generate_catalog(path: str, products: int, days: int, seed: int = 0) -> None:
+    """產生合成的價格歷史檔
+
+    每種產品的價格為從 10～100 元起始的隨機漫步，日期到今天為止。
+    直接寫入價格歷史檔的欄位，不經過逐筆追加。
+    """
+    rng = random.Random(seed)
+    last_day = to_epoch_day(date.today())
+    days_column = array("i", range(last_day - days + 1, last_day + 1))
+    history = PriceHistoryFile(path)
+    try:
+        for i in range(products):
+            slot = history.add(product_key(i), f"商品{i:05d}", "公斤", capacity=days)
+            price = rng.uniform(10, 100)
+            prices = array("d")
+            for _ in range(days):
+                price = max(price * (1 + rng.uniform(-0.03, 0.03)), 1.0)
+                prices.append(round(price, 1))
+            dates_view, prices_view, _ = history.columns(slot)
+            dates_view[:days] = days_column
+            prices_view[:days] = prices
+            history.set_length(slot, days)
+        history.flush()
+    finally:
+        history.close()
+
+
+def ensure_catalog(path: str, products: int, days: int) -> float:
+    """重複使用產品數與天數相符的歷史檔，否則重新產生；回傳產生所花的秒數"""
+    if os.path.exists(path):
+        history = PriceHistoryFile(path)
+        try:
+            slot = history.slot(product_key(products - 1)) if product_key(products - 1) in history else None
+            if len(history) == products and slot is not None and history.length(slot) == days:
+                return 0.0
+        finally:
+            history.close()
+        os.remove(path)
+    start = time.perf_counter()
+    generate_catalog(path, products, days)
+    return time.perf_counter() - start
+
+
+def percentile(samples: List[float], q: int) -> float:
+    if len(samples) < 2:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+def make_calls(server, tool: str, products: int, days: int, rng: random.Random) -> Dict[str, Callable[[], Awaitable]]:
+    """產生一次隨機呼叫：直接呼叫工具函數，以及經由 FastMCP 分派"""
+    first, second = product_key(rng.randrange(products)), product_key(rng.randrange(products))
+    window = rng.choice((7, 30, 365, days))
+    direct: Dict[str, Callable] = {
+        "get_price_chart": lambda: server.get_price_chart(first, window),
+        "compare_prices": lambda: server.compare_prices(first, second, window),
+        "analyze_price_trend": lambda: server.analyze_price_trend(first),
+        "get_fruit_info": lambda: server.get_fruit_info(first),
+        "list_fruits": lambda: server.list_fruits(),
+    }
+    dispatch: Dict[str, Callable] = {
+        "get_price_chart": lambda: server.mcp.call_tool("get_price_chart", {"fruit_name": first, "days": window}),
+        "compare_prices": lambda: server.mcp.call_tool("compare_prices",
+                                                        {"fruit1": first, "fruit2": second, "days": window}),
+        "analyze_price_trend": lambda: server.mcp.call_tool("analyze_price_trend", {"fruit_name": first}),
+        "get_fruit_info": lambda: server.mcp.read_resource(f"fruits://{first}"),
+        "list_fruits": lambda: server.mcp.read_resource("fruits://list"),
+    }
+    return {"direct": direct[tool], "dispatch": dispatch[tool]}
+
+
+async def _call(fn: Callable) -> object:
+    result = fn()
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def run_benchmark(server, tool: str, path: str, options) -> Dict[str, object]:
+    """量測單一工具在單一呼叫路徑上的延遲、每秒呼叫次數與記憶體峰值"""
+    rng = random.Random(f"{tool}/{path}")
+    calls = [make_calls(server, tool, options.products, options.days, rng)[path] for _ in range(options.calls)]
+    for fn in calls[:options.warmup]:
+        await _call(fn)
+
+    latencies = []
+    gc.collect()
+    started = time.perf_counter()
+    for fn in calls:
+        if options.cold:
+            server.REPORTS.clear()
+        start = time.perf_counter()
+        await _call(fn)
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+
+    # 記憶體峰值另外量測，避免 tracemalloc 的額外成本影響延遲
+    tracemalloc.start()
+    for fn in calls[:options.memory_calls]:
+        if options.cold:
+            server.REPORTS.clear()
+        await _call(fn)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "tool": tool,
+        "path": path,
+        "calls": len(latencies),
+        "throughput_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "peak_alloc_kb": round(peak / 1024, 1),
+    }
+
+
+def max_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以 bytes 回報，Linux 以 KB 回報
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+async def run_all(options) -> Dict[str, object]:
+    os.environ["FRUIT_PRICE_HISTORY"] = options.history
+    start = time.perf_counter()
+    import fruit_price_server as server
+    server.load_prices()
+    load_seconds = time.perf_counter() - start
+
+    results = []
+    for tool in options.tools:
+        for path in ("direct", "dispatch"):
+            results.append(await run_benchmark(server, tool, path, options))
+    return {"load_seconds": round(load_seconds, 3), "results": results}
+
+
+def print_results(report: Dict[str, object]) -> None:
+    meta = report["meta"]
+    print(f"合成目錄：{meta['products']} 種產品 × {meta['days']} 天，載入 {report['load_seconds']} 秒，"
+          f"快取：{'每次清除' if meta['cold'] else '保留'}")
+    print("+----------------------+----------+------------+------------+------------+--------------+")
+    print("| 工具                 | 路徑     | 次數/秒    | p50 (ms)   | p99 (ms)   | 記憶體峰值KB |")
+    print("+----------------------+----------+------------+------------+------------+--------------+")
+    for r in report["results"]:
+        print(f"| {r['tool']:20} | {r['path']:8} | {r['throughput_per_s']:10.1f} | {r['p50_ms']:10.3f} | "
+              f"{r['p99_ms']:10.3f} | {r['peak_alloc_kb']:12.1f} |")
+    print("+----------------------+----------+------------+------------+------------+--------------+")
+    if report.get("max_rss_kb") is not None:
+        print(f"行程記憶體峰值：{report['max_rss_kb']} KB")
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """比較兩次結果的 p50、p99 與每秒呼叫次數"""
+    with open(before_path, encoding="utf-8") as f:
+        before = {(r["tool"], r["path"]): r for r in json.load(f)["results"]}
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)["results"]
+
+    def change(old: float, new: float) -> str:
+        return f"{((new / old) - 1) * 100:+9.1f}%" if old else "       --"
+
+    print("+----------------------+----------+------------+------------+------------+")
+    print("| 工具                 | 路徑     | p50 變化   | p99 變化   | 次數/秒變化|")
+    print("+----------------------+----------+------------+------------+------------+")
+    for r in after:
+        old = before.get((r["tool"], r["path"]))
+        if old is None:
+            continue
+        print(f"| {r['tool']:20} | {r['path']:8} | {change(old['p50_ms'], r['p50_ms']):>10} | "
+              f"{change(old['p99_ms'], r['p99_ms']):>10} | "
+              f"{change(old['throughput_per_s'], r['throughput_per_s']):>10} |")
+    print("+----------------------+----------+------------+------------+------------+")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="蔬果價格工具在大型合成目錄上的效能測試")
+    parser.add_argument("--products", type=int, default=10000, help="產品數")
+    parser.add_argument("--days", type=int, default=1826, help="每種產品的天數")
+    parser.add_argument("--calls", type=int, default=200, help="每個工具、每條路徑的呼叫次數")
+    parser.add_argument("--warmup", type=int, default=10, help="不計時的預熱呼叫次數")
+    parser.add_argument("--memory-calls", type=int, default=20, help="量測記憶體峰值的呼叫次數")
+    parser.add_argument("--tools", nargs="+", default=list(TOOLS), choices=TOOLS, help="要量測的工具")
+    parser.add_argument("--cold", action="store_true", help="每次呼叫前清除報告快取，量測實際渲染成本")
+    parser.add_argument("--history", help="合成歷史檔位置，預設為暫存目錄中的檔案")
+    parser.add_argument("--output", help="結果 JSON 檔")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="比較兩個結果 JSON 檔後結束")
+    options = parser.parse_args()
+
+    if options.compare:
+        compare(*options.compare)
+        return 0
+
+    options.history = options.history or os.path.join(
+        tempfile.gettempdir(), f"fruit_catalog_{options.products}x{options.days}.bin")
+    generate_seconds = ensure_catalog(options.history, options.products, options.days)
+
+    report = asyncio.run(run_all(options))
+    report["meta"] = {
+        "products": options.products,
+        "days": options.days,
+        "calls": options.calls,
+        "cold": options.cold,
+        "generate_seconds": round(generate_seconds, 3),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    report["max_rss_kb"] = max_rss_kb()
+    print_results(report)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""蔬果價格服務的啟動效能測試
+
+MCP 客戶端每個工作階段都以 stdio 子行程啟動服務，啟動時間直接延遲每個工作階段。
+此腳本量測兩項指標，各重複數次取中位數與最大值：
+
+- 導入時間：在新的 Python 行程中導入 fruit_price_server 的時間，並檢查是否導入了 matplotlib
+- 首次回應時間：以 stdio 啟動服務、完成初始化並取得第一個工具回應的時間
+
+用法：
+    python benchmarks/startup.py [--runs 5] [--json] [--max-import-ms 1500] [--max-first-response-ms 3000]
+
+超過上限時以非零狀態結束，可在 CI 中捕捉啟動時間的退化。
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(SERVER_DIR, "fruit_price_server.py")
+
+_IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import fruit_price_server
+print(time.perf_counter() - start, "matplotlib" in sys.modules)
+"""
+
+
+def measure_import(env: Dict[str, str]) -> tuple:
+    """在新的行程中導入服務模組，回傳（秒數, 是否導入了 matplotlib）"""
+    output = subprocess.run([sys.executable, "-c", _IMPORT_PROBE], cwd=SERVER_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout.split()
+    return float(output[-2]), output[-1] == "True"
+
+
+async def measure_first_response(env: Dict[str, str], tool: str, arguments: dict) -> tuple:
+    """以 stdio 啟動服務，回傳（完成初始化的秒數, 取得第一個工具回應的秒數）"""
+    start = time.perf_counter()
+    params = StdioServerParameters(command=sys.executable, args=[SERVER], env=env, cwd=SERVER_DIR)
+    async with stdio_client(params, errlog=open(os.devnull, "w")) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            initialized = time.perf_counter() - start
+            result = await session.call_tool(tool, arguments)
+            if result.isError:
+                raise RuntimeError(f"{tool} 回傳錯誤：{result.content}")
+            return initialized, time.perf_counter() - start
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """以毫秒為單位的中位數與最大值"""
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+        "runs_ms": [round(s * 1000, 1) for s in samples],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="量測蔬果價格服務的導入與首次回應時間")
+    parser.add_argument("--runs", type=int, default=5, help="重複次數")
+    parser.add_argument("--tool", default="get_price_chart", help="首次呼叫的工具")
+    parser.add_argument("--args", default='{"fruit_name": "apple"}', help="工具參數（JSON）")
+    parser.add_argument("--history", help="價格歷史檔位置，預設為暫存目錄中的檔案")
+    parser.add_argument("--json", action="store_true", help="以 JSON 輸出結果")
+    parser.add_argument("--max-import-ms", type=float, help="導入時間中位數的上限")
+    parser.add_argument("--max-first-response-ms", type=float, help="首次回應時間中位數的上限")
+    options = parser.parse_args()
+
+    env = dict(os.environ)
+    env["FRUIT_PRICE_HISTORY"] = options.history or os.path.join(tempfile.gettempdir(), "fruit_prices_bench.bin")
+    arguments = json.loads(options.args)
+
+    imports, matplotlib_loaded = [], False
+    initialized, responses = [], []
+    for _ in range(options.runs):
+        seconds, loaded = measure_import(env)
+        imports.append(seconds)
+        matplotlib_loaded |= loaded
+        init_seconds, response_seconds = asyncio.run(measure_first_response(env, options.tool, arguments))
+        initialized.append(init_seconds)
+        responses.append(response_seconds)
+
+    report = {
+        "import": summarize(imports),
+        "initialize": summarize(initialized),
+        "first_response": summarize(responses),
+        "matplotlib_imported_at_startup": matplotlib_loaded,
+    }
+    failures = []
+    if options.max_import_ms is not None and report["import"]["median_ms"] > options.max_import_ms:
+        failures.append(f"導入時間 {report['import']['median_ms']} ms 超過上限 {options.max_import_ms} ms")
+    if options.max_first_response_ms is not None and report["first_response"]["median_ms"] > options.max_first_response_ms:
+        failures.append(f"首次回應時間 {report['first_response']['median_ms']} ms 超過上限 {options.max_first_response_ms} ms")
+
+    if options.json:
+        print(json.dumps({**report, "failures": failures}, ensure_ascii=False, indent=2))
+    else:
+        print(f"啟動效能（{options.runs} 次）：")
+        print("+----------------+----------------+----------------+")
+        print("| 指標           | 中位數 (ms)    | 最大值 (ms)    |")
+        print("+----------------+----------------+----------------+")
+        for label, key in (("導入時間", "import"), ("完成初始化", "initialize"), ("首次工具回應", "first_response")):
+            print(f"| {label:{14 - len(label)}} | {report[key]['median_ms']:14.1f} | {report[key]['max_ms']:14.1f} |")
+        print("+----------------+----------------+----------------+")
+        print(f"啟動時導入 matplotlib：{'是' if matplotlib_loaded else '否'}")
+        for failure in failures:
+            print(f"退化：{failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import io
+import multiprocessing
+import threading
+import warnings
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from report_cache import ReportCache
+
+DEFAULT_MAX_WORKERS = 2
+_EPOCH = date(1970, 1, 1)
+
+# 常見的中文字型，依序嘗試；都沒有時中文字會顯示為方框
+CJK_FONTS = ["Noto Sans CJK TC", "Microsoft JhengHei", "PingFang TC", "Heiti TC", "SimHei", "DejaVu Sans"]
+
+
+def render_png(title: str, dates: Sequence[int], prices: Sequence[float], unit: str = "公斤") -> bytes:
+    """以 matplotlib 繪製價格走勢圖並輸出 PNG
+
+    在繪圖程序中執行，只使用物件導向的 Figure API 與 Agg 後端，不經過 pyplot 的全域狀態。
+
+    Args:
+        title: 圖表標題
+        dates: 日期序列（epoch 天數）
+        prices: 價格序列
+        unit: 價格單位
+
+    Returns:
+        PNG 圖檔內容
+    """
+    from matplotlib import rcParams
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    # 繪圖程序會重複使用，字型設定只需加一次
+    if rcParams["font.sans-serif"][:1] != CJK_FONTS[:1]:
+        rcParams["font.sans-serif"] = CJK_FONTS + list(rcParams["font.sans-serif"])
+        rcParams["axes.unicode_minus"] = False
+
+    fig = Figure(figsize=(8, 4), dpi=100)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot([_EPOCH + timedelta(days=day) for day in dates], prices, linewidth=1.5)
+    ax.set_title(title)
+    ax.set_ylabel(f"元/{unit}")
+    ax.grid(True, alpha=0.3)
+    fig.autofmt_xdate()
+
+    buffer = io.BytesIO()
+    with warnings.catch_warnings():
+        # 缺少中文字型時的 Glyph missing 警告
+        warnings.simplefilter("ignore", UserWarning)
+        fig.tight_layout()
+        fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+class ChartRenderer:
+    """在程序池中繪製圖表，依（鍵值, 資料版本）快取並合併同時的相同請求
+
+    - 快取命中時直接回傳已完成的 Future
+    - 同一張圖已在繪製中時，後來的請求共用同一個 Future，只繪製一次
+    - 繪製完成後存入快取並移出進行中的列表
+    - 準備資料點之前可先以 lookup() 查詢快取與進行中的請求，命中時不必準備
+
+    程序池在第一次繪圖時才建立，採用 spawn 方式啟動，不複製伺服器的執行緒狀態。
+    """
+
+    def __init__(self, cache: Optional[ReportCache] = None, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.cache = cache if cache is not None else ReportCache(max_entries=128)
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[Tuple[Hashable, Hashable], Future] = {}
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.coalesced = 0
+
+    def lookup(self, key: Hashable, version: Hashable) -> Optional[Future]:
+        """已快取或正在繪製的圖表，都沒有時回傳 None
+
+        Returns:
+            結果為 PNG 圖檔內容的 Future，或 None
+        """
+        with self._lock:
+            return self._lookup(key, version)
+
+    def _lookup(self, key: Hashable, version: Hashable) -> Optional[Future]:
+        cached = self.cache.get(key, version)
+        if cached is not None:
+            future: Future = Future()
+            future.set_result(cached)
+            return future
+        future = self._inflight.get((key, version))
+        if future is not None:
+            self.coalesced += 1
+        return future
+
+    def submit(self, key: Hashable, version: Hashable, title: str, dates: List[int], prices: List[float],
+               unit: str = "公斤") -> Future:
+        """提交繪圖請求
+
+        Args:
+            key: 圖表的快取鍵（如蔬果鍵值與天數）
+            version: 圖表所依據資料的版本
+            title, dates, prices, unit: 傳給 render_png 的參數
+
+        Returns:
+            結果為 PNG 圖檔內容的 Future
+        """
+        with self._lock:
+            future = self._lookup(key, version)
+            if future is not None:
+                return future
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            future = self._pool.submit(render_png, title, dates, prices, unit)
+            self._inflight[(key, version)] = future
+            self.renders += 1
+        future.add_done_callback(lambda done: self._finish(key, version, done))
+        return future
+
+    def _finish(self, key: Hashable, version: Hashable, future: Future) -> None:
+        # 先存入快取再移出進行中的列表，中間不會有請求兩邊都落空而重繪
+        with self._lock:
+            if not future.cancelled() and future.exception() is None:
+                self.cache.put(key, version, future.result())
+            self._inflight.pop((key, version), None)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        """繪圖與合併次數、進行中的請求數"""
+        with self._lock:
+            return {"renders": self.renders, "coalesced": self.coalesced, "inflight": len(self._inflight)}
@@ -1,104 +1,252 @@
 from mcp.server.fastmcp import FastMCP, Context, Image
+import asyncio
+import importlib.util
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 import random
 import io
-from typing import Dict, List, Optional
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import sys
 import urllib.parse  # 添加 URL 解碼庫
+from operator import sub
+import price_compare
+import price_ingest
+from chart_render import ChartRenderer
+from market_index import DIRECTIONS, SCREEN_METRICS, MarketIndex
+from name_index import NameIndex
+from price_analytics import PriceAnalysis, analyze, analyze_window, count_around_mean, describe_trend
+from price_payload import analysis_payload, dumps, forecast_payload, points_payload
+from price_stats import RangeStats, WindowStats
+from price_store import PriceSeries, PriceStore, from_epoch_day, parse_period, to_epoch_day
+from report_cache import ReportCache
+from table_render import iter_comparison_table, iter_price_table, iter_rollup_table, render, sample_indices
+from tool_metrics import Metrics
+from tool_pool import ToolPool
 
-# 嘗試導入 matplotlib，但提供備選方案
-try:
-    import matplotlib.pyplot as plt
-    MATPLOTLIB_AVAILABLE = True
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
-    print("警告：未安裝 matplotlib，將使用文字圖表替代")
+# 只檢查 matplotlib 是否已安裝，不在啟動時導入（導入需要數百毫秒），
+# 繪圖程序第一次繪圖時才導入；未安裝時 get_price_chart 只提供表格版
+MATPLOTLIB_AVAILABLE = importlib.util.find_spec("matplotlib") is not None
 
 # 創建一個 MCP 服務器
 mcp = FastMCP("蔬果價格查詢")
 
+# get_price_history 每頁的預設與最大筆數
+HISTORY_PAGE_SIZE = 100
+MAX_HISTORY_PAGE_SIZE = 1000
+
+# compare_many 最多比較的蔬果數，以及列出完整相關係數矩陣的上限
+MAX_COMPARE_FRUITS = 50
+MAX_MATRIX_FRUITS = 10
+
+# screen_market 最多顯示的蔬果數
+MAX_SCREEN_RESULTS = 100
+
+# 超過此天數的區間以週彙總選取表格的採樣點並附上月度彙總；PNG 圖的點數上限
+LONG_VIEW_DAYS = 365
+MAX_ROLLUP_ROWS = 12
+MAX_CHART_POINTS = 720
+
+# forecast_price 最多預測的天數；報告中的預測摘要看 7 天後，變化小於 2% 視為持平
+MAX_FORECAST_HORIZON = 90
+FORECAST_SUMMARY_DAYS = 7
+FORECAST_FLAT_PERCENT = 2
+WEEKDAYS = ("週一", "週二", "週三", "週四", "週五", "週六", "週日")
+
+# get_price_chart、compare_prices、analyze_price_trend 與 fruits:// 資源的輸出格式
+OUTPUTS = ("text", "json")
+# JSON 輸出的價格點以 LTTB 降採樣到此點數
+MAX_JSON_POINTS = 100
+
 # 模擬價格數據
 FRUITS = {
     "apple": {
         "zh_name": "蘋果",
         "current_price": 35.5,  # 每公斤價格（台幣）
         "unit": "公斤",
-        "prices": []  # 最近 30 天的價格將在初始化時生成
+        "aliases": ["pingguo"],  # 其他名稱（拼音等），繁簡體與英文複數會自動處理
     },
     "banana": {
         "zh_name": "香蕉",
         "current_price": 28.0,  # 每公斤價格（台幣）
         "unit": "公斤",
-        "prices": []  # 最近 30 天的價格將在初始化時生成
+        "aliases": ["xiangjiao"],
     }
 }
 
-# 創建中文名稱到英文名稱的映射
-ZH_TO_EN = {
-    "蘋果": "apple",
-    "苹果": "apple",  # 簡體字也支援
-    "香蕉": "banana"
-}
+# 各工具與資源的延遲、錯誤次數與回應大小，可讀取 metrics://summary 或 metrics://prometheus
+METRICS = Metrics("蔬果價格查詢")
+
+# 已渲染報告的快取，鍵中包含資料版本，價格變動後自動失效
+REPORTS = ReportCache()
+
+# PNG 走勢圖在程序池中繪製，依（蔬果, 天數, 資料版本）快取
+CHARTS = ChartRenderer(max_workers=int(os.environ.get("FRUIT_CHART_WORKERS", "2")))
+
+# 報告在執行緒池中渲染，不阻塞事件迴圈；快取命中與名稱解析仍在事件迴圈中直接完成。
+# FRUIT_TOOL_MODE=inline 則直接在事件迴圈中渲染；FRUIT_TOOL_WORKERS 為執行緒數；
+# FRUIT_TOOL_LIMITS（如 compare_many=2,screen_market=1）設定各工具同時執行的上限
+TOOL_LIMITS = {"compare_many": 2, "screen_market": 2, "list_fruits": 1}
+POOL = ToolPool.from_env("FRUIT_TOOL", limits=TOOL_LIMITS)
+
+# 市場篩選的各指標索引，價格變動時只重新計算有變動的蔬果
+MARKET = MarketIndex()
+
+# 名稱解析索引：英文、中文（繁簡體皆可）、拼音與英文複數都對應到英文鍵值，
+# 在蔬果清單確定後一次建立
+NAMES = NameIndex()
 
-# 生成過去 30 天的價格數據
-for fruit in FRUITS.values():
-    base_price = fruit["current_price"]
-    today = datetime.now()
+# 價格歷史：每種蔬果一組連續的日期欄與價格欄，存放在價格歷史檔中。
+# 以記憶體映射方式載入，多個服務行程共用同一份頁面快取；
+# 將 FRUIT_PRICE_HISTORY 設為空字串則只保存在記憶體中。
+HISTORY_PATH = os.environ.get(
+    "FRUIT_PRICE_HISTORY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fruit_prices.bin"),
+)
+
+# 多行程部署：一個 writer 行程負責寫入價格，其餘 reader 行程以唯讀方式映射同一個
+# 價格歷史檔，每 FRUIT_REFRESH_INTERVAL 秒檢查檔頭序號，載入 writer 新增的產品與價格
+WORKER_ROLES = ("writer", "reader")
+WORKER_ROLE = os.environ.get("FRUIT_WORKER_ROLE", "writer")
+if WORKER_ROLE not in WORKER_ROLES:
+    raise ValueError(f"不支援的 FRUIT_WORKER_ROLE：{WORKER_ROLE}（可用 {'、'.join(WORKER_ROLES)}）")
+REFRESH_INTERVAL = float(os.environ.get("FRUIT_REFRESH_INTERVAL", "1"))
+
+# 價格儲存在第一次存取時才由 load_prices 建立，啟動時不開啟檔案也不生成數據
+PRICES: Optional[PriceStore] = None
+_LOAD_LOCK = threading.Lock()
+
+def load_prices() -> PriceStore:
+    """取得價格儲存，第一次呼叫時載入價格歷史檔、生成模擬數據並建立名稱索引
     
-    # 為每一天生成價格
-    for i in range(30):
-        day = today - timedelta(days=29-i)
-        # 隨機波動，但保持在 ±15% 範圍內
-        price = base_price * (1 + random.uniform(-0.15, 0.15))
-        fruit["prices"].append({
-            "date": day.strftime("%Y-%m-%d"),
-            "price": round(price, 1)
-        })
+    Returns:
+        價格儲存
+    """
+    global PRICES
+    if PRICES is not None:
+        return PRICES
+    with _LOAD_LOCK:
+        if PRICES is None:
+            PRICES = _open_prices()
+    return PRICES
+
+def _open_prices() -> PriceStore:
+    if WORKER_ROLE == "reader":
+        return _open_reader_prices()
+    prices = PriceStore.open(HISTORY_PATH) if HISTORY_PATH else PriceStore()
+    
+    # 載入價格歷史檔中記錄、但不在內建清單中的蔬果
+    for key, zh_name, unit in prices.metadata():
+        if key not in FRUITS:
+            FRUITS[key] = {"zh_name": zh_name or key, "current_price": 0.0, "unit": unit or "公斤"}
+    
+    # 已有歷史的蔬果以最後一筆為目前價格，沒有歷史的生成過去 30 天的價格數據；
+    # 價格歷史檔中尚未寫入價格的蔬果沒有基準價格，不生成數據
+    for key, fruit in FRUITS.items():
+        series = prices.create(key, fruit["zh_name"], fruit["unit"])
+        if len(series):
+            fruit["current_price"] = series.last_price
+            continue
+        
+        base_price = fruit["current_price"]
+        if not base_price:
+            continue
+        today = to_epoch_day(datetime.now())
+        
+        # 為每一天生成價格
+        for i in range(29):
+            # 隨機波動，但保持在 ±15% 範圍內
+            price = base_price * (1 + random.uniform(-0.15, 0.15))
+            series.append(today - 29 + i, round(price, 1))
+        
+        # 確保最後一天的價格是當前價格
+        series.append(today, base_price)
     
-    # 確保最後一天的價格是當前價格
-    fruit["prices"][-1]["price"] = base_price
+    for key, fruit in FRUITS.items():
+        NAMES.add(key, fruit["zh_name"], *fruit.get("aliases", ()))
+    return prices
+
+def _open_reader_prices() -> PriceStore:
+    """reader 行程：唯讀映射 writer 建立的價格歷史檔，不生成數據，並啟動定期更新的執行緒"""
+    if not HISTORY_PATH:
+        raise ValueError("reader 行程需要以 FRUIT_PRICE_HISTORY 指定 writer 的價格歷史檔")
+    prices = PriceStore.open(HISTORY_PATH, readonly=True)
+    
+    # 只提供價格歷史檔中已有價格的蔬果；內建清單中尚未寫入的蔬果等 writer 提交價格後再加入
+    for key in [key for key in FRUITS if key not in prices or not len(prices[key])]:
+        del FRUITS[key]
+    for key, fruit in FRUITS.items():
+        NAMES.add(key, fruit["zh_name"], *fruit.get("aliases", ()))
+    _add_fruits(prices, list(prices))
+    
+    threading.Thread(target=_refresh_loop, args=(prices,), name="price-refresh", daemon=True).start()
+    return prices
+
+def _add_fruits(prices: PriceStore, keys: List[str]) -> None:
+    """將價格歷史檔中的蔬果加入清單與名稱索引，並更新目前價格
+
+    writer 新增產品時先寫入索引、之後才提交價格，尚無價格的產品等第一次提交後再加入。
+    """
+    metadata = None
+    for key in keys:
+        series = prices[key]
+        if not len(series):
+            continue
+        fruit = FRUITS.get(key)
+        if fruit is None:
+            if metadata is None:
+                metadata = {key: (zh_name, unit) for key, zh_name, unit in prices.metadata()}
+            zh_name, unit = metadata.get(key, ("", ""))
+            fruit = FRUITS[key] = {"zh_name": zh_name or key, "current_price": 0.0, "unit": unit or "公斤"}
+            NAMES.add(key, fruit["zh_name"])
+        fruit["current_price"] = series.last_price
+
+def _refresh_loop(prices: PriceStore) -> None:
+    # 更新序列時與 ingest_prices 一樣獨佔執行，等候渲染中的報告完成
+    while True:
+        time.sleep(REFRESH_INTERVAL)
+        try:
+            with POOL.lock.write():
+                changed = prices.refresh()
+                if changed:
+                    _add_fruits(prices, changed)
+        except Exception as e:
+            print(f"更新價格歷史失敗：{e}", file=sys.stderr)
 
 # 查找蔬果的輔助函數（支援中英文名稱，包括 URL 編碼處理）
 def get_fruit_key(fruit_name: str) -> str:
     """根據中文或英文名稱獲取英文鍵值
     
     Args:
-        fruit_name: 蔬果名稱（中文或英文，可能是 URL 編碼的）
+        fruit_name: 蔬果名稱（中文、英文或拼音，可能是 URL 編碼的）
     
     Returns:
         英文鍵值或 None
     """
-    # 嘗試 URL 解碼，以支援 URL 編碼的中文名稱
-    try:
-        decoded_name = urllib.parse.unquote(fruit_name)
-        if decoded_name != fruit_name:
-            print(f"解碼 URL 編碼的名稱：{fruit_name} -> {decoded_name}")
-            fruit_name = decoded_name
-    except Exception as e:
-        print(f"URL 解碼失敗：{e}")
-    
-    fruit_name = fruit_name.lower()
-    
-    # 直接匹配英文名稱
-    if fruit_name in FRUITS:
-        return fruit_name
-    
-    # 查找中文名稱映射
-    if fruit_name in ZH_TO_EN:
-        return ZH_TO_EN[fruit_name]
-    
-    return None
+    load_prices()
+    return NAMES.resolve(fruit_name)
+
+# 找不到蔬果時的提示訊息，附上最相近的名稱
+def _not_found_message(fruit_name: str) -> str:
+    suggestions = NAMES.suggest(fruit_name)
+    if not suggestions:
+        return f"找不到 {fruit_name} 的資訊，可讀取 fruits://list 查看所有蔬果"
+    return f"找不到 {fruit_name} 的資訊，您是不是要找：" + "、".join(f"{FRUITS[k]['zh_name']}({k})" for k, _ in suggestions)
 
 # 創建標準表格格式的函數
-def create_table(dates, prices, title="價格表", sample_size=10):
+def create_table(dates, prices, title="價格表", sample_size=10, analysis: Optional[PriceAnalysis] = None,
+                 candidates: Optional[List[int]] = None):
     """創建標準表格格式
     
     Args:
-        dates: 日期列表
-        prices: 價格列表
+        dates: 日期序列（epoch 天數）
+        prices: 價格序列
         title: 表格標題
-        sample_size: 要顯示的數據點數量
+        sample_size: 要顯示的數據點數量，None 表示顯示全部
+        analysis: 同一區間的分析結果，省略時由價格序列計算趨勢
+        candidates: 採樣的候選索引，省略時從全部數據點中選取
         
     Returns:
         表格字符串
@@ -106,46 +254,22 @@ def create_table(dates, prices, title="價格表", sample_size=10):
     if not dates or not prices:
         return "無數據可顯示"
     
-    # 選擇均勻分佈的樣本點
-    sample_indices = []
-    if len(dates) <= sample_size:
-        sample_indices = list(range(len(dates)))
-    else:
-        step = len(dates) / sample_size
-        for i in range(sample_size):
-            sample_indices.append(int(i * step))
-        # 確保包含最後一個點
-        if sample_indices[-1] != len(dates) - 1:
-            sample_indices[-1] = len(dates) - 1
-    
-    # 創建表頭
-    table = f"【{title}】\n"
-    table += "+--------------+--------------+\n"
-    table += "| 日期         | 價格 (元/公斤) |\n"
-    table += "+--------------+--------------+\n"
-    
-    # 添加數據行
-    for i in sample_indices:
-        date = dates[i]
-        price = prices[i]
-        table += f"| {date} | {price:12.1f} |\n"
-    
-    table += "+--------------+--------------+\n"
-    
     # 添加價格趨勢描述
-    price_trend = _get_price_trend_description(prices)
-    table += f"價格趨勢: {price_trend}\n"
-    
-    return table
+    if analysis is not None:
+        price_trend = analysis.trend
+    else:
+        price_trend = describe_trend(RangeStats.build(prices).query(prices, 0, len(prices)))
+    indices = sample_indices(dates, prices, sample_size, candidates)
+    return render(iter_price_table(dates, prices, title, indices, price_trend))
 
 # 創建價格比較表格
 def create_comparison_table(dates, prices1, prices2, fruit1_name, fruit2_name, sample_size=8):
     """創建兩種蔬果價格比較表格
     
     Args:
-        dates: 日期列表
-        prices1: 第一種蔬果價格列表
-        prices2: 第二種蔬果價格列表
+        dates: 日期序列（epoch 天數）
+        prices1: 第一種蔬果價格序列
+        prices2: 第二種蔬果價格序列
         fruit1_name: 第一種蔬果名稱
         fruit2_name: 第二種蔬果名稱
         sample_size: 要顯示的數據點數量
@@ -156,130 +280,68 @@ def create_comparison_table(dates, prices1, prices2, fruit1_name, fruit2_name, s
     if not dates or not prices1 or not prices2:
         return "無數據可顯示"
     
-    # 選擇均勻分佈的樣本點
-    sample_indices = []
-    if len(dates) <= sample_size:
-        sample_indices = list(range(len(dates)))
-    else:
-        step = len(dates) / sample_size
-        for i in range(sample_size):
-            sample_indices.append(int(i * step))
-        # 確保包含最後一個點
-        if sample_indices[-1] != len(dates) - 1:
-            sample_indices[-1] = len(dates) - 1
-    
-    # 創建表頭
-    table = f"【{fruit1_name} vs {fruit2_name} 價格比較】\n"
-    table += "+--------------+--------------+--------------+--------------+\n"
-    table += f"| 日期         | {fruit1_name:12} | {fruit2_name:12} | 差異 (元/公斤) |\n"
-    table += "+--------------+--------------+--------------+--------------+\n"
-    
-    # 添加數據行
-    for i in sample_indices:
-        date = dates[i]
-        price1 = prices1[i]
-        price2 = prices2[i]
-        diff = price1 - price2
-        table += f"| {date} | {price1:12.1f} | {price2:12.1f} | {diff:+12.1f} |\n"
-    
-    table += "+--------------+--------------+--------------+--------------+\n"
-    
-    # 添加總結
     avg_price1 = sum(prices1) / len(prices1)
     avg_price2 = sum(prices2) / len(prices2)
-    avg_diff = avg_price1 - avg_price2
-    
-    table += f"平均價格:       | {avg_price1:12.1f} | {avg_price2:12.1f} | {avg_diff:+12.1f} |\n"
-    table += "+--------------+--------------+--------------+--------------+\n"
-    
-    return table
+    # 依價差的走勢採樣，保留差距擴大與縮小的轉折點
+    indices = sample_indices(dates, list(map(sub, prices1, prices2)), sample_size)
+    return render(iter_comparison_table(dates, prices1, prices2, fruit1_name, fruit2_name,
+                                        indices, avg_price1, avg_price2))
 
-# 價格趨勢的文字描述函數
-def _get_price_trend_description(prices):
-    """根據價格數據提供趨勢描述
+# 長區間的採樣候選點與月度彙總
+def _display_candidates(series: PriceSeries, start: int, stop: int) -> Optional[List[int]]:
+    """超過 LONG_VIEW_DAYS 的區間以每週最後一筆為採樣候選點（相對 start 的索引）
     
-    Args:
-        prices: 價格列表
-        
-    Returns:
-        趨勢描述字符串
+    候選點取自週彙總，LTTB 只需掃過週數而非天數，選出的仍是實際的每日價格。
     """
-    if len(prices) < 2:
-        return "數據不足以分析趨勢"
-    
-    # 計算價格變化
-    changes = []
-    for i in range(1, len(prices)):
-        changes.append(prices[i] - prices[i-1])
-    
-    # 計算上漲、下跌和持平的次數
-    up_count = sum(1 for change in changes if change > 0)
-    down_count = sum(1 for change in changes if change < 0)
-    flat_count = sum(1 for change in changes if change == 0)
-    
-    # 計算起始和結束價格的變化
-    start_price = prices[0]
-    end_price = prices[-1]
-    total_change = end_price - start_price
-    percent_change = (total_change / start_price) * 100
-    
-    # 生成描述
-    description = ""
-    
-    # 總體趨勢
-    if percent_change > 10:
-        description += "大幅上漲"
-    elif percent_change > 5:
-        description += "明顯上漲"
-    elif percent_change > 0:
-        description += "小幅上漲"
-    elif percent_change < -10:
-        description += "大幅下跌"
-    elif percent_change < -5:
-        description += "明顯下跌"
-    elif percent_change < 0:
-        description += "小幅下跌"
-    else:
-        description += "基本持平"
-    
-    description += f" ({percent_change:+.1f}%)"
-    
-    # 波動情況
-    if up_count > 0.7 * len(changes):
-        description += "，持續上漲趨勢"
-    elif down_count > 0.7 * len(changes):
-        description += "，持續下跌趨勢"
-    elif up_count > down_count and up_count > flat_count:
-        description += "，有波動但總體向上"
-    elif down_count > up_count and down_count > flat_count:
-        description += "，有波動但總體向下"
-    else:
-        description += "，波動較大"
-    
-    return description
+    if stop - start <= LONG_VIEW_DAYS:
+        return None
+    return [i - start for i in series.rollup("week").close_indices(start, stop)]
+
+def _monthly_summary(series: PriceSeries, start: int, stop: int, title: str) -> str:
+    """超過 LONG_VIEW_DAYS 的區間附上月度彙總表，以 LTTB 從各月平均價中選出 MAX_ROLLUP_ROWS 個月"""
+    if stop - start <= LONG_VIEW_DAYS:
+        return ""
+    bars = list(series.rollup("month").bars(series.dates[start], series.dates[stop - 1]))
+    indices = sample_indices([bar.start for bar in bars], [bar.mean for bar in bars], MAX_ROLLUP_ROWS)
+    return "\n" + render(iter_rollup_table((bars[i] for i in indices), title, lambda day: from_epoch_day(day)[:7]))
 
 # 獲取蔬果列表的資源
 @mcp.resource("fruits://list")
-def list_fruits() -> str:
+@METRICS.resource
+async def list_fruits() -> str:
     """獲取所有可查詢的蔬果列表"""
-    result = "可查詢的蔬果：\n"
-    result += "+----------+--------------+--------------+\n"
-    result += "| 蔬果名稱 | 英文名稱     | 目前價格     |\n"
-    result += "+----------+--------------+--------------+\n"
+    return await POOL.render("list_fruits", REPORTS, ("fruits://list",), load_prices().version,
+                             _render_fruit_list)
+
+@mcp.resource("fruits://list/json", mime_type="application/json")
+@METRICS.resource
+async def list_fruits_json() -> str:
+    """以 JSON 獲取所有可查詢的蔬果列表：key、name、unit、price"""
+    return await POOL.render("list_fruits_json", REPORTS, ("fruits://list/json",), load_prices().version,
+                             lambda: dumps([{"key": key, "name": fruit["zh_name"], "unit": fruit["unit"],
+                                             "price": fruit["current_price"]} for key, fruit in FRUITS.items()]))
+
+def _render_fruit_list() -> str:
+    result = io.StringIO()
+    result.write("可查詢的蔬果：\n")
+    result.write("+----------+--------------+--------------+\n")
+    result.write("| 蔬果名稱 | 英文名稱     | 目前價格     |\n")
+    result.write("+----------+--------------+--------------+\n")
     
     for key, fruit in FRUITS.items():
-        result += f"| {fruit['zh_name']:8} | {key:12} | {fruit['current_price']:10.1f} 元/{fruit['unit']} |\n"
+        result.write(f"| {fruit['zh_name']:8} | {key:12} | {fruit['current_price']:10.1f} 元/{fruit['unit']} |\n")
     
-    result += "+----------+--------------+--------------+\n"
-    result += "\n您可以通過以下方式查詢詳細資訊：\n"
-    result += "1. 讀取資源: fruits://蘋果 或 fruits://apple\n"
-    result += "2. 使用工具: get_price_chart、compare_prices 或 analyze_price_trend\n"
+    result.write("+----------+--------------+--------------+\n")
+    result.write("\n您可以通過以下方式查詢詳細資訊：\n")
+    result.write("1. 讀取資源: fruits://蘋果 或 fruits://apple\n")
+    result.write("2. 使用工具: get_price_chart、compare_prices 或 analyze_price_trend\n")
     
-    return result
+    return result.getvalue()
 
 # 獲取特定蔬果資訊的資源
 @mcp.resource("fruits://{fruit_name}")
-def get_fruit_info(fruit_name: str) -> str:
+@METRICS.resource
+async def get_fruit_info(fruit_name: str) -> str:
     """獲取特定蔬果的基本資訊
     
     Args:
@@ -288,364 +350,1029 @@ def get_fruit_info(fruit_name: str) -> str:
     Returns:
         蔬果資訊
     """
+    return await _fruit_info(fruit_name, "text")
+
+@mcp.resource("fruits://{fruit_name}/json", mime_type="application/json")
+@METRICS.resource
+async def get_fruit_info_json(fruit_name: str) -> str:
+    """以 JSON 獲取特定蔬果的基本資訊與最近 30 天的分析，如 fruits://apple/json"""
+    return await _fruit_info(fruit_name, "json")
+
+async def _fruit_info(fruit_name: str, output: str) -> str:
     fruit_key = get_fruit_key(fruit_name)
     if not fruit_key:
-        return f"找不到 {fruit_name} 的資訊，支援的蔬果有：" + "、".join([f"{f['zh_name']}({k})" for k, f in FRUITS.items()])
-    
+        return _error(_not_found_message(fruit_name), output)
+    
+    series = PRICES[fruit_key]
+    if not len(series):
+        return _error("無數據可顯示", output)
+    if output == "json":
+        return await POOL.render("get_fruit_info_json", REPORTS, ("fruits://{fruit_name}/json", fruit_key),
+                                 series.version, lambda: dumps(_fruit_payload(fruit_key, analyze_window(series, 30))))
+    return await POOL.render("get_fruit_info", REPORTS, ("fruits://{fruit_name}", fruit_key), series.version,
+                             lambda: _render_fruit_info(fruit_key))
+
+def _render_fruit_info(fruit_key: str) -> str:
     fruit = FRUITS[fruit_key]
-    prices_data = [item["price"] for item in fruit["prices"]]
-    dates = [item["date"] for item in fruit["prices"]]
-    
-    result = f"【{fruit['zh_name']}】基本資訊\n\n"
-    result += f"目前價格: {fruit['current_price']} 元/{fruit['unit']}\n"
-    result += f"30天最高價: {max(prices_data)} 元/{fruit['unit']}\n"
-    result += f"30天最低價: {min(prices_data)} 元/{fruit['unit']}\n"
-    result += f"30天平均價: {sum(prices_data)/len(prices_data):.1f} 元/{fruit['unit']}\n"
-    result += f"近期走勢: {_price_trend_description(fruit['prices'])}\n\n"
+    series = PRICES[fruit_key]
+    analysis = analyze_window(series, 30)
+    stats = analysis.stats
+    dates, prices_data = series.slice(analysis.start, analysis.stop)
+    
+    result = io.StringIO()
+    result.write(f"【{fruit['zh_name']}】基本資訊\n\n")
+    result.write(f"目前價格: {fruit['current_price']} 元/{fruit['unit']}\n")
+    result.write(f"30天最高價: {stats.max} 元/{fruit['unit']}\n")
+    result.write(f"30天最低價: {stats.min} 元/{fruit['unit']}\n")
+    result.write(f"30天平均價: {stats.mean:.1f} 元/{fruit['unit']}\n")
+    result.write(f"7日指數移動平均: {analysis.ewma:.1f} 元/{fruit['unit']}\n")
+    result.write(f"近期走勢: {analysis.recent_trend}\n\n")
     
     # 添加標準表格
-    result += create_table(dates, prices_data, f"{fruit['zh_name']}過去30天價格表")
+    result.write(create_table(dates, prices_data, f"{fruit['zh_name']}過去30天價格表", analysis=analysis))
     
-    return result
+    return result.getvalue()
+
+# 獲取特定蔬果在日期範圍內價格分析的資源
+@mcp.resource("fruits://{fruit_name}/range/{start}/{end}")
+@METRICS.resource
+async def get_fruit_range(fruit_name: str, start: str, end: str) -> str:
+    """獲取特定蔬果在日期範圍內的價格分析，如 fruits://apple/range/2025-Q3/2025-Q3
+    
+    Args:
+        fruit_name: 蔬果名稱（中文或英文，如 apple、蘋果、banana、香蕉）
+        start: 起始日期或期間（YYYY-MM-DD、YYYY-MM、YYYY-Qn、YYYY）
+        end: 結束日期或期間
+    
+    Returns:
+        價格分析報告
+    """
+    return await _fruit_range(fruit_name, start, end, "text")
+
+@mcp.resource("fruits://{fruit_name}/range/{start}/{end}/json", mime_type="application/json")
+@METRICS.resource
+async def get_fruit_range_json(fruit_name: str, start: str, end: str) -> str:
+    """以 JSON 獲取特定蔬果在日期範圍內的價格分析，如 fruits://apple/range/2025-Q3/2025-Q3/json"""
+    return await _fruit_range(fruit_name, start, end, "json")
+
+async def _fruit_range(fruit_name: str, start: str, end: str, output: str) -> str:
+    fruit_key = get_fruit_key(fruit_name)
+    if not fruit_key:
+        return _error(_not_found_message(fruit_name), output)
+    
+    series = PRICES[fruit_key]
+    if not len(series):
+        return _error("無數據可顯示", output)
+    try:
+        lo, hi = _date_range(series, start, end)
+    except ValueError as e:
+        return _error(str(e), output)
+    if output == "json":
+        return await POOL.render("get_fruit_range_json", REPORTS,
+                                 ("get_price_chart", fruit_key, lo, hi, (start, end), "json"), series.version,
+                                 lambda: _price_chart_json(fruit_key, lo, hi))
+    period = f" {series.date_str(lo)} ~ {series.date_str(hi - 1)} "
+    return await POOL.render("get_fruit_range", REPORTS,
+                             ("get_price_chart", fruit_key, lo, hi, (start, end)), series.version,
+                             lambda: _render_price_chart(fruit_key, lo, hi, period, (start, end)))
+
+# JSON 輸出的輔助函數：直接由分析結果組成，不經過表格渲染
+def _error(message: str, output: str) -> str:
+    """錯誤訊息，JSON 輸出時包成 {"error": 訊息}"""
+    return dumps({"error": message}) if output == "json" else message
+
+def _fruit_payload(fruit_key: str, analysis: PriceAnalysis,
+                   around_mean: Optional[Tuple[int, int]] = None) -> Dict:
+    fruit = FRUITS[fruit_key]
+    series = PRICES[fruit_key]
+    return {
+        "key": fruit_key,
+        "name": fruit["zh_name"],
+        "unit": fruit["unit"],
+        "price": series.last_price,
+        "analysis": analysis_payload(series, analysis, around_mean),
+    }
+
+def _price_chart_json(fruit_key: str, start: int, stop: int) -> str:
+    series = PRICES[fruit_key]
+    analysis = analyze(series, start, stop)
+    dates, prices = series.slice(start, stop)
+    payload = _fruit_payload(fruit_key, analysis, count_around_mean(series, start, stop))
+    payload["points"] = points_payload(dates, [prices], sample_indices(dates, prices, MAX_JSON_POINTS))
+    if stop == len(series):
+        payload["forecast"] = forecast_payload(series.forecast(FORECAST_SUMMARY_DAYS))
+    return dumps(payload)
 
 # 獲取特定蔬果價格走勢圖的工具
+# 回傳表格字串或 Image，不標註回傳型別，避免 FastMCP 將混合型別推導為結構化輸出
 @mcp.tool()
-def get_price_chart(fruit_name: str, days: int = 30) -> str:
+@METRICS.tool
+async def get_price_chart(fruit_name: str, days: int = 30, format: str = "text", start: str = "", end: str = "",
+                          output: str = "text"):
     """獲取特定蔬果的價格走勢圖
     
     Args:
         fruit_name: 蔬果名稱（中文或英文，如 apple、蘋果、banana、香蕉）
-        days: 要顯示的天數，最多30天
+        days: 要顯示的天數，可為多年的區間，超過歷史長度時以全部歷史為準
+        format: text 為表格版，png 為圖片版
+        start: 起始日期或期間（YYYY-MM-DD、YYYY-MM、YYYY-Qn、YYYY），指定 start 或 end 時不使用 days
+        end: 結束日期或期間，省略時到最新一筆
+        output: text 為文字報告；json 為緊湊的 JSON（統計、降採樣的價格點與預測），此時不使用 format
     
     Returns:
-        價格走勢圖（表格版）
+        價格走勢圖（表格版、PNG 圖片或 JSON）
     """
+    if output not in OUTPUTS:
+        return f"不支援的輸出格式：{output}（可用 {'、'.join(OUTPUTS)}）"
     fruit_key = get_fruit_key(fruit_name)
     if not fruit_key:
-        return f"找不到 {fruit_name} 的資訊，支援的蔬果有：" + "、".join([f"{f['zh_name']}({k})" for k, f in FRUITS.items()])
+        return _error(_not_found_message(fruit_name), output)
+    
+    series = PRICES[fruit_key]
+    if not len(series):
+        return _error("無數據可顯示", output)
+    if start or end:
+        # 日期範圍以二分搜尋轉為索引範圍，作為快取鍵
+        try:
+            lo, hi = _date_range(series, start, end)
+        except ValueError as e:
+            return _error(str(e), output)
+        period = f" {series.date_str(lo)} ~ {series.date_str(hi - 1)} "
+        requested = (start, end)
+    else:
+        # 天數以實際可用的歷史為準，正規化後作為快取鍵
+        days = min(max(days, 1), len(series))
+        lo, hi = len(series) - days, len(series)
+        period = f"過去{days}天"
+        requested = None
+    
+    if output == "json":
+        return await POOL.render("get_price_chart", REPORTS,
+                                 ("get_price_chart", fruit_key, lo, hi, requested, "json"), series.version,
+                                 lambda: _price_chart_json(fruit_key, lo, hi))
+    if format == "png":
+        if not MATPLOTLIB_AVAILABLE:
+            return "未安裝 matplotlib，無法產生圖片，請改用 format=\"text\""
+        # 在程序池中繪製，等待期間不阻塞事件迴圈；已快取或繪製中的圖不重新降採樣
+        fruit = FRUITS[fruit_key]
+        chart_key, version = (fruit_key, lo, hi), series.version
+        future = CHARTS.lookup(chart_key, version)
+        if future is None:
+            dates, prices = await POOL.run("get_price_chart", _chart_points, series, lo, hi)
+            future = CHARTS.submit(chart_key, version, f"{fruit['zh_name']}{period}價格走勢",
+                                   dates, prices, fruit["unit"])
+        return Image(data=await asyncio.wrap_future(future), format="png")
+    if format != "text":
+        return f"不支援的格式：{format}（可用 text 或 png）"
+    return await POOL.render("get_price_chart", REPORTS,
+                             ("get_price_chart", fruit_key, lo, hi, requested), series.version,
+                             lambda: _render_price_chart(fruit_key, lo, hi, period, requested))
+
+def _chart_points(series: PriceSeries, start: int, stop: int) -> Tuple[List[int], List[float]]:
+    """PNG 圖的資料點：多年的區間以 LTTB 降採樣，點數不超過 MAX_CHART_POINTS 且保留高低點"""
+    dates, prices = series.slice(start, stop)
+    indices = sample_indices(dates, prices, MAX_CHART_POINTS)
+    return [dates[i] for i in indices], [prices[i] for i in indices]
+
+# 日期範圍的輔助函數
+def _date_range(series: PriceSeries, start: str, end: str) -> Tuple[int, int]:
+    """將起訖日期轉為序列的索引範圍 [lo, hi)，以日期欄的二分搜尋定位
     
+    Args:
+        series: 價格序列（不為空）
+        start: 起始日期或期間，省略時從第一筆開始
+        end: 結束日期或期間，省略時到最後一筆
+    
+    Returns:
+        索引範圍
+    
+    Raises:
+        ValueError: 日期無法解析、起訖顛倒或範圍內沒有價格數據
+    """
+    first_day = parse_period(start) if start else series.dates[0]
+    last_day = parse_period(end, end=True) if end else series.last_day
+    if start and end and first_day > last_day:
+        raise ValueError(f"起始日期 {start} 晚於結束日期 {end}")
+    lo, hi = series.range_indices(first_day, last_day)
+    if lo >= hi:
+        if not end:
+            period = f"{from_epoch_day(first_day)} 之後"
+        elif not start:
+            period = f"{from_epoch_day(last_day)} 之前"
+        else:
+            period = f"{from_epoch_day(first_day)} ~ {from_epoch_day(last_day)} "
+        raise ValueError(f"{period}沒有價格數據（現有資料：{series.date_str(0)} ~ {series.date_str(-1)}）")
+    return lo, hi
+
+def _render_price_chart(fruit_key: str, start: int, stop: int, period: str,
+                        requested: Optional[Tuple[str, str]] = None) -> str:
     fruit = FRUITS[fruit_key]
     zh_name = fruit['zh_name']
+    series = PRICES[fruit_key]
     
-    # 限制天數最多 30 天
-    days = min(days, 30)
-    
-    # 獲取價格數據
-    price_data = fruit["prices"][-days:]
-    dates = [item["date"] for item in price_data]
-    prices = [item["price"] for item in price_data]
+    # 分析價格數據
+    analysis = analyze(series, start, stop)
+    dates, prices = series.slice(analysis.start, analysis.stop)
+    days = analysis.days
     
-    # 計算重要統計數據
-    current_price = prices[-1]
-    avg_price = sum(prices) / len(prices)
-    max_price = max(prices)
-    min_price = min(prices)
-    max_change = max([abs(prices[i] - prices[i-1]) for i in range(1, len(prices))])
+    # 重要統計數據由分析結果取得，成本與天數無關
+    stats = analysis.stats
+    current_price = stats.last
+    avg_price = stats.mean
+    max_price = stats.max
+    min_price = stats.min
+    max_change = stats.max_change
     
     # 生成詳細報告
-    result = f"【{zh_name}過去{days}天價格分析】\n\n"
+    result = io.StringIO()
+    result.write(f"【{zh_name}{period}價格分析】\n\n")
     
     # 統計摘要
-    result += "價格統計摘要：\n"
-    result += "+----------------+----------------+\n"
-    result += "| 指標           | 數值           |\n"
-    result += "+----------------+----------------+\n"
-    result += f"| 當前價格       | {current_price:14.1f} |\n"
-    result += f"| 平均價格       | {avg_price:14.1f} |\n"
-    result += f"| 最高價格       | {max_price:14.1f} |\n"
-    result += f"| 最低價格       | {min_price:14.1f} |\n"
-    result += f"| 最大單日波動   | {max_change:14.1f} |\n"
-    result += "+----------------+----------------+\n\n"
+    result.write("價格統計摘要：\n")
+    result.write("+----------------+----------------+\n")
+    result.write("| 指標           | 數值           |\n")
+    result.write("+----------------+----------------+\n")
+    result.write(f"| 當前價格       | {current_price:14.1f} |\n")
+    result.write(f"| 平均價格       | {avg_price:14.1f} |\n")
+    result.write(f"| 最高價格       | {max_price:14.1f} |\n")
+    result.write(f"| 最低價格       | {min_price:14.1f} |\n")
+    result.write(f"| 最大單日波動   | {max_change:14.1f} |\n")
+    result.write("+----------------+----------------+\n\n")
     
     # 添加詳細價格表
-    result += "詳細價格數據（採樣顯示）：\n"
-    result += create_table(dates, prices, f"{zh_name}價格表", sample_size=10)
+    result.write("詳細價格數據（採樣顯示）：\n")
+    result.write(create_table(dates, prices, f"{zh_name}價格表", sample_size=10, analysis=analysis,
+                              candidates=_display_candidates(series, start, stop)))
+    result.write(_monthly_summary(series, start, stop, f"{zh_name}月度價格彙總"))
     
     # 添加價格變化描述
-    change_from_start = prices[-1] - prices[0]
-    percent_change = (change_from_start / prices[0]) * 100
+    change_from_start = analysis.change
+    percent_change = analysis.percent_change
     
-    result += f"\n價格走勢描述：\n"
-    result += f"- 從 {dates[0]} 到 {dates[-1]} 期間，{zh_name}價格"
+    result.write(f"\n價格走勢描述：\n")
+    result.write(f"- 從 {from_epoch_day(analysis.first_day)} 到 {from_epoch_day(analysis.last_day)} 期間，{zh_name}價格")
     
     if change_from_start > 0:
-        result += f"上漲了 {change_from_start:.1f} 元 (+{percent_change:.1f}%)"
+        result.write(f"上漲了 {change_from_start:.1f} 元 (+{percent_change:.1f}%)")
     elif change_from_start < 0:
-        result += f"下跌了 {-change_from_start:.1f} 元 ({percent_change:.1f}%)"
+        result.write(f"下跌了 {-change_from_start:.1f} 元 ({percent_change:.1f}%)")
     else:
-        result += "保持不變"
+        result.write("保持不變")
     
-    result += "。\n"
+    result.write("。\n")
     
     # 添加波動分析
-    above_avg = sum(1 for p in prices if p > avg_price)
-    below_avg = sum(1 for p in prices if p < avg_price)
-    
-    result += f"- 在這 {days} 天中，價格有 {above_avg} 天高於平均價，{below_avg} 天低於平均價。\n"
+    above_avg, below_avg = count_around_mean(series, analysis.start, analysis.stop)
+    result.write(f"- 在這 {days} 天中，價格有 {above_avg} 天高於平均價，{below_avg} 天低於平均價。\n")
+    
+    # 要求的期間超出資料範圍或期間內缺少價格時明確說明，不以為每天都有價格
+    if requested is not None:
+        first = from_epoch_day(parse_period(requested[0])) if requested[0] else series.date_str(0)
+        last = from_epoch_day(parse_period(requested[1], end=True)) if requested[1] else series.date_str(-1)
+        if (first, last) != (from_epoch_day(analysis.first_day), from_epoch_day(analysis.last_day)):
+            result.write(f"- 要求的期間為 {first} ~ {last}，有價格數據的期間為 "
+                         f"{from_epoch_day(analysis.first_day)} ~ {from_epoch_day(analysis.last_day)}。\n")
+    result.write(_describe_gaps(series, start, stop))
     
     # 週期性變化分析
-    if days >= 14:
-        week1_avg = sum(prices[:7]) / 7
-        week2_avg = sum(prices[7:14]) / 7
-        week_change = ((week2_avg / week1_avg) - 1) * 100
-        
-        result += f"- 第二週較第一週平均價格變化：{week_change:+.1f}%\n"
+    weekly_avgs = analysis.weekly_avgs
+    if len(weekly_avgs) >= 2:
+        week_change = ((weekly_avgs[1] / weekly_avgs[0]) - 1) * 100 if weekly_avgs[0] else 0.0
+        result.write(f"- 第二週較第一週平均價格變化：{week_change:+.1f}%\n")
     
-    if days >= 21:
-        week3_avg = sum(prices[14:21]) / 7
-        result += f"- 第三週較第二週平均價格變化：{((week3_avg / week2_avg) - 1) * 100:+.1f}%\n"
+    if len(weekly_avgs) >= 3:
+        week_change = ((weekly_avgs[2] / weekly_avgs[1]) - 1) * 100 if weekly_avgs[1] else 0.0
+        result.write(f"- 第三週較第二週平均價格變化：{week_change:+.1f}%\n")
     
-    # 預測趨勢
-    if percent_change > 5:
-        result += "- 預測：若當前趨勢持續，短期內價格可能繼續上漲。\n"
-    elif percent_change < -5:
-        result += "- 預測：若當前趨勢持續，短期內價格可能繼續下跌。\n"
-    else:
-        result += "- 預測：價格可能在當前水平附近波動。\n"
+    # 預測趨勢：區間延伸到最新一筆時才由預測模型預測，歷史區間不做預測
+    if stop == len(series):
+        result.write(_forecast_summary(series))
     
-    return result
+    return result.getvalue()
+
+# 預測模型的摘要
+def _forecast_summary(series: PriceSeries, horizon: int = FORECAST_SUMMARY_DAYS) -> str:
+    """預測模型對 horizon 天後價格的一行摘要"""
+    point = series.forecast(horizon)[-1]
+    last = series.last_price
+    change = ((point.value / last) - 1) * 100 if last else 0.0
+    return (f"- 預測：{horizon} 天後（{from_epoch_day(point.day)}）預估 {point.value:.1f} 元"
+            f"（95% 區間 {point.lower:.1f} ~ {point.upper:.1f}），較目前 {change:+.1f}%。\n")
+
+# 描述價格區間內缺少價格的日期
+def _describe_gaps(series: PriceSeries, start: int, stop: int) -> str:
+    missing = series.missing_days(start, stop)
+    if not missing:
+        return ""
+    gaps = series.gaps(start, stop)
+    shown = "、".join(from_epoch_day(a) if a == b else f"{from_epoch_day(a)} ~ {from_epoch_day(b)}" for a, b in gaps[:5])
+    more = f" 等 {len(gaps)} 段" if len(gaps) > 5 else ""
+    return f"- 期間有 {missing} 天沒有價格數據（{shown}{more}），統計只計入有價格的 {stop - start} 天。\n"
+
+# 逐日列出完整價格歷史的工具
+@mcp.tool()
+@METRICS.tool
+async def get_price_history(fruit_name: str, days: int = 0, page: int = 1, page_size: int = HISTORY_PAGE_SIZE,
+                      start: str = "", end: str = "") -> str:
+    """逐日列出特定蔬果的價格歷史（不採樣），多年的歷史依頁數分段回傳
+    
+    Args:
+        fruit_name: 蔬果名稱（中文或英文，如 apple、蘋果、banana、香蕉）
+        days: 只列出最近幾天，0 表示全部歷史
+        page: 頁碼，從 1 開始
+        page_size: 每頁筆數，最多 1000 筆
+        start: 起始日期或期間（YYYY-MM-DD、YYYY-MM、YYYY-Qn、YYYY），指定 start 或 end 時不使用 days
+        end: 結束日期或期間，省略時到最新一筆
+    
+    Returns:
+        指定頁的價格表
+    """
+    fruit_key = get_fruit_key(fruit_name)
+    if not fruit_key:
+        return _not_found_message(fruit_name)
+    
+    series = PRICES[fruit_key]
+    if not len(series):
+        return "無數據可顯示"
+    
+    # 範圍、每頁筆數與頁碼先正規化為索引，再作為快取鍵
+    if start or end:
+        try:
+            lo, hi = _date_range(series, start, end)
+        except ValueError as e:
+            return str(e)
+    else:
+        lo, hi = (0 if days <= 0 else max(len(series) - days, 0)), len(series)
+    page_size = min(max(page_size, 1), MAX_HISTORY_PAGE_SIZE)
+    pages = -(-(hi - lo) // page_size)
+    page = min(max(page, 1), pages)
+    return await POOL.render("get_price_history", REPORTS,
+                             ("get_price_history", fruit_key, lo, hi, page, page_size), series.version,
+                             lambda: _render_price_history(fruit_key, lo, hi, page, page_size))
+
+def _render_price_history(fruit_key: str, lo: int, hi: int, page: int, page_size: int) -> str:
+    fruit = FRUITS[fruit_key]
+    series = PRICES[fruit_key]
+    pages = -(-(hi - lo) // page_size)
+    first = lo + (page - 1) * page_size
+    last = min(first + page_size, hi)
+    
+    # 只走訪本頁的列，逐行寫入
+    result = io.StringIO()
+    result.writelines(iter_price_table(series.dates, series.prices,
+                                       f"{fruit['zh_name']}價格歷史（第 {page}/{pages} 頁）", range(first, last)))
+    result.write(f"共 {hi - lo} 筆，本頁 {series.date_str(first)} ~ {series.date_str(last - 1)}")
+    if page < pages:
+        result.write(f"，下一頁請使用 page={page + 1}")
+    result.write("\n")
+    result.write(_describe_gaps(series, first, last))
+    
+    return result.getvalue()
 
 # 比較兩種蔬果價格的工具
 @mcp.tool()
-def compare_prices(fruit1: str, fruit2: str, days: int = 30) -> str:
+@METRICS.tool
+async def compare_prices(fruit1: str, fruit2: str, days: int = 30, output: str = "text") -> str:
     """比較兩種蔬果的價格走勢
     
     Args:
         fruit1: 第一種蔬果名稱（中文或英文，如 apple、蘋果）
         fruit2: 第二種蔬果名稱（中文或英文，如 banana、香蕉）
-        days: 要比較的天數，最多30天
+        days: 要比較的天數，可為多年的區間，超過共同歷史時以全部共同歷史為準；
+            只比較兩者都有價格的日期
+        output: text 為文字報告，json 為緊湊的 JSON（兩者的統計、價差與降採樣的價格點）
     
     Returns:
-        比較結果（表格版）
+        比較結果（表格版或 JSON）
     """
+    if output not in OUTPUTS:
+        return f"不支援的輸出格式：{output}（可用 {'、'.join(OUTPUTS)}）"
     fruit_key1 = get_fruit_key(fruit1)
     fruit_key2 = get_fruit_key(fruit2)
     
     if not fruit_key1 or not fruit_key2:
         error_msg = []
         if not fruit_key1:
-            error_msg.append(f"找不到 {fruit1} 的資訊")
+            error_msg.append(_not_found_message(fruit1))
         if not fruit_key2:
-            error_msg.append(f"找不到 {fruit2} 的資訊")
-        error_msg.append("支援的蔬果有：" + "、".join([f"{f['zh_name']}({k})" for k, f in FRUITS.items()]))
-        return "\n".join(error_msg)
-    
-    # 限制天數最多 30 天
-    days = min(days, 30)
-    
-    # 獲取價格數據
-    price_data1 = FRUITS[fruit_key1]["prices"][-days:]
-    price_data2 = FRUITS[fruit_key2]["prices"][-days:]
-    
-    dates = [item["date"] for item in price_data1]
-    prices1 = [item["price"] for item in price_data1]
-    prices2 = [item["price"] for item in price_data2]
+            error_msg.append(_not_found_message(fruit2))
+        return _error("\n".join(error_msg), output)
+    
+    # 兩個序列在共同日期上比較，天數以兩者重疊的歷史為準
+    series1 = PRICES[fruit_key1]
+    series2 = PRICES[fruit_key2]
+    empty = [FRUITS[key]["zh_name"] for key, series in ((fruit_key1, series1), (fruit_key2, series2)) if not len(series)]
+    if empty:
+        return _error(f"{'、'.join(empty)}無數據可顯示", output)
+    overlap = min(series1.last_day, series2.last_day) - max(series1.dates[0], series2.dates[0]) + 1
+    if overlap < 1:
+        return _error(f"{FRUITS[fruit_key1]['zh_name']}與{FRUITS[fruit_key2]['zh_name']}沒有共同的日期可比較", output)
+    days = min(max(days, 1), overlap)
+    if output == "json":
+        return await POOL.render("compare_prices", REPORTS,
+                                 ("compare_prices", fruit_key1, fruit_key2, days, "json"),
+                                 (series1.version, series2.version),
+                                 lambda: _comparison_json(fruit_key1, fruit_key2, days))
+    return await POOL.render("compare_prices", REPORTS,
+                             ("compare_prices", fruit_key1, fruit_key2, days), (series1.version, series2.version),
+                             lambda: _render_comparison(fruit_key1, fruit_key2, days))
+
+def _aligned_comparison(fruit_key1: str, fruit_key2: str, days: int) -> Optional[Tuple]:
+    """兩種蔬果在最近 days 天中共同日期上的價格與各自的統計摘要
+
+    日期以 price_compare.align 取交集，兩欄價格逐日對應；只有一方有價格的日期不列入比較。
+    沒有共同日期時回傳 None。
+    """
+    dates, (prices1, prices2) = price_compare.align([PRICES[fruit_key1], PRICES[fruit_key2]], days)
+    if not dates:
+        return None
+    stats1 = RangeStats.build(prices1).query(prices1, 0, len(prices1))
+    stats2 = RangeStats.build(prices2).query(prices2, 0, len(prices2))
+    return dates, prices1, prices2, stats1, stats2
+
+def _percent_change(stats: WindowStats) -> float:
+    return (stats.last / stats.first - 1) * 100 if stats.first else 0.0
+
+def _no_common_dates(fruit_key1: str, fruit_key2: str, days: int) -> str:
+    return f"{FRUITS[fruit_key1]['zh_name']}與{FRUITS[fruit_key2]['zh_name']}最近 {days} 天沒有共同的日期可比較"
+
+def _comparison_json(fruit_key1: str, fruit_key2: str, days: int) -> str:
+    aligned = _aligned_comparison(fruit_key1, fruit_key2, days)
+    if aligned is None:
+        return _error(_no_common_dates(fruit_key1, fruit_key2, days), "json")
+    dates, prices1, prices2, stats1, stats2 = aligned
+    fruits = []
+    for key in (fruit_key1, fruit_key2):
+        series = PRICES[key]
+        fruits.append(_fruit_payload(key, analyze(series, *series.range_indices(dates[0], dates[-1]))))
+    indices = sample_indices(dates, list(map(sub, prices1, prices2)), MAX_JSON_POINTS)
+    return dumps({
+        "fruits": fruits,
+        "common_days": len(dates),
+        "current_diff": round(stats1.last - stats2.last, 3),
+        "avg_diff": round(stats1.mean - stats2.mean, 3),
+        "points": points_payload(dates, [prices1, prices2], indices),
+    })
+
+def _render_comparison(fruit_key1: str, fruit_key2: str, days: int) -> str:
+    # 分析兩種蔬果在共同日期上的價格數據
+    aligned = _aligned_comparison(fruit_key1, fruit_key2, days)
+    if aligned is None:
+        return _no_common_dates(fruit_key1, fruit_key2, days)
+    dates, prices1, prices2, stats1, stats2 = aligned
     
     fruit1_name = FRUITS[fruit_key1]["zh_name"]
     fruit2_name = FRUITS[fruit_key2]["zh_name"]
     
     # 計算價格差異
-    current_diff = prices1[-1] - prices2[-1]
-    avg_diff = sum(p1 - p2 for p1, p2 in zip(prices1, prices2)) / len(prices1)
+    current_diff = stats1.last - stats2.last
+    avg_diff = stats1.mean - stats2.mean
     
     # 生成比較報告
-    result = f"【{fruit1_name} vs {fruit2_name} 價格比較分析】\n\n"
+    result = io.StringIO()
+    result.write(f"【{fruit1_name} vs {fruit2_name} 價格比較分析】\n\n")
+    result.write(f"比較 {from_epoch_day(dates[0])} ~ {from_epoch_day(dates[-1])} 間兩者都有價格的 {len(dates)} 天\n\n")
     
     # 總結數據
-    result += "價格比較摘要：\n"
-    result += "+----------------+----------------+----------------+----------------+\n"
-    result += f"| 指標           | {fruit1_name:14} | {fruit2_name:14} | 差異           |\n"
-    result += "+----------------+----------------+----------------+----------------+\n"
-    result += f"| 當前價格       | {prices1[-1]:14.1f} | {prices2[-1]:14.1f} | {current_diff:+14.1f} |\n"
-    result += f"| 平均價格       | {sum(prices1)/len(prices1):14.1f} | {sum(prices2)/len(prices2):14.1f} | {avg_diff:+14.1f} |\n"
-    result += f"| 最高價格       | {max(prices1):14.1f} | {max(prices2):14.1f} | {max(prices1)-max(prices2):+14.1f} |\n"
-    result += f"| 最低價格       | {min(prices1):14.1f} | {min(prices2):14.1f} | {min(prices1)-min(prices2):+14.1f} |\n"
-    result += "+----------------+----------------+----------------+----------------+\n\n"
+    result.write("價格比較摘要：\n")
+    result.write("+----------------+----------------+----------------+----------------+\n")
+    result.write(f"| 指標           | {fruit1_name:14} | {fruit2_name:14} | 差異           |\n")
+    result.write("+----------------+----------------+----------------+----------------+\n")
+    result.write(f"| 當前價格       | {stats1.last:14.1f} | {stats2.last:14.1f} | {current_diff:+14.1f} |\n")
+    result.write(f"| 平均價格       | {stats1.mean:14.1f} | {stats2.mean:14.1f} | {avg_diff:+14.1f} |\n")
+    result.write(f"| 最高價格       | {stats1.max:14.1f} | {stats2.max:14.1f} | {stats1.max-stats2.max:+14.1f} |\n")
+    result.write(f"| 最低價格       | {stats1.min:14.1f} | {stats2.min:14.1f} | {stats1.min-stats2.min:+14.1f} |\n")
+    result.write("+----------------+----------------+----------------+----------------+\n\n")
     
     # 添加價格比較表格
-    result += "價格對比詳細數據：\n"
-    result += create_comparison_table(dates, prices1, prices2, fruit1_name, fruit2_name)
+    result.write("價格對比詳細數據：\n")
+    result.write(create_comparison_table(dates, prices1, prices2, fruit1_name, fruit2_name))
     
     # 添加比較分析
-    result += f"\n價格比較分析：\n"
+    result.write(f"\n價格比較分析：\n")
     
     # 價格差異分析
+    diff_percent = (current_diff / stats2.last) * 100 if stats2.last else 0.0
     if current_diff > 0:
-        result += f"- 目前 {fruit1_name} 比 {fruit2_name} 貴 {current_diff:.1f} 元 ({(current_diff/prices2[-1])*100:.1f}%)。\n"
+        result.write(f"- 目前 {fruit1_name} 比 {fruit2_name} 貴 {current_diff:.1f} 元 ({diff_percent:.1f}%)。\n")
     else:
-        result += f"- 目前 {fruit1_name} 比 {fruit2_name} 便宜 {-current_diff:.1f} 元 ({(current_diff/prices2[-1])*100:.1f}%)。\n"
+        result.write(f"- 目前 {fruit1_name} 比 {fruit2_name} 便宜 {-current_diff:.1f} 元 ({diff_percent:.1f}%)。\n")
     
     # 價格趨勢比較
-    f1_change = ((prices1[-1] / prices1[0]) - 1) * 100
-    f2_change = ((prices2[-1] / prices2[0]) - 1) * 100
+    f1_change = _percent_change(stats1)
+    f2_change = _percent_change(stats2)
     
-    result += f"- {fruit1_name}過去{days}天價格變化：{f1_change:+.1f}%\n"
-    result += f"- {fruit2_name}過去{days}天價格變化：{f2_change:+.1f}%\n"
+    result.write(f"- {fruit1_name}過去{days}天價格變化：{f1_change:+.1f}%\n")
+    result.write(f"- {fruit2_name}過去{days}天價格變化：{f2_change:+.1f}%\n")
     
     # 相關性分析
     if (f1_change > 0 and f2_change > 0) or (f1_change < 0 and f2_change < 0):
-        result += f"- 兩種蔬果價格走勢方向一致，但 {fruit1_name if abs(f1_change) > abs(f2_change) else fruit2_name} 變化幅度更大。\n"
+        result.write(f"- 兩種蔬果價格走勢方向一致，但 {fruit1_name if abs(f1_change) > abs(f2_change) else fruit2_name} 變化幅度更大。\n")
     else:
-        result += f"- 兩種蔬果價格走勢方向相反，{fruit1_name} {('上漲' if f1_change > 0 else '下跌')}而 {fruit2_name} {('下跌' if f2_change > 0 else '上漲')}。\n"
+        result.write(f"- 兩種蔬果價格走勢方向相反，{fruit1_name} {('上漲' if f1_change > 0 else '下跌')}而 {fruit2_name} {('下跌' if f2_change > 0 else '上漲')}。\n")
     
     # 購買建議
-    result += "\n購買建議：\n"
+    result.write("\n購買建議：\n")
     if current_diff < 0:
-        result += f"- 如果口味偏好相近，目前 {fruit1_name} 性價比更高。\n"
+        result.write(f"- 如果口味偏好相近，目前 {fruit1_name} 性價比更高。\n")
     else:
-        result += f"- 如果口味偏好相近，目前 {fruit2_name} 性價比更高。\n"
+        result.write(f"- 如果口味偏好相近，目前 {fruit2_name} 性價比更高。\n")
     
     if f1_change < 0 and f1_change < f2_change:
-        result += f"- {fruit1_name}價格正在下跌，可能是較好的購買時機。\n"
+        result.write(f"- {fruit1_name}價格正在下跌，可能是較好的購買時機。\n")
     elif f2_change < 0 and f2_change < f1_change:
-        result += f"- {fruit2_name}價格正在下跌，可能是較好的購買時機。\n"
+        result.write(f"- {fruit2_name}價格正在下跌，可能是較好的購買時機。\n")
     
-    return result
+    return result.getvalue()
+
+# 一次比較多種蔬果價格的工具
+@mcp.tool()
+@METRICS.tool
+async def compare_many(fruits: List[str], days: int = 30) -> str:
+    """一次比較多種蔬果的價格：相關係數矩陣、價差與各自的漲跌
+    
+    Args:
+        fruits: 蔬果名稱列表（中文或英文，如 ["apple", "香蕉"]），最多 50 種
+        days: 要比較的天數，以共同擁有價格的日期為準
+    
+    Returns:
+        比較結果（表格版）；超過上限、沒有價格或最近 days 天沒有價格而略過的蔬果列在開頭
+    """
+    keys = []
+    errors = []
+    if len(fruits) > MAX_COMPARE_FRUITS:
+        errors.append(f"最多比較 {MAX_COMPARE_FRUITS} 種，已略過：{'、'.join(fruits[MAX_COMPARE_FRUITS:])}")
+    empty = []
+    for name in fruits[:MAX_COMPARE_FRUITS]:
+        key = get_fruit_key(name)
+        if not key:
+            errors.append(_not_found_message(name))
+        elif key in keys or key in empty:
+            continue
+        elif len(PRICES[key]):
+            keys.append(key)
+        else:
+            empty.append(key)
+    if empty:
+        errors.append(f"沒有價格數據，已略過：{'、'.join(FRUITS[key]['zh_name'] for key in empty)}")
+    
+    # 比較期間以最新的價格為準，最近 days 天沒有價格的蔬果不列入，以免拖累共同日期
+    days = max(days, 1)
+    if keys:
+        first_day = max(PRICES[key].last_day for key in keys) - days + 1
+        stale = [key for key in keys if PRICES[key].last_day < first_day]
+        if stale:
+            errors.append(f"最近 {days} 天沒有價格，已略過：{'、'.join(FRUITS[key]['zh_name'] for key in stale)}")
+            keys = [key for key in keys if key not in stale]
+    if len(keys) < 2:
+        return "\n".join(errors + ["至少需要兩種有價格數據的蔬果才能比較"])
+    
+    versions = tuple(PRICES[key].version for key in keys)
+    report = await POOL.render("compare_many", REPORTS, ("compare_many", tuple(keys), days), versions,
+                               lambda: _render_market_comparison(keys, days))
+    return "\n".join(errors + [report])
+
+def _render_market_comparison(keys: List[str], days: int) -> str:
+    try:
+        comparison = price_compare.compare([PRICES[key] for key in keys], days)
+    except ValueError as e:
+        return str(e)
+    names = [FRUITS[key]["zh_name"] for key in keys]
+    
+    result = io.StringIO()
+    result.write(f"【{len(keys)} 種蔬果價格比較】\n")
+    result.write(f"比較期間：{from_epoch_day(comparison.first_day)} ~ {from_epoch_day(comparison.last_day)}"
+                 f"（共同 {comparison.days} 天）\n\n")
+    
+    # 各蔬果的價格、漲跌與價差
+    result.write("價格比較摘要：\n")
+    result.write("+----------+--------------+------------+------------+------------+------------+--------------+\n")
+    result.write("| 蔬果名稱 | 英文名稱     | 當前價格   | 平均價格   | 期間變化   | 波動幅度   | 相對平均價格 |\n")
+    result.write("+----------+--------------+------------+------------+------------+------------+--------------+\n")
+    for i, key in enumerate(keys):
+        result.write(f"| {names[i]:8} | {key:12} | {comparison.last[i]:10.1f} | {comparison.means[i]:10.1f} | "
+                     f"{comparison.changes[i]:+9.1f}% | {comparison.ranges[i]:9.1f}% | {comparison.relative[i]:+11.1f}% |\n")
+    result.write("+----------+--------------+------------+------------+------------+------------+--------------+\n")
+    
+    # 相關係數矩陣，蔬果太多時只列出最相關與最不相關的組合
+    correlations = comparison.correlations
+    if len(keys) <= MAX_MATRIX_FRUITS:
+        border = "+--------------" + "+--------" * len(keys) + "+\n"
+        result.write("\n價格相關係數：\n")
+        result.write(border)
+        result.write("|              |" + "".join(f" {key[:6]:>6} |" for key in keys) + "\n")
+        result.write(border)
+        for i, key in enumerate(keys):
+            result.write(f"| {key:12} |" + "".join(f" {value:+6.2f} |" for value in correlations[i]) + "\n")
+        result.write(border)
+    
+    pairs = sorted(((correlations[i][j], i, j) for i in range(len(keys)) for j in range(i + 1, len(keys))),
+                   reverse=True)
+    shown = max(1, min(3, len(pairs) // 2))
+    result.write("\n走勢最相近：\n")
+    for value, i, j in pairs[:shown]:
+        result.write(f"- {names[i]} 與 {names[j]}：相關係數 {value:+.2f}\n")
+    if len(pairs) > 1:
+        result.write("走勢最相反：\n")
+        for value, i, j in pairs[:-shown - 1:-1]:
+            result.write(f"- {names[i]} 與 {names[j]}：相關係數 {value:+.2f}\n")
+    
+    cheapest = min(range(len(keys)), key=lambda i: comparison.relative[i])
+    biggest = max(range(len(keys)), key=lambda i: abs(comparison.changes[i]))
+    result.write(f"\n- 相對平均價格最低：{names[cheapest]}（{comparison.relative[cheapest]:+.1f}%）\n")
+    result.write(f"- 期間變化最大：{names[biggest]}（{comparison.changes[biggest]:+.1f}%）\n")
+    
+    return result.getvalue()
+
+# 市場篩選的工具
+@mcp.tool()
+@METRICS.tool
+async def screen_market(metric: str = "week_change", k: int = 10, window: int = 30, direction: str = "abs") -> str:
+    """找出指標最突出的蔬果，例如今天漲跌最多的前幾名
+    
+    Args:
+        metric: 篩選指標：week_change（一週漲跌幅）、volatility（價格波動性）、mean_distance（偏離平均價）、
+            forecast_change（預測模型的 7 天後漲跌幅）
+        k: 顯示的蔬果數，最多 100 種
+        window: volatility 與 mean_distance 計算使用的天數
+        direction: abs 依變化幅度、up 由高到低、down 由低到高
+    
+    Returns:
+        篩選結果（表格版）
+    """
+    if metric not in SCREEN_METRICS:
+        return f"不支援的指標：{metric}（可用 {'、'.join(SCREEN_METRICS)}）"
+    if direction not in DIRECTIONS:
+        return f"不支援的排序方式：{direction}（可用 {'、'.join(DIRECTIONS)}）"
+    
+    prices = load_prices()
+    k = min(max(k, 1), MAX_SCREEN_RESULTS)
+    window = 7 if metric == "week_change" else max(window, 2)
+    return await POOL.render("screen_market", REPORTS,
+                             ("screen_market", metric, k, window, direction), prices.version,
+                             lambda: _render_screen(metric, k, window, direction))
+
+def _render_screen(metric: str, k: int, window: int, direction: str) -> str:
+    label = SCREEN_METRICS[metric][1]
+    ranking = MARKET.top(PRICES, metric, k, window, direction)
+    if not ranking:
+        return "沒有足夠的價格數據可供篩選"
+    
+    result = io.StringIO()
+    title = label if metric in ("week_change", "forecast_change") else f"最近 {window} 天{label}"
+    result.write(f"【{title}前 {len(ranking)} 名】\n")
+    result.write("+------+----------+--------------+--------------+--------------+\n")
+    result.write(f"| 排名 | 蔬果名稱 | 英文名稱     | 目前價格     | {label:{12 - len(label)}} |\n")
+    result.write("+------+----------+--------------+--------------+--------------+\n")
+    signed = metric != "volatility"
+    for rank, (key, value) in enumerate(ranking, 1):
+        fruit = FRUITS[key]
+        shown = f"{value:+11.1f}%" if signed else f"{value:11.1f}%"
+        result.write(f"| {rank:4d} | {fruit['zh_name']:8} | {key:12} | {PRICES[key].last_price:12.1f} | {shown} |\n")
+    result.write("+------+----------+--------------+--------------+--------------+\n")
+    
+    return result.getvalue()
 
 # 獲取價格走勢分析的工具
 @mcp.tool()
-def analyze_price_trend(fruit_name: str) -> str:
+@METRICS.tool
+async def analyze_price_trend(fruit_name: str, output: str = "text") -> str:
     """獲取特定蔬果的價格走勢分析
     
     Args:
         fruit_name: 蔬果名稱（中文或英文，如 apple、蘋果、banana、香蕉）
+        output: text 為文字報告，json 為緊湊的 JSON（最近 30 天的統計與 7 天預測）
     
     Returns:
         價格走勢分析報告
     """
+    if output not in OUTPUTS:
+        return f"不支援的輸出格式：{output}（可用 {'、'.join(OUTPUTS)}）"
     fruit_key = get_fruit_key(fruit_name)
     if not fruit_key:
-        return f"找不到 {fruit_name} 的資訊，支援的蔬果有：" + "、".join([f"{f['zh_name']}({k})" for k, f in FRUITS.items()])
-    
-    fruit = FRUITS[fruit_key]
-    prices_data = fruit["prices"]
-    prices = [item["price"] for item in prices_data]
-    dates = [item["date"] for item in prices_data]
-    
-    # 計算平均價格
-    avg_price = sum(prices) / len(prices)
-    
-    # 計算環比變化
-    current_price = prices[-1]
-    week_ago_price = prices[-8] if len(prices) >= 8 else prices[0]
-    two_weeks_ago_price = prices[-15] if len(prices) >= 15 else prices[0]
-    month_ago_price = prices[0]
-    
-    week_change = ((current_price / week_ago_price) - 1) * 100
-    two_weeks_change = ((current_price / two_weeks_ago_price) - 1) * 100
-    month_change = ((current_price / month_ago_price) - 1) * 100
+        return _error(_not_found_message(fruit_name), output)
+    
+    series = PRICES[fruit_key]
+    if not len(series):
+        return _error("無數據可顯示", output)
+    if output == "json":
+        return await POOL.render("analyze_price_trend", REPORTS, ("analyze_price_trend", fruit_key, "json"),
+                                 series.version, lambda: _trend_json(fruit_key))
+    return await POOL.render("analyze_price_trend", REPORTS,
+                             ("analyze_price_trend", fruit_key), series.version,
+                             lambda: _render_trend_report(fruit_key))
+
+# 預測價格的工具
+@mcp.tool()
+@METRICS.tool
+async def forecast_price(fruit_name: str, horizon: int = 7) -> str:
+    """預測特定蔬果未來每天的價格
     
-    # 計算波動性（標準差）
-    variance = sum((price - avg_price) ** 2 for price in prices) / len(prices)
-    std_dev = variance ** 0.5
-    volatility = (std_dev / avg_price) * 100
+    Args:
+        fruit_name: 蔬果名稱（中文或英文，如 apple、蘋果、banana、香蕉）
+        horizon: 預測天數，最多 90 天
     
-    # 判斷趨勢
-    trend_description = _price_trend_description(prices_data)
+    Returns:
+        每日預測價格與 95% 預測區間
+    """
+    fruit_key = get_fruit_key(fruit_name)
+    if not fruit_key:
+        return _not_found_message(fruit_name)
+    
+    series = PRICES[fruit_key]
+    if len(series) < 2:
+        return "價格數據不足，無法預測"
+    horizon = min(max(horizon, 1), MAX_FORECAST_HORIZON)
+    return await POOL.render("forecast_price", REPORTS,
+                             ("forecast_price", fruit_key, horizon), series.version,
+                             lambda: _render_forecast(fruit_key, horizon))
+
+def _render_forecast(fruit_key: str, horizon: int) -> str:
+    fruit = FRUITS[fruit_key]
+    series = PRICES[fruit_key]
+    model = series.forecaster()
+    points = model.forecast(horizon)
+    
+    result = io.StringIO()
+    result.write(f"【{fruit['zh_name']}未來{horizon}天價格預測】\n\n")
+    result.write(f"最新價格: {series.last_price:.1f} 元/{fruit['unit']}（{series.date_str(-1)}）\n")
+    result.write(f"模型水準: {model.level:.1f} 元，每日趨勢: {model.trend:+.2f} 元，"
+                 f"一步預測誤差標準差: {model.sigma:.2f} 元\n")
+    result.write("星期效應: " + "、".join(f"{name} {value:+.1f}" for name, value in zip(WEEKDAYS, model.season)) + "\n\n")
+    
+    result.write("+--------------+--------------+--------------+--------------+\n")
+    result.write("| 日期         | 預測價格     | 95% 下限     | 95% 上限     |\n")
+    result.write("+--------------+--------------+--------------+--------------+\n")
+    for point in points:
+        result.write(f"| {from_epoch_day(point.day)} | {point.value:12.1f} | {point.lower:12.1f} | {point.upper:12.1f} |\n")
+    result.write("+--------------+--------------+--------------+--------------+\n")
+    result.write("模型：阻尼趨勢與每週季節項的 Holt-Winters 指數平滑，區間越遠越寬。\n")
+    
+    return result.getvalue()
+
+def _trend_json(fruit_key: str) -> str:
+    series = PRICES[fruit_key]
+    payload = _fruit_payload(fruit_key, analyze_window(series, 30))
+    payload["forecast"] = forecast_payload(series.forecast(FORECAST_SUMMARY_DAYS))
+    return dumps(payload)
+
+def _render_trend_report(fruit_key: str) -> str:
+    fruit = FRUITS[fruit_key]
+    series = PRICES[fruit_key]
+    analysis = analyze_window(series, 30)
+    stats = analysis.stats
+    dates, prices = series.slice(analysis.start, analysis.stop)
+    
+    # 平均價格、環比變化、波動性與趨勢都由分析結果取得
+    avg_price = stats.mean
+    current_price = stats.last
+    week_change = analysis.week_change
+    two_weeks_change = analysis.two_weeks_change
+    month_change = analysis.month_change
+    volatility = analysis.volatility
+    trend_description = analysis.recent_trend
     
     # 組合報告
-    report = f"【{fruit['zh_name']}價格分析報告】\n\n"
+    report = io.StringIO()
+    report.write(f"【{fruit['zh_name']}價格分析報告】\n\n")
     
     # 基本統計表
-    report += "價格基本統計：\n"
-    report += "+----------------+----------------+\n"
-    report += "| 指標           | 數值           |\n"
-    report += "+----------------+----------------+\n"
-    report += f"| 當前價格       | {current_price:14.1f} |\n"
-    report += f"| 30天平均價格   | {avg_price:14.1f} |\n"
-    report += f"| 30天最高價格   | {max(prices):14.1f} |\n"
-    report += f"| 30天最低價格   | {min(prices):14.1f} |\n"
-    report += f"| 價格波動性     | {volatility:14.1f}% |\n"
-    report += "+----------------+----------------+\n\n"
+    report.write("價格基本統計：\n")
+    report.write("+----------------+----------------+\n")
+    report.write("| 指標           | 數值           |\n")
+    report.write("+----------------+----------------+\n")
+    report.write(f"| 當前價格       | {current_price:14.1f} |\n")
+    report.write(f"| 30天平均價格   | {avg_price:14.1f} |\n")
+    report.write(f"| 30天最高價格   | {stats.max:14.1f} |\n")
+    report.write(f"| 30天最低價格   | {stats.min:14.1f} |\n")
+    report.write(f"| 價格波動性     | {volatility:14.1f}% |\n")
+    report.write("+----------------+----------------+\n\n")
     
     # 環比變化表
-    report += "價格環比變化：\n"
-    report += "+----------------+----------------+\n"
-    report += "| 時間範圍       | 變化百分比     |\n"
-    report += "+----------------+----------------+\n"
-    report += f"| 一週環比       | {week_change:+14.1f}% |\n"
-    report += f"| 兩週環比       | {two_weeks_change:+14.1f}% |\n"
-    report += f"| 月度環比       | {month_change:+14.1f}% |\n"
-    report += "+----------------+----------------+\n\n"
+    report.write("價格環比變化：\n")
+    report.write("+----------------+----------------+\n")
+    report.write("| 時間範圍       | 變化百分比     |\n")
+    report.write("+----------------+----------------+\n")
+    report.write(f"| 一週環比       | {week_change:+14.1f}% |\n")
+    report.write(f"| 兩週環比       | {two_weeks_change:+14.1f}% |\n")
+    report.write(f"| 月度環比       | {month_change:+14.1f}% |\n")
+    report.write("+----------------+----------------+\n\n")
     
     # 添加詳細價格表格
-    report += "30天價格數據（採樣顯示）：\n"
-    report += create_table(dates, prices, f"{fruit['zh_name']}價格表")
+    report.write("30天價格數據（採樣顯示）：\n")
+    report.write(create_table(dates, prices, f"{fruit['zh_name']}價格表", analysis=analysis))
     
     # 價格趨勢描述
-    report += f"\n價格趨勢分析：\n"
-    report += f"- 總體趨勢：{trend_description}\n"
+    report.write(f"\n價格趨勢分析：\n")
+    report.write(f"- 總體趨勢：{trend_description}\n")
     
     # 分段趨勢分析
-    if len(prices) >= 21:
-        early_prices = prices[:10]
-        mid_prices = prices[10:20]
-        late_prices = prices[20:]
-        
-        early_avg = sum(early_prices) / len(early_prices)
-        mid_avg = sum(mid_prices) / len(mid_prices)
-        late_avg = sum(late_prices) / len(late_prices)
+    if analysis.segments:
+        (early_start, early_stop, early_avg), (mid_start, mid_stop, mid_avg), (late_start, late_stop, late_avg) = analysis.segments
         
-        report += "- 分段趨勢分析：\n"
-        report += f"  * 初期（{dates[0]} ~ {dates[9]}）：平均價格 {early_avg:.1f} 元\n"
-        report += f"  * 中期（{dates[10]} ~ {dates[19]}）：平均價格 {mid_avg:.1f} 元，較初期變化 {((mid_avg/early_avg)-1)*100:+.1f}%\n"
-        report += f"  * 後期（{dates[20]} ~ {dates[-1]}）：平均價格 {late_avg:.1f} 元，較中期變化 {((late_avg/mid_avg)-1)*100:+.1f}%\n"
+        mid_change = ((mid_avg / early_avg) - 1) * 100 if early_avg else 0.0
+        late_change = ((late_avg / mid_avg) - 1) * 100 if mid_avg else 0.0
+        report.write("- 分段趨勢分析：\n")
+        report.write(f"  * 初期（{series.date_str(early_start)} ~ {series.date_str(early_stop - 1)}）：平均價格 {early_avg:.1f} 元\n")
+        report.write(f"  * 中期（{series.date_str(mid_start)} ~ {series.date_str(mid_stop - 1)}）：平均價格 {mid_avg:.1f} 元，較初期變化 {mid_change:+.1f}%\n")
+        report.write(f"  * 後期（{series.date_str(late_start)} ~ {series.date_str(late_stop - 1)}）：平均價格 {late_avg:.1f} 元，較中期變化 {late_change:+.1f}%\n")
     
     # 預測分析
-    report += "\n市場預測：\n"
+    report.write("\n市場預測：\n")
     
-    if week_change > 5:
+    point = series.forecast(FORECAST_SUMMARY_DAYS)[-1]
+    if point.lower > current_price:
         prediction = "- 短期趨勢：價格處於上漲通道，短期內可能繼續上漲"
-    elif week_change < -5:
+    elif point.upper < current_price:
         prediction = "- 短期趨勢：價格處於下跌通道，短期內可能繼續下跌"
+    elif point.value > current_price * (1 + FORECAST_FLAT_PERCENT / 100):
+        prediction = "- 短期趨勢：價格略有上漲傾向，但仍在正常波動範圍內"
+    elif point.value < current_price * (1 - FORECAST_FLAT_PERCENT / 100):
+        prediction = "- 短期趨勢：價格略有下跌傾向，但仍在正常波動範圍內"
     else:
         prediction = "- 短期趨勢：價格相對穩定，短期內可能在當前水平波動"
     
-    report += prediction + "\n"
+    report.write(prediction + "\n")
+    report.write(_forecast_summary(series))
     
     # 波動性分析
     if volatility > 10:
-        report += "- 波動分析：價格波動較大，市場不確定性高\n"
+        report.write("- 波動分析：價格波動較大，市場不確定性高\n")
     elif volatility > 5:
-        report += "- 波動分析：價格波動適中，屬於正常市場波動\n"
+        report.write("- 波動分析：價格波動適中，屬於正常市場波動\n")
     else:
-        report += "- 波動分析：價格波動較小，市場相對穩定\n"
+        report.write("- 波動分析：價格波動較小，市場相對穩定\n")
     
     # 購買建議
-    report += "- 購買建議："
+    report.write("- 購買建議：")
     if week_change < -3:
-        report += "價格趨勢向下，可能是合適的購買時機\n"
+        report.write("價格趨勢向下，可能是合適的購買時機\n")
     elif week_change > 3:
-        report += "價格趨勢向上，可考慮等待價格回落後再購買\n"
-    else:
-        report += "價格相對穩定，可根據需要購買\n"
-    
-    return report
-
-# 輔助函數：分析價格趨勢並返回描述
-def _price_trend_description(prices):
-    if len(prices) < 2:
-        return "數據不足以分析趨勢"
-    
-    # 計算最近7天的趨勢
-    recent_prices = prices[-7:] if len(prices) >= 7 else prices
-    price_changes = [recent_prices[i+1]["price"] - recent_prices[i]["price"] for i in range(len(recent_prices)-1)]
-    
-    # 判斷趨勢
-    up_changes = sum(1 for change in price_changes if change > 0)
-    down_changes = sum(1 for change in price_changes if change < 0)
-    flat_changes = len(price_changes) - up_changes - down_changes
-    
-    if up_changes > len(price_changes) * 0.65:
-        return "明顯上漲趨勢"
-    elif down_changes > len(price_changes) * 0.65:
-        return "明顯下跌趨勢"
-    elif up_changes > down_changes and up_changes > flat_changes:
-        return "輕微上漲趨勢"
-    elif down_changes > up_changes and down_changes > flat_changes:
-        return "輕微下跌趨勢"
+        report.write("價格趨勢向上，可考慮等待價格回落後再購買\n")
     else:
-        return "價格相對穩定"
+        report.write("價格相對穩定，可根據需要購買\n")
+    
+    return report.getvalue()
+
+# 搜尋蔬果的工具
+@mcp.tool()
+@METRICS.tool
+def search_fruits(query: str, limit: int = 10) -> str:
+    """依名稱開頭或相似度搜尋蔬果
+    
+    Args:
+        query: 蔬果名稱或名稱開頭（中文、英文或拼音）
+        limit: 最多顯示的筆數
+    
+    Returns:
+        符合的蔬果列表
+    """
+    load_prices()
+    keys = NAMES.complete(query, limit)
+    keys += [key for key, _ in NAMES.suggest(query, limit) if key not in keys]
+    if not keys:
+        return f"找不到與 {query} 相符的蔬果，可讀取 fruits://list 查看所有蔬果"
+    
+    result = io.StringIO()
+    result.write(f"與 {query} 相符的蔬果：\n")
+    result.write("+----------+--------------+--------------+\n")
+    result.write("| 蔬果名稱 | 英文名稱     | 目前價格     |\n")
+    result.write("+----------+--------------+--------------+\n")
+    for key in keys[:limit]:
+        fruit = FRUITS[key]
+        result.write(f"| {fruit['zh_name']:8} | {key:12} | {fruit['current_price']:10.1f} 元/{fruit['unit']} |\n")
+    result.write("+----------+--------------+--------------+\n")
+    
+    return result.getvalue()
+
+# 報告快取統計的資源
+@mcp.resource("cache://reports")
+@METRICS.resource
+def get_report_cache_stats() -> str:
+    """獲取報告快取的命中、未命中與淘汰統計，以及走勢圖的繪製統計"""
+    stats = REPORTS.stats()
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / lookups * 100 if lookups else 0.0
+    
+    result = io.StringIO()
+    result.write("報告快取統計：\n")
+    result.write("+----------------+----------------+\n")
+    result.write("| 指標           | 數值           |\n")
+    result.write("+----------------+----------------+\n")
+    result.write(f"| 命中次數       | {stats['hits']:14d} |\n")
+    result.write(f"| 未命中次數     | {stats['misses']:14d} |\n")
+    result.write(f"| 命中率         | {hit_rate:13.1f}% |\n")
+    result.write(f"| 淘汰次數       | {stats['evictions']:14d} |\n")
+    result.write(f"| 項目數         | {stats['entries']:14d} |\n")
+    result.write(f"| 記憶體 (bytes) | {stats['bytes']:14d} |\n")
+    result.write("+----------------+----------------+\n")
+    
+    # PNG 走勢圖的繪製與合併
+    charts = CHARTS.stats()
+    result.write("\n圖表繪製統計：\n")
+    result.write("+----------------+----------------+\n")
+    result.write(f"| 繪製次數       | {charts['renders']:14d} |\n")
+    result.write(f"| 合併的請求     | {charts['coalesced']:14d} |\n")
+    result.write(f"| 繪製中         | {charts['inflight']:14d} |\n")
+    result.write(f"| 快取項目數     | {len(CHARTS.cache):14d} |\n")
+    result.write("+----------------+----------------+\n")
+    
+    return result.getvalue()
+
+# 工具與資源呼叫統計的資源
+@mcp.resource("metrics://summary")
+def get_metrics_summary() -> str:
+    """獲取各工具與資源的呼叫次數、錯誤次數、延遲與回應大小，以及各工具的排隊狀況"""
+    return METRICS.render_text() + "\n" + POOL.render_text()
+
+@mcp.resource("metrics://prometheus", mime_type="text/plain; version=0.0.4")
+def get_metrics_prometheus() -> str:
+    """以 Prometheus 文字格式獲取各工具與資源的呼叫統計"""
+    return METRICS.render_prometheus() + POOL.render_prometheus(METRICS.server)
+
+# 新增蔬果的輔助函數（寫入價格時使用）
+def _register_fruit(name: str, zh_name: str = "", unit: str = "") -> str:
+    """新增蔬果並建立價格序列
+    
+    Args:
+        name: 蔬果名稱，英文名稱作為鍵值
+        zh_name: 中文名稱，省略時與名稱相同
+        unit: 計價單位，省略時為公斤
+    
+    Returns:
+        英文鍵值
+    """
+    key = urllib.parse.unquote(name).strip().lower()
+    zh_name = zh_name or key
+    unit = unit or "公斤"
+    PRICES.create(key, zh_name, unit)
+    FRUITS[key] = {"zh_name": zh_name, "current_price": 0.0, "unit": unit}
+    NAMES.add(key, zh_name)
+    return key
+
+def _ingest(records, create_missing: bool = False) -> price_ingest.IngestResult:
+    """批次寫入價格紀錄並更新目前價格"""
+    prices = load_prices()
+    result = price_ingest.ingest(prices, records, get_fruit_key, _register_fruit if create_missing else None)
+    for key in result.products:
+        FRUITS[key]["current_price"] = prices[key].last_price
+    return result
+
+# 批次寫入蔬果價格的工具
+@mcp.tool()
+@METRICS.tool
+async def ingest_prices(ticks: Optional[List[Dict]] = None, data: str = "", format: str = "jsonl",
+                        create_missing: bool = False) -> str:
+    """批次寫入多種蔬果的價格
+    
+    Args:
+        ticks: 價格紀錄列表，每筆包含 fruit（名稱）、date（YYYY-MM-DD，省略為今天）與 price，
+            新增蔬果時可附上 zh_name 與 unit
+        data: 批次價格資料，CSV（表頭需含 fruit,date,price）或 JSONL（每行一筆紀錄）
+        format: data 的格式，csv 或 jsonl
+        create_missing: 是否自動新增不存在的蔬果
+    
+    Returns:
+        寫入結果摘要
+    """
+    records = list(ticks or [])
+    if data:
+        try:
+            records.extend(price_ingest.parse(data, format))
+        except (ValueError, KeyError) as e:
+            return f"無法解析價格資料：{e}"
+    
+    if WORKER_ROLE == "reader":
+        return "此服務行程為唯讀（FRUIT_WORKER_ROLE=reader），請將價格寫入 writer 行程"
+    
+    # 寫入時獨佔執行，等候渲染中的報告完成，期間新的渲染也會等候
+    result = await POOL.run("ingest_prices", _ingest, records, create_missing, exclusive=True)
+    return _format_ingest_result(result)
+
+def _format_ingest_result(result: price_ingest.IngestResult) -> str:
+    """將寫入結果轉為文字摘要"""
+    lines = [f"已寫入 {result.accepted} 筆價格，略過 {result.stale} 筆過期紀錄，{len(result.errors)} 筆錯誤。"]
+    for key in result.created:
+        lines.append(f"- 新增蔬果：{FRUITS[key]['zh_name']}({key})")
+    for key, count in result.products.items():
+        fruit = FRUITS[key]
+        lines.append(f"- {fruit['zh_name']}({key})：{count} 筆，目前價格 {fruit['current_price']:.1f} 元/{fruit['unit']}")
+    # 錯誤只列出前幾筆，避免回應過長
+    for error in result.errors[:10]:
+        lines.append(f"- 錯誤：{error}")
+    if len(result.errors) > 10:
+        lines.append(f"- ……其餘 {len(result.errors) - 10} 筆錯誤省略")
+    return "\n".join(lines)
 
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    # python fruit_price_server.py ingest 檔案.csv|檔案.jsonl ...：從檔案批次寫入價格後結束
+    if len(sys.argv) > 2 and sys.argv[1] == "ingest":
+        for path in sys.argv[2:]:
+            result = _ingest(price_ingest.load_file(path), create_missing=True)
+            print(f"{path}：")
+            print(_format_ingest_result(result))
+        if PRICES.history is not None:
+            PRICES.history.flush()
+    else:
+        # python fruit_price_server.py [stdio|sse|streamable-http]：多個用戶端同時連線時使用 sse 或 streamable-http
+        mcp.run(transport=sys.argv[1] if len(sys.argv) > 1 else "stdio")
\ No newline at end of file
@@ -0,0 +1,264 @@
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+# Size of the lat/lon buckets cells are indexed by; an NWS grid cell is about 2.5 km
+BUCKET_DEGREES = 0.05
+# Re-resolve a cell through /points after this long, in case the office redraws its grid
+DEFAULT_MAX_AGE = 30 * 24 * 3600.0
+# /points rounds coordinates to 4 decimals; cells without a polygon match that point only
+POINT_DIGITS = 4
+# Changes are written to the file in one batch, this long after the first of them
+DEFAULT_SAVE_DELAY = 5.0
+
+
+class GridCell(NamedTuple):
+    """An NWS forecast grid cell as resolved by /points, with its outline from the forecast response."""
+    office: str
+    grid_x: int
+    grid_y: int
+    forecast: str
+    forecast_hourly: Optional[str]
+    # Exterior ring as (lon, lat) pairs; a single pair when the outline is unknown
+    ring: Tuple[Tuple[float, float], ...]
+    resolved: float
+
+    @property
+    def key(self) -> Tuple[str, int, int]:
+        return self.office, self.grid_x, self.grid_y
+
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """(min_lon, min_lat, max_lon, max_lat)"""
+        lons = [lon for lon, _ in self.ring]
+        lats = [lat for _, lat in self.ring]
+        return min(lons), min(lats), max(lons), max(lats)
+
+    def contains(self, latitude: float, longitude: float) -> bool:
+        if len(self.ring) == 1:
+            lon, lat = self.ring[0]
+            return (round(latitude, POINT_DIGITS), round(longitude, POINT_DIGITS)) == (lat, lon)
+        return _in_ring(self.ring, longitude, latitude)
+
+
+def _in_ring(ring: Sequence[Tuple[float, float]], x: float, y: float) -> bool:
+    """Ray casting point-in-polygon test."""
+    inside = False
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def _bucket(latitude: float, longitude: float) -> Tuple[int, int]:
+    return math.floor(latitude / BUCKET_DEGREES), math.floor(longitude / BUCKET_DEGREES)
+
+
+def _buckets_of(cell: GridCell) -> Iterator[Tuple[int, int]]:
+    """Every bucket the cell's bounding box touches."""
+    min_lon, min_lat, max_lon, max_lat = cell.bounds
+    lat_lo, lon_lo = _bucket(min_lat, min_lon)
+    lat_hi, lon_hi = _bucket(max_lat, max_lon)
+    for i in range(lat_lo, lat_hi + 1):
+        for j in range(lon_lo, lon_hi + 1):
+            yield i, j
+
+
+class GridCache:
+    """Persistent spatial cache of NWS grid cells, so repeat locations skip the /points lookup.
+
+    Each cell is indexed under every lat/lon bucket its bounding box touches;
+    a lookup tests only the cells in the coordinate's bucket. Any coordinate
+    inside a known cell's outline resolves to that cell's forecast URL, not
+    just the coordinate that was first resolved. Cells expire after max_age
+    seconds. Changes are saved to a JSON file save_delay seconds after the
+    first of them, from a worker thread; call flush() or aflush() on shutdown
+    to write what is still pending. Outside an event loop they are saved at once.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_age: float = DEFAULT_MAX_AGE,
+                 save_delay: float = DEFAULT_SAVE_DELAY):
+        self.path = path
+        self.max_age = max_age
+        self.save_delay = save_delay
+        self._cells: Dict[Tuple[str, int, int], GridCell] = {}
+        self._buckets: Dict[Tuple[int, int], List[GridCell]] = {}
+        self._dirty = False
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._save_task: Optional[asyncio.Task] = None
+        # Snapshots are numbered so a slow write never replaces a newer one
+        self._generation = 0
+        self._written = 0
+        self._write_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._load()
+
+    @classmethod
+    def from_env(cls, default_path: Optional[str], prefix: str = "NWS_GRID_CACHE") -> "GridCache":
+        """Configure from {prefix} (the file; empty keeps cells in memory only), {prefix}_MAX_AGE
+        and {prefix}_SAVE_DELAY."""
+        return cls(path=os.environ.get(prefix, default_path) or None,
+                   max_age=float(os.environ.get(f"{prefix}_MAX_AGE", str(DEFAULT_MAX_AGE))),
+                   save_delay=float(os.environ.get(f"{prefix}_SAVE_DELAY", str(DEFAULT_SAVE_DELAY))))
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def lookup(self, latitude: float, longitude: float) -> Optional[GridCell]:
+        """The known, unexpired cell containing the coordinate."""
+        now = time.time()
+        for cell in self._buckets.get(_bucket(latitude, longitude), ()):
+            if now - cell.resolved < self.max_age and cell.contains(latitude, longitude):
+                self.hits += 1
+                return cell
+        self.misses += 1
+        return None
+
+    def add(self, latitude: float, longitude: float, properties: Dict[str, Any],
+            geometry: Optional[Dict[str, Any]] = None) -> GridCell:
+        """Record the cell from a /points response and the forecast response's geometry.
+
+        Args:
+            latitude: Latitude that was resolved
+            longitude: Longitude that was resolved
+            properties: The "properties" of the /points response
+            geometry: The forecast's GeoJSON geometry (the cell outline), if present
+        """
+        ring: Tuple[Tuple[float, float], ...] = ((round(longitude, POINT_DIGITS), round(latitude, POINT_DIGITS)),)
+        if geometry and geometry.get("type") == "Polygon" and geometry.get("coordinates"):
+            ring = tuple((float(lon), float(lat)) for lon, lat, *_ in geometry["coordinates"][0])
+        cell = GridCell(properties["gridId"], int(properties["gridX"]), int(properties["gridY"]),
+                        properties["forecast"], properties.get("forecastHourly"), ring, time.time())
+        old = self._cells.get(cell.key)
+        if old is not None and len(old.ring) > 1 and len(ring) == 1:
+            # Keep the known outline; another point inside it resolved without geometry
+            return old
+        self._insert(cell)
+        self._changed()
+        return cell
+
+    def discard(self, cell: GridCell) -> None:
+        """Drop a cell whose forecast URL stopped working."""
+        if self._remove(cell.key):
+            self._changed()
+
+    def _insert(self, cell: GridCell) -> None:
+        self._remove(cell.key)
+        self._cells[cell.key] = cell
+        for bucket in _buckets_of(cell):
+            self._buckets.setdefault(bucket, []).append(cell)
+
+    def _remove(self, key: Tuple[str, int, int]) -> bool:
+        cell = self._cells.pop(key, None)
+        if cell is None:
+            return False
+        for bucket in _buckets_of(cell):
+            cells = self._buckets.get(bucket)
+            if cells is not None and cell in cells:
+                cells.remove(cell)
+                if not cells:
+                    del self._buckets[bucket]
+        return True
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        for item in stored.get("cells", []):
+            try:
+                ring = tuple((float(lon), float(lat)) for lon, lat in item["ring"])
+                self._insert(GridCell(item["office"], int(item["grid_x"]), int(item["grid_y"]), item["forecast"],
+                                      item.get("forecast_hourly"), ring, float(item["resolved"])))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    def _changed(self) -> None:
+        if not self.path:
+            return
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(self.save_delay, self._save_later)
+
+    def _save_later(self) -> None:
+        self._save_handle = None
+        self._save_task = asyncio.ensure_future(self.aflush())
+
+    def _cancel_save(self) -> None:
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+
+    def _snapshot(self) -> Tuple[int, List[Dict[str, Any]]]:
+        self._dirty = False
+        self._generation += 1
+        now = time.time()
+        cells = [{"office": c.office, "grid_x": c.grid_x, "grid_y": c.grid_y, "forecast": c.forecast,
+                  "forecast_hourly": c.forecast_hourly, "ring": c.ring, "resolved": c.resolved}
+                 for c in self._cells.values() if now - c.resolved < self.max_age]
+        return self._generation, cells
+
+    def _write(self, generation: int, cells: List[Dict[str, Any]]) -> None:
+        with self._write_lock:
+            if generation <= self._written:
+                return
+            temp = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(temp, "w", encoding="utf-8") as f:
+                    json.dump({"cells": cells}, f)
+                os.replace(temp, self.path)
+            except OSError:
+                # Keep the changes pending; the next change or flush tries again
+                self._dirty = True
+                return
+            self._written = generation
+
+    def flush(self) -> None:
+        """Write pending changes now."""
+        self._cancel_save()
+        if self.path and self._dirty:
+            self._write(*self._snapshot())
+
+    async def aflush(self) -> None:
+        """Write pending changes from a worker thread, without blocking the event loop."""
+        self._cancel_save()
+        if self.path and self._dirty:
+            # The snapshot is taken here, on the loop that changes the cells
+            await asyncio.to_thread(self._write, *self._snapshot())
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "cells": len(self._cells)}
+
+    def render_text(self) -> str:
+        s = self.stats()
+        return f"NWS grid cell cache: {s['cells']} cells, hits {s['hits']}, misses {s['misses']}\n"
+
+    def render_prometheus(self, server: str) -> str:
+        """Lookup counters in the Prometheus text exposition format."""
+        s = self.stats()
+        labels = f'server="{server}"'
+        return "\n".join([
+            "# HELP mcp_grid_cache_hits_total Forecast lookups that skipped /points.",
+            "# TYPE mcp_grid_cache_hits_total counter",
+            f"mcp_grid_cache_hits_total{{{labels}}} {s['hits']}",
+            "# HELP mcp_grid_cache_misses_total Forecast lookups resolved through /points.",
+            "# TYPE mcp_grid_cache_misses_total counter",
+            f"mcp_grid_cache_misses_total{{{labels}}} {s['misses']}",
+            "# HELP mcp_grid_cache_cells Grid cells known to the cache.",
+            "# TYPE mcp_grid_cache_cells gauge",
+            f"mcp_grid_cache_cells{{{labels}}} {s['cells']}",
+        ]) + "\n"
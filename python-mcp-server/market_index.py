@@ -0,0 +1,137 @@
+import heapq
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from price_store import PriceSeries, PriceStore
+
+# 同時保留的（指標, 天數）索引上限，超過時淘汰最久未使用的
+MAX_INDEXES = 16
+DIRECTIONS = ("abs", "up", "down")
+
+
+def week_change(series: PriceSeries, window: int) -> Optional[float]:
+    """最後一筆相對 7 天前的變化百分比（與 window 無關）
+
+    7 天前沒有價格時取在那之前最近的一筆；序列不到 7 天時為 None。二分搜尋，O(log n)。
+    """
+    if not len(series):
+        return None
+    _, stop = series.range_indices(series.dates[0], series.last_day - 7)
+    if not stop:
+        return None
+    base = series.prices[stop - 1]
+    return ((series.last_price / base) - 1) * 100 if base else None
+
+
+def volatility(series: PriceSeries, window: int) -> Optional[float]:
+    """最近 window 天價格的標準差佔平均價的百分比，由統計索引 O(1) 取得"""
+    if len(series) < 2:
+        return None
+    stats = series.window_stats(window)
+    if stats.count < 2 or not stats.mean:
+        return None
+    return stats.std / stats.mean * 100
+
+
+def mean_distance(series: PriceSeries, window: int) -> Optional[float]:
+    """最後一筆相對最近 window 天平均價的偏離百分比，由前綴和 O(1) 取得"""
+    if not len(series):
+        return None
+    mean = series.mean(series.window_start(window))
+    return ((series.last_price / mean) - 1) * 100 if mean else None
+
+
+def forecast_change(series: PriceSeries, window: int) -> Optional[float]:
+    """預測模型對 7 天後的價格相對最後一筆的變化百分比（與 window 無關）"""
+    if len(series) < 2:
+        return None
+    last = series.last_price
+    return ((series.forecast(7)[-1].value / last) - 1) * 100 if last else None
+
+
+# 指標名稱 → (計算函數, 說明)
+SCREEN_METRICS: Dict[str, Tuple[Callable[[PriceSeries, int], Optional[float]], str]] = {
+    "week_change": (week_change, "一週漲跌幅"),
+    "volatility": (volatility, "價格波動性"),
+    "mean_distance": (mean_distance, "偏離平均價"),
+    "forecast_change": (forecast_change, "預測週漲跌"),
+}
+
+
+class MarketIndex:
+    """市場篩選用的各指標索引
+
+    每個（指標, 天數）索引保存所有產品的指標值，第一次查詢時建立。之後只在
+    價格儲存的版本改變時，比對各序列的版本，重新計算有變動的產品，因此查詢的
+    成本與產品數成線性（一次 heap 選取），而不是與產品數 × 天數成正比。
+    """
+
+    def __init__(self, max_indexes: int = MAX_INDEXES):
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[Tuple[str, int], Dict[str, float]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._store_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def top(self, store: PriceStore, metric: str, k: int = 10, window: int = 30,
+            direction: str = "abs") -> List[Tuple[str, float]]:
+        """指標最高的 k 種產品
+
+        Args:
+            store: 價格儲存
+            metric: week_change、volatility、mean_distance 或 forecast_change
+            k: 回傳的產品數
+            window: 計算指標使用的天數
+            direction: abs 依絕對值、up 依數值由大到小、down 依數值由小到大
+
+        Returns:
+            依排名排列的 (英文鍵值, 指標值)
+        """
+        if metric not in SCREEN_METRICS:
+            raise ValueError(f"不支援的指標：{metric}（可用 {'、'.join(SCREEN_METRICS)}）")
+        if direction not in DIRECTIONS:
+            raise ValueError(f"不支援的排序方式：{direction}（可用 {'、'.join(DIRECTIONS)}）")
+        with self._lock:
+            self._sync(store)
+            values = self._index(store, metric, max(window, 1))
+            if direction == "down":
+                return heapq.nsmallest(k, values.items(), key=lambda item: item[1])
+            key = (lambda item: abs(item[1])) if direction == "abs" else (lambda item: item[1])
+            return heapq.nlargest(k, values.items(), key=key)
+
+    def _index(self, store: PriceStore, metric: str, window: int) -> Dict[str, float]:
+        values = self._indexes.get((metric, window))
+        if values is not None:
+            self._indexes.move_to_end((metric, window))
+            return values
+        compute = SCREEN_METRICS[metric][0]
+        values = {}
+        for key, series in store.items():
+            value = compute(series, window)
+            if value is not None:
+                values[key] = value
+        self._indexes[(metric, window)] = values
+        if len(self._indexes) > self.max_indexes:
+            self._indexes.popitem(last=False)
+        return values
+
+    def _sync(self, store: PriceStore) -> None:
+        """重新計算版本有變動的產品在所有索引中的指標值"""
+        if store.version == self._store_version:
+            return
+        changed = []
+        for key, series in store.items():
+            if self._versions.get(key) != series.version:
+                self._versions[key] = series.version
+                changed.append((key, series))
+        # 第一次同步時還沒有索引，記下版本即可
+        for (metric, window), values in self._indexes.items():
+            compute = SCREEN_METRICS[metric][0]
+            for key, series in changed:
+                value = compute(series, window)
+                if value is None:
+                    values.pop(key, None)
+                else:
+                    values[key] = value
+        self._store_version = store.version
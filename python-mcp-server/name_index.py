@@ -0,0 +1,146 @@
+import threading
+import unicodedata
+import urllib.parse
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+DEFAULT_MEMO_SIZE = 4096
+MIN_SUGGESTION_SCORE = 0.3
+
+# 蔬果名稱常用字的繁體→簡體對照；正規化時一律折疊為簡體，
+# 因此只需登錄一種寫法，另一種寫法也能查到
+_TRADITIONAL = "蘋鳳檸櫻龍藍黃蘿蔔蔥薑紅綠蘆筍麥穀異獼棗楊樂釋蓮鮮雞醬蘭葉嬰幹乾髮絲瑩莧蕎賓綫線"
+_SIMPLIFIED = "苹凤柠樱龙蓝黄萝卜葱姜红绿芦笋麦谷异猕枣杨乐释莲鲜鸡酱兰叶婴干干发丝莹苋荞宾线线"
+_FOLD = str.maketrans(_TRADITIONAL, _SIMPLIFIED)
+_SEPARATORS = str.maketrans("", "", " \t-_'·.")
+
+
+def normalize(name: str) -> str:
+    """正規化名稱：URL 解碼、全半形與大小寫統一、去除聲調與分隔符號、繁簡折疊
+
+    Args:
+        name: 蔬果名稱（中文、英文或拼音，可能是 URL 編碼的）
+
+    Returns:
+        正規化後的名稱
+    """
+    if "%" in name:
+        name = urllib.parse.unquote(name)
+    name = unicodedata.normalize("NFKC", name).casefold()
+    if not name.isascii():
+        # 拼音聲調（如 píngguǒ）分解後去掉組合符號
+        name = "".join(c for c in unicodedata.normalize("NFKD", name) if not unicodedata.combining(c))
+        name = unicodedata.normalize("NFC", name).translate(_FOLD)
+    return name.translate(_SEPARATORS)
+
+
+def plural_forms(word: str) -> List[str]:
+    """英文名稱的複數形式（apple → apples、cherry → cherries、peach → peaches）"""
+    if not word.isascii() or not word.isalpha():
+        return []
+    if word.endswith("y") and len(word) > 1 and word[-2] not in "aeiou":
+        return [word[:-1] + "ies"]
+    if word.endswith(("s", "x", "z", "ch", "sh")):
+        return [word + "es"]
+    if word.endswith("o"):
+        return [word + "s", word + "es"]
+    return [word + "s"]
+
+
+def _bigrams(text: str) -> Set[str]:
+    padded = f"^{text}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+class NameIndex:
+    """蔬果名稱解析索引
+
+    - 精確查詢：正規化後的別名（含繁簡折疊、拼音、英文複數）對應鍵值的字典
+    - 前綴查詢：排序的別名列表上二分搜尋
+    - 模糊查詢：別名的雙字元 n-gram 倒排索引，以 Dice 係數排序
+    - 最近查詢的備忘：原始輸入直接對應結果，命中時不需正規化
+
+    可由多個執行緒同時使用：備忘命中與精確查詢只讀取字典，不需加鎖；
+    新增別名、備忘淘汰與走訪排序列表或 n-gram 集合的查詢則以同一把鎖保護。
+    """
+
+    def __init__(self, memo_size: int = DEFAULT_MEMO_SIZE):
+        self.memo_size = memo_size
+        self._exact: Dict[str, str] = {}
+        self._sorted: List[str] = []
+        self._grams: Dict[str, Set[str]] = {}
+        self._alias_grams: Dict[str, int] = {}
+        self._memo: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def add(self, key: str, *aliases: str) -> None:
+        """登錄鍵值與其別名（中文名稱、拼音、其他英文名稱等）"""
+        names = [key, *aliases]
+        with self._lock:
+            for name in names:
+                alias = normalize(name)
+                if not alias:
+                    continue
+                for form in (alias, *plural_forms(alias)):
+                    self._add_alias(form, key)
+            # 新增別名可能改變先前查不到的結果
+            self._memo.clear()
+
+    def _add_alias(self, alias: str, key: str) -> None:
+        if alias not in self._exact:
+            insort(self._sorted, alias)
+            grams = _bigrams(alias)
+            self._alias_grams[alias] = len(grams)
+            for gram in grams:
+                self._grams.setdefault(gram, set()).add(alias)
+        self._exact[alias] = key
+
+    def resolve(self, name: str) -> Optional[str]:
+        """精確解析名稱，找不到時回傳 None"""
+        memo = self._memo
+        if name in memo:
+            return memo[name]
+        key = self._exact.get(normalize(name))
+        with self._lock:
+            if len(memo) >= self.memo_size:
+                # 依插入順序淘汰最舊的一筆
+                memo.pop(next(iter(memo), None), None)
+            memo[name] = key
+        return key
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """以前綴查詢鍵值，依別名字典序排列"""
+        prefix = normalize(prefix)
+        keys: List[str] = []
+        with self._lock:
+            i = bisect_left(self._sorted, prefix)
+            while i < len(self._sorted) and self._sorted[i].startswith(prefix) and len(keys) < limit:
+                key = self._exact[self._sorted[i]]
+                if key not in keys:
+                    keys.append(key)
+                i += 1
+        return keys
+
+    def suggest(self, name: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """模糊查詢，回傳依相似度排序的 (鍵值, 分數)"""
+        query = normalize(name)
+        if not query:
+            return []
+        grams = _bigrams(query)
+        overlaps = Counter()
+        best: Dict[str, float] = {}
+        with self._lock:
+            for gram in grams:
+                overlaps.update(self._grams.get(gram, ()))
+            for alias, overlap in overlaps.items():
+                score = 2 * overlap / (len(grams) + self._alias_grams[alias])
+                if alias.startswith(query) or query.startswith(alias):
+                    score = max(score, 0.5)
+                key = self._exact[alias]
+                if score >= MIN_SUGGESTION_SCORE and score > best.get(key, 0.0):
+                    best[key] = score
+        return sorted(best.items(), key=lambda item: (-item[1], item[0]))[:limit]
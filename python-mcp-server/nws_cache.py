@@ -0,0 +1,317 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional
+
+import httpx
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Upper bound for the heuristic lifetime of responses that only carry Last-Modified
+HEURISTIC_MAX_SECONDS = 300.0
+
+
+def _parse_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def freshness_lifetime(headers: Mapping[str, str], now: float) -> Optional[float]:
+    """Seconds a response stays fresh after it is received (RFC 9111, shared cache).
+
+    Returns None for responses that must not be stored.
+    """
+    directives = _cache_control(headers.get("cache-control"))
+    if "no-store" in directives or "private" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    date = _parse_date(headers.get("date")) or now
+    try:
+        age = float(headers.get("age", 0))
+    except ValueError:
+        age = 0.0
+    for name in ("s-maxage", "max-age"):
+        if directives.get(name):
+            try:
+                return max(float(directives[name]) - age, 0.0)
+            except ValueError:
+                return 0.0
+    if "expires" in headers:
+        expires = _parse_date(headers["expires"])
+        return max(expires - date - age, 0.0) if expires is not None else 0.0
+    last_modified = _parse_date(headers.get("last-modified"))
+    if last_modified is not None and date > last_modified:
+        return max(min((date - last_modified) / 10, HEURISTIC_MAX_SECONDS) - age, 0.0)
+    return 0.0
+
+
+class CacheEntry:
+    """A stored response body with its validators and absolute expiry time."""
+
+    __slots__ = ("body", "etag", "last_modified", "expires", "_data")
+
+    def __init__(self, body: bytes, etag: Optional[str], last_modified: Optional[str], expires: float):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+        self._data: Any = None
+
+    def fresh(self, now: float) -> bool:
+        return now < self.expires
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def json(self) -> Any:
+        """The decoded body, parsed once and shared by every hit; callers must not modify it."""
+        if self._data is None:
+            self._data = json.loads(self.body)
+        return self._data
+
+
+class HTTPCache:
+    """HTTP-semantics response cache for GET requests: an in-memory LRU plus an optional directory.
+
+    Fresh entries (Cache-Control max-age/s-maxage, Expires, or a short heuristic
+    from Last-Modified) are served without touching the network. Stale entries
+    with an ETag or Last-Modified are revalidated with If-None-Match /
+    If-Modified-Since, and a 304 refreshes the stored entry. Entries are keyed
+    by URL only: every request is sent with the same Accept header, so the
+    Vary dimensions never change. With a directory, entries survive restarts
+    and are shared by processes using the same directory; fetch reads and
+    writes those files in a worker thread, off the event loop.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 directory: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.not_modified = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, prefix: str = "NWS_CACHE") -> Optional["HTTPCache"]:
+        """Configure from {prefix}_ENTRIES (0 disables the cache), {prefix}_BYTES and {prefix}_DIR."""
+        max_entries = int(os.environ.get(f"{prefix}_ENTRIES", str(DEFAULT_MAX_ENTRIES)))
+        if max_entries <= 0:
+            return None
+        return cls(max_entries=max_entries,
+                   max_bytes=int(os.environ.get(f"{prefix}_BYTES", str(DEFAULT_MAX_BYTES))),
+                   directory=os.environ.get(f"{prefix}_DIR") or None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def fetch(self, url: str, send: Callable[[str, Optional[Dict[str, str]]], Awaitable[httpx.Response]]) -> Any:
+        """Return the decoded JSON for url, from the cache when fresh, otherwise via send(url, headers).
+
+        Raises httpx.HTTPStatusError for error responses, like an uncached request.
+        """
+        now = time.time()
+        entry = await self._get(url)
+        if entry is not None and entry.fresh(now):
+            self.hits += 1
+            return entry.json()
+
+        if entry is None:
+            self.misses += 1
+            response = await send(url, None)
+        else:
+            self.revalidations += 1
+            response = await send(url, entry.validators())
+        now = time.time()
+
+        if response.status_code == 304 and entry is not None:
+            self.not_modified += 1
+            lifetime = freshness_lifetime(response.headers, now)
+            entry.expires = now + (lifetime or 0.0)
+            entry.etag = response.headers.get("etag", entry.etag)
+            entry.last_modified = response.headers.get("last-modified", entry.last_modified)
+            await self._on_disk(self._write, url, entry)
+            return entry.json()
+
+        response.raise_for_status()
+        lifetime = freshness_lifetime(response.headers, now)
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if lifetime is not None and (lifetime > 0 or etag or last_modified):
+            entry = CacheEntry(response.content, etag, last_modified, now + lifetime)
+            self._insert(url, entry)
+            await self._on_disk(self._write, url, entry)
+            return entry.json()
+        self._forget(url)
+        await self._on_disk(self._remove, url)
+        return response.json()
+
+    async def _on_disk(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a directory operation in a worker thread; a no-op without a directory."""
+        if not self.directory:
+            return None
+        return await asyncio.to_thread(fn, *args)
+
+    async def _get(self, url: str) -> Optional[CacheEntry]:
+        entry = self._in_memory(url)
+        if entry is None:
+            entry = self._loaded(url, await self._on_disk(self._read, url))
+        return entry
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """The stored entry for url, fresh or stale, loading it from the directory on a memory miss.
+
+        get, put and discard touch the directory synchronously; fetch does not use them.
+        """
+        entry = self._in_memory(url)
+        if entry is None:
+            entry = self._loaded(url, self._read(url))
+        return entry
+
+    def put(self, url: str, entry: CacheEntry) -> None:
+        self._insert(url, entry)
+        self._write(url, entry)
+
+    def discard(self, url: str) -> None:
+        self._forget(url)
+        self._remove(url)
+
+    def _in_memory(self, url: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def _loaded(self, url: str, entry: Optional[CacheEntry]) -> Optional[CacheEntry]:
+        if entry is not None:
+            self.disk_hits += 1
+            self._insert(url, entry)
+        return entry
+
+    def _forget(self, url: str) -> None:
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._bytes -= len(entry.body)
+
+    def _insert(self, url: str, entry: CacheEntry) -> None:
+        old = self._entries.pop(url, None)
+        if old is not None:
+            self._bytes -= len(old.body)
+        if len(entry.body) > self.max_bytes:
+            return
+        self._entries[url] = entry
+        self._bytes += len(entry.body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.body)
+            self.evictions += 1
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _read(self, url: str) -> Optional[CacheEntry]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if stored.get("url") != url:
+            return None
+        return CacheEntry(stored["body"].encode("utf-8"), stored.get("etag"), stored.get("last_modified"),
+                          stored.get("expires", 0.0))
+
+    def _write(self, url: str, entry: CacheEntry) -> None:
+        if not self.directory:
+            return
+        path = self._path(url)
+        # Writes may run in several worker threads at once; each gets its own temporary file
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump({"url": url, "etag": entry.etag, "last_modified": entry.last_modified,
+                           "expires": entry.expires, "body": entry.body.decode("utf-8")}, f)
+            # Atomic rename: concurrent readers see either the old or the new entry
+            os.replace(temp, path)
+        except OSError:
+            pass
+
+    def _remove(self, url: str) -> None:
+        if not self.directory:
+            return
+        try:
+            os.remove(self._path(url))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss, revalidation and eviction counts and current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "not_modified": self.not_modified,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+    def render_text(self) -> str:
+        s = self.stats()
+        return (f"NWS response cache: {s['entries']} entries, {s['bytes']} bytes"
+                f"{', directory ' + self.directory if self.directory else ''}\n"
+                f"  hits {s['hits']}, misses {s['misses']}, revalidations {s['revalidations']} "
+                f"({s['not_modified']} not modified), disk hits {s['disk_hits']}, evictions {s['evictions']}\n")
+
+    def render_prometheus(self, server: str) -> str:
+        """Cache counters in the Prometheus text exposition format."""
+        s = self.stats()
+        labels = f'server="{server}"'
+        lines = []
+        for name, help_text in (("hits", "Responses served from the cache without a request."),
+                                ("misses", "Requests with no stored response."),
+                                ("revalidations", "Conditional requests sent for stale responses."),
+                                ("not_modified", "Revalidations answered with 304 Not Modified."),
+                                ("disk_hits", "Stored responses loaded from the cache directory."),
+                                ("evictions", "Responses evicted from the in-memory cache.")):
+            lines += [f"# HELP mcp_http_cache_{name}_total {help_text}",
+                      f"# TYPE mcp_http_cache_{name}_total counter",
+                      f"mcp_http_cache_{name}_total{{{labels}}} {s[name]}"]
+        lines += ["# HELP mcp_http_cache_entries Responses held in the in-memory cache.",
+                  "# TYPE mcp_http_cache_entries gauge",
+                  f"mcp_http_cache_entries{{{labels}}} {s['entries']}"]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,247 @@
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import httpx
+
+from nws_cache import HTTPCache
+
+# HTTP/2 needs the optional h2 package (pip install 'httpx[http2]')
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+ACCEPT = "application/geo+json"
+# NWS does not publish exact limits; stay well under the rate that triggers throttling
+DEFAULT_RATE_LIMIT = 5.0
+DEFAULT_RATE_BURST = 10
+
+
+class TokenBucket:
+    """Paces requests to rate per second, allowing bursts of up to burst requests.
+
+    Each acquire() takes a token, possibly before it has refilled, and then
+    sleeps until it would have; callers are served in the order they arrive.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self.throttled = 0
+        self.wait_seconds = 0.0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate) - 1
+        self._updated = now
+        if self._tokens < 0:
+            wait = -self._tokens / self.rate
+            self.throttled += 1
+            self.wait_seconds += wait
+            await asyncio.sleep(wait)
+
+    def render_text(self) -> str:
+        return (f"NWS rate limit: {self.rate:g} requests/s, burst {self.burst}; "
+                f"{self.throttled} requests delayed, {self.wait_seconds:.2f}s total wait\n")
+
+    def render_prometheus(self, server: str) -> str:
+        """Throttling counters in the Prometheus text exposition format."""
+        labels = f'server="{server}"'
+        return "\n".join([
+            "# HELP mcp_rate_limit_throttled_total Upstream requests delayed by the rate limiter.",
+            "# TYPE mcp_rate_limit_throttled_total counter",
+            f"mcp_rate_limit_throttled_total{{{labels}}} {self.throttled}",
+            "# HELP mcp_rate_limit_wait_seconds_total Time upstream requests spent waiting for the rate limiter.",
+            "# TYPE mcp_rate_limit_wait_seconds_total counter",
+            f"mcp_rate_limit_wait_seconds_total{{{labels}}} {self.wait_seconds}",
+        ]) + "\n"
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one.
+
+    The first caller for a key starts the call as its own task; callers that
+    arrive while it is running await the same task instead of starting
+    another, and all of them get its result or exception. Cancelling one
+    caller does not cancel the shared call. Nothing is cached: once the call
+    finishes, the next caller starts a new one.
+    """
+
+    def __init__(self):
+        # Tasks belong to an event loop, so in-flight calls are kept per loop
+        self._flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Task]]" = \
+            weakref.WeakKeyDictionary()
+        self._waiters: Dict[Hashable, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of fn(), shared with any concurrent call for the same key."""
+        flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+        task = flights.get(key)
+        if task is None:
+            self.calls += 1
+            task = flights[key] = asyncio.ensure_future(fn())
+            self._waiters[key] = 1
+            task.add_done_callback(lambda done: self._finish(flights, key, done))
+        else:
+            self.coalesced += 1
+            self._waiters[key] += 1
+            self.max_waiters = max(self.max_waiters, self._waiters[key])
+        return await asyncio.shield(task)
+
+    def _finish(self, flights: Dict[Hashable, asyncio.Task], key: Hashable, task: asyncio.Task) -> None:
+        flights.pop(key, None)
+        self._waiters.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller was cancelled
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """Calls started, callers that joined a running call, and the most callers sharing one call."""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": sum(len(flights) for flights in self._flights.values()),
+            "max_waiters": self.max_waiters,
+        }
+
+    def render_text(self) -> str:
+        s = self.stats()
+        return (f"NWS request coalescing: {s['calls']} upstream calls, {s['coalesced']} coalesced callers, "
+                f"{s['in_flight']} in flight, at most {s['max_waiters']} callers on one call\n")
+
+    def render_prometheus(self, server: str) -> str:
+        """Coalescing counters in the Prometheus text exposition format."""
+        s = self.stats()
+        labels = f'server="{server}"'
+        return "\n".join([
+            "# HELP mcp_singleflight_calls_total Upstream calls started.",
+            "# TYPE mcp_singleflight_calls_total counter",
+            f"mcp_singleflight_calls_total{{{labels}}} {s['calls']}",
+            "# HELP mcp_singleflight_coalesced_total Callers that joined an identical call in flight.",
+            "# TYPE mcp_singleflight_coalesced_total counter",
+            f"mcp_singleflight_coalesced_total{{{labels}}} {s['coalesced']}",
+            "# HELP mcp_singleflight_in_flight Calls currently in flight.",
+            "# TYPE mcp_singleflight_in_flight gauge",
+            f"mcp_singleflight_in_flight{{{labels}}} {s['in_flight']}",
+        ]) + "\n"
+
+
+class NWSClient:
+    """A long-lived, pooled httpx.AsyncClient shared by every request to the NWS API.
+
+    Connections are kept alive between requests, so a forecast lookup reuses
+    the TCP/TLS connection opened by the /points lookup before it. Use it as
+    the server lifespan: each ``async with`` adds a user and the client is
+    closed when the last one leaves (SSE runs the lifespan once per session).
+    Outside a lifespan the client is created on first use. With a cache,
+    get_json serves fresh responses locally and revalidates stale ones.
+    Concurrent get_json calls for the same URL share one request. Requests
+    that reach the network wait for the rate limiter, if any.
+    """
+
+    def __init__(self, user_agent: str, http2: bool = False,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive: int = DEFAULT_MAX_KEEPALIVE,
+                 keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 cache: Optional[HTTPCache] = None,
+                 rate_limit: Optional[TokenBucket] = None):
+        if http2 and not HTTP2_AVAILABLE:
+            print("HTTP/2 requested but the h2 package is not installed; using HTTP/1.1", file=sys.stderr)
+            http2 = False
+        self.user_agent = user_agent
+        self.http2 = http2
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=keepalive_expiry)
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.cache = cache
+        self.flights = SingleFlight()
+        self.rate_limit = rate_limit
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._users = 0
+
+    @classmethod
+    def from_env(cls, user_agent: str, prefix: str = "NWS") -> "NWSClient":
+        """Configure from {prefix}_HTTP2, {prefix}_MAX_CONNECTIONS, {prefix}_MAX_KEEPALIVE,
+        {prefix}_KEEPALIVE_EXPIRY, {prefix}_TIMEOUT and {prefix}_CONNECT_TIMEOUT, and the
+        response cache from {prefix}_CACHE_ENTRIES, {prefix}_CACHE_BYTES and {prefix}_CACHE_DIR, and the
+        rate limit from {prefix}_RATE_LIMIT (requests per second, 0 disables it) and {prefix}_RATE_BURST."""
+        env = os.environ.get
+        rate = float(env(f"{prefix}_RATE_LIMIT", str(DEFAULT_RATE_LIMIT)))
+        return cls(user_agent,
+                   http2=env(f"{prefix}_HTTP2", "").lower() in ("1", "true", "yes"),
+                   max_connections=int(env(f"{prefix}_MAX_CONNECTIONS", str(DEFAULT_MAX_CONNECTIONS))),
+                   max_keepalive=int(env(f"{prefix}_MAX_KEEPALIVE", str(DEFAULT_MAX_KEEPALIVE))),
+                   keepalive_expiry=float(env(f"{prefix}_KEEPALIVE_EXPIRY", str(DEFAULT_KEEPALIVE_EXPIRY))),
+                   timeout=float(env(f"{prefix}_TIMEOUT", str(DEFAULT_TIMEOUT))),
+                   connect_timeout=float(env(f"{prefix}_CONNECT_TIMEOUT", str(DEFAULT_CONNECT_TIMEOUT))),
+                   cache=HTTPCache.from_env(f"{prefix}_CACHE"),
+                   rate_limit=TokenBucket(rate, int(env(f"{prefix}_RATE_BURST", str(DEFAULT_RATE_BURST))))
+                   if rate > 0 else None)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared client, created on first use in the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            # Pooled connections belong to the loop that opened them; a new loop gets a new pool
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+                headers={"User-Agent": self.user_agent, "Accept": ACCEPT},
+            )
+            self._loop = loop
+        return self._client
+
+    async def get(self, url: str, headers: Optional[dict[str, str]] = None) -> httpx.Response:
+        """GET url on the shared client, after waiting for the rate limiter."""
+        if self.rate_limit is not None:
+            await self.rate_limit.acquire()
+        return await self.client.get(url, headers=headers)
+
+    async def get_json(self, url: str) -> Any:
+        """GET url and decode the JSON body, raising for HTTP errors.
+
+        Callers asking for the same URL while a request is in flight share its
+        result; the returned object is shared and must not be modified.
+        """
+        # Every request carries the same User-Agent; Accept is the header that selects the representation
+        return await self.flights.do((url, ACCEPT), lambda: self._get_json(url))
+
+    async def _get_json(self, url: str) -> Any:
+        if self.cache is not None:
+            return await self.cache.fetch(url, self.get)
+        response = await self.get(url)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            client, self._client, self._loop = self._client, None, None
+            await client.aclose()
+
+    async def __aenter__(self) -> "NWSClient":
+        self._users += 1
+        self.client
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self._users -= 1
+        if not self._users:
+            await self.aclose()
@@ -0,0 +1,175 @@
+import math
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from price_stats import WindowStats
+from price_store import PriceSeries
+
+# 近期趨勢看最後 7 筆價格；分段分析將區間分成三段，初期、中期至少各 10 筆，其餘為後期
+RECENT_DAYS = 7
+SEGMENT_SIZE = 10
+WEEKLY_AVGS = 3
+
+
+@dataclass(frozen=True)
+class PriceAnalysis:
+    """價格區間的分析結果，所有工具與資源的報告都由此渲染"""
+    start: int  # 區間在序列中的起始索引（含）
+    stop: int  # 區間在序列中的結束索引（不含）
+    first_day: int  # 區間第一天（epoch 天數）
+    last_day: int
+    stats: WindowStats
+    recent: WindowStats  # 區間最後 7 筆價格
+    change: float  # 區間內的價格變化（最後一筆 - 第一筆）
+    percent_change: float
+    volatility: float  # 標準差佔平均價的百分比
+    week_change: float  # 最後一筆相對 7 天前的變化百分比
+    two_weeks_change: float
+    month_change: float  # 最後一筆相對區間第一筆的變化百分比
+    weekly_avgs: Tuple[float, ...]  # 區間內前 3 個完整的日曆週（週一至週日）的平均價
+    segments: Tuple[Tuple[int, int, float], ...]  # 初期、中期、後期的 (起始索引, 結束索引, 平均價)
+    trend: str  # 整體趨勢描述
+    recent_trend: str  # 近期趨勢描述
+    ewma: Optional[float]  # 區間延伸到最新一筆時的 7 日指數移動平均
+
+    @property
+    def days(self) -> int:
+        return self.stop - self.start
+
+
+def analyze(series: PriceSeries, start: int = 0, stop: Optional[int] = None) -> PriceAnalysis:
+    """分析價格區間 [start, stop)
+
+    平均、標準差、極值、漲跌次數與各段平均都由統計索引以 O(1) 取得，
+    每週平均取自序列的週彙總，不走訪區間內的價格；需要逐日比較的
+    高於／低於平均價天數由 count_around_mean 另外計算。
+
+    Args:
+        series: 價格序列
+        start: 起始索引（含）
+        stop: 結束索引（不含），省略時為序列結尾
+
+    Returns:
+        分析結果
+    """
+    start, stop, _ = slice(start, stop).indices(len(series))
+    if stop <= start:
+        raise ValueError("分析區間為空")
+
+    stats = series.stats(start, stop)
+    recent = series.stats(max(stop - RECENT_DAYS, start), stop)
+    mean = stats.mean
+
+    count = stop - start
+    last = stats.last
+    prices = series.prices
+    week_ago = prices[stop - 8] if count >= 8 else stats.first
+    two_weeks_ago = prices[stop - 15] if count >= 15 else stats.first
+
+    first_day, last_day = series.dates[start], series.dates[stop - 1]
+    weeks = series.rollup("week").complete_bars(first_day, last_day, limit=WEEKLY_AVGS)
+    weekly_avgs = tuple(week.mean for week in weeks)
+    segments = ()
+    if count >= 2 * SEGMENT_SIZE + 1:
+        size = max(SEGMENT_SIZE, count // 3)
+        bounds = ((start, start + size), (start + size, start + 2 * size), (start + 2 * size, stop))
+        segments = tuple((lo, hi, series.mean(lo, hi)) for lo, hi in bounds)
+
+    change = last - stats.first
+    return PriceAnalysis(
+        start=start,
+        stop=stop,
+        first_day=first_day,
+        last_day=last_day,
+        stats=stats,
+        recent=recent,
+        change=change,
+        percent_change=_percent(last, stats.first),
+        volatility=(stats.std / mean) * 100 if mean else 0.0,
+        week_change=_percent(last, week_ago),
+        two_weeks_change=_percent(last, two_weeks_ago),
+        month_change=_percent(last, stats.first),
+        weekly_avgs=weekly_avgs,
+        segments=segments,
+        trend=describe_trend(stats),
+        recent_trend=describe_recent_trend(recent),
+        ewma=series.rolling().ewma if stop == len(series) else None,
+    )
+
+
+def analyze_window(series: PriceSeries, days: Optional[int] = None) -> PriceAnalysis:
+    """分析最近 days 天，days 為 None 時分析全部歷史"""
+    return analyze(series, series.window_start(days))
+
+
+def count_around_mean(series: PriceSeries, start: int = 0, stop: Optional[int] = None) -> Tuple[int, int]:
+    """[start, stop) 範圍內高於與低於平均價的天數，需走訪區間，O(n)
+
+    前綴和得到的平均有捨入誤差（1 天的區間可能是 35.50000000000001），
+    逐日比較改用區間價格精確計算的平均。
+    """
+    _, prices = series.slice(start, stop)
+    if not len(prices):
+        return 0, 0
+    mean = math.fsum(prices) / len(prices)
+    return sum(map(mean.__lt__, prices)), sum(map(mean.__gt__, prices))
+
+
+def _percent(value: float, base: float) -> float:
+    return ((value / base) - 1) * 100 if base else 0.0
+
+
+def _classify_moves(stats: WindowStats, threshold: float, labels: Tuple[str, str, str, str, str]) -> str:
+    """依漲跌次數分類走勢
+
+    Args:
+        stats: 價格區間的統計摘要
+        threshold: 判定為持續上漲／下跌的漲跌次數比例
+        labels: 持續上漲、持續下跌、偏上漲、偏下跌、其他 的描述
+    """
+    change_count = stats.count - 1
+    up, down, flat = stats.up, stats.down, stats.flat
+    if up > threshold * change_count:
+        return labels[0]
+    if down > threshold * change_count:
+        return labels[1]
+    if up > down and up > flat:
+        return labels[2]
+    if down > up and down > flat:
+        return labels[3]
+    return labels[4]
+
+
+def describe_trend(stats: WindowStats) -> str:
+    """整體趨勢描述：起訖價格變化幅度加上區間內的漲跌分佈"""
+    if stats.count < 2:
+        return "數據不足以分析趨勢"
+
+    percent_change = _percent(stats.last, stats.first)
+    if percent_change > 10:
+        description = "大幅上漲"
+    elif percent_change > 5:
+        description = "明顯上漲"
+    elif percent_change > 0:
+        description = "小幅上漲"
+    elif percent_change < -10:
+        description = "大幅下跌"
+    elif percent_change < -5:
+        description = "明顯下跌"
+    elif percent_change < 0:
+        description = "小幅下跌"
+    else:
+        description = "基本持平"
+
+    description += f" ({percent_change:+.1f}%)"
+    description += _classify_moves(stats, 0.7, ("，持續上漲趨勢", "，持續下跌趨勢", "，有波動但總體向上",
+                                                "，有波動但總體向下", "，波動較大"))
+    return description
+
+
+def describe_recent_trend(recent: WindowStats) -> str:
+    """近期趨勢描述：最近 7 筆價格的漲跌分佈"""
+    if recent.count < 2:
+        return "數據不足以分析趨勢"
+    return _classify_moves(recent, 0.65, ("明顯上漲趨勢", "明顯下跌趨勢", "輕微上漲趨勢", "輕微下跌趨勢",
+                                          "價格相對穩定"))
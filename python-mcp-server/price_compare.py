@@ -0,0 +1,103 @@
+import math
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from operator import mul
+from typing import List, Sequence, Tuple
+
+from price_store import PriceSeries
+
+
+@dataclass(frozen=True)
+class MarketComparison:
+    """多種蔬果在共同日期上的比較結果，各欄位依輸入順序排列"""
+    first_day: int  # 共同區間第一天（epoch 天數）
+    last_day: int
+    days: int  # 共同的日期數
+    last: Tuple[float, ...]  # 區間最後一筆價格
+    means: Tuple[float, ...]
+    changes: Tuple[float, ...]  # 區間內的價格變化百分比
+    ranges: Tuple[float, ...]  # 區間內最高與最低價的差距佔平均價的百分比
+    relative: Tuple[float, ...]  # 平均價相對所有蔬果平均價的百分比
+    correlations: Tuple[Tuple[float, ...], ...]  # 價格的皮爾森相關係數矩陣
+
+
+def align(series_list: Sequence[PriceSeries], days: int) -> Tuple[List[int], List[Sequence[float]]]:
+    """取出多個序列在最近 days 天（以最早結束的序列為準）中共同擁有的日期與價格
+
+    各序列以二分搜尋找出區間的索引範圍；區間內都沒有缺漏的日期時直接回傳
+    零複製的價格視圖，否則取日期的交集後再挑出對應的價格。
+
+    Returns:
+        (共同日期, 每個序列對應的價格)
+    """
+    end = min(series.last_day for series in series_list)
+    start = end - max(days, 1) + 1
+    bounds = [(bisect_left(series.dates, start), bisect_right(series.dates, end)) for series in series_list]
+    if all(hi - lo == end - start + 1 for lo, hi in bounds):
+        dates = list(range(start, end + 1))
+        return dates, [series.prices[lo:hi] for series, (lo, hi) in zip(series_list, bounds)]
+
+    common = set(series_list[0].dates[bounds[0][0]:bounds[0][1]])
+    for series, (lo, hi) in zip(series_list[1:], bounds[1:]):
+        common.intersection_update(series.dates[lo:hi])
+    dates = sorted(common)
+    columns = []
+    for series, (lo, hi) in zip(series_list, bounds):
+        position = {day: i for i, day in enumerate(series.dates[lo:hi], lo)}
+        prices = series.prices
+        columns.append([prices[position[day]] for day in dates])
+    return dates, columns
+
+
+def correlation_matrix(columns: Sequence[Sequence[float]]) -> Tuple[Tuple[float, ...], ...]:
+    """價格欄之間的皮爾森相關係數矩陣
+
+    每個欄位只去平均、求範數一次，之後每一對只需一次 C 層級的內積；
+    價格完全不變的欄位與其他欄位的相關係數記為 0。
+    """
+    centered = []
+    norms = []
+    for column in columns:
+        mean = math.fsum(column) / len(column)
+        deviations = [price - mean for price in column]
+        centered.append(deviations)
+        norms.append(math.sqrt(sum(map(mul, deviations, deviations))))
+
+    count = len(columns)
+    matrix = [[1.0] * count for _ in range(count)]
+    for i in range(count):
+        for j in range(i + 1, count):
+            denominator = norms[i] * norms[j]
+            value = sum(map(mul, centered[i], centered[j])) / denominator if denominator else 0.0
+            matrix[i][j] = matrix[j][i] = max(-1.0, min(1.0, value))
+    return tuple(map(tuple, matrix))
+
+
+def compare(series_list: Sequence[PriceSeries], days: int) -> MarketComparison:
+    """比較多種蔬果在共同日期上的價格
+
+    Args:
+        series_list: 價格序列，至少兩個且都不為空
+        days: 要比較的天數
+
+    Returns:
+        比較結果
+    """
+    dates, columns = align(series_list, days)
+    if len(dates) < 2:
+        raise ValueError("共同的日期不足以比較")
+
+    means = tuple(math.fsum(column) / len(column) for column in columns)
+    basket = math.fsum(means) / len(means)
+    return MarketComparison(
+        first_day=dates[0],
+        last_day=dates[-1],
+        days=len(dates),
+        last=tuple(column[-1] for column in columns),
+        means=means,
+        changes=tuple(((column[-1] / column[0]) - 1) * 100 if column[0] else 0.0 for column in columns),
+        ranges=tuple((max(column) - min(column)) / mean * 100 if mean else 0.0
+                     for column, mean in zip(columns, means)),
+        relative=tuple(((mean / basket) - 1) * 100 if basket else 0.0 for mean in means),
+        correlations=correlation_matrix(columns),
+    )
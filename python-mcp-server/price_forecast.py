@@ -0,0 +1,112 @@
+import math
+from typing import List, NamedTuple, Optional, Sequence
+
+# 平滑參數：水準、趨勢、季節（以週為週期）；趨勢以 PHI 阻尼，避免長期預測無限延伸
+ALPHA = 0.3
+BETA = 0.05
+GAMMA = 0.1
+PHI = 0.98
+SEASON = 7
+# 一步預測誤差平方的指數加權權重，用於估計預測區間
+ERROR_WEIGHT = 0.05
+# 95% 預測區間
+Z_95 = 1.96
+# 由檔案載入的序列建立模型時，只以最後 WARMUP_DAYS 筆價格訓練
+WARMUP_DAYS = 120
+
+
+class ForecastPoint(NamedTuple):
+    """單日的預測值與 95% 預測區間"""
+    day: int  # epoch 天數
+    value: float
+    lower: float
+    upper: float
+
+
+class HoltWinters:
+    """加法 Holt-Winters 模型（阻尼趨勢、每週季節項），每筆新價格以 O(1) 更新
+
+    季節項以星期幾為索引（週一為 0），缺少價格的日期不需補值：水準依間隔的
+    天數延伸趨勢後再更新。一步預測誤差的平方以指數加權平均，作為預測區間的
+    標準差估計。
+    """
+
+    __slots__ = ("level", "trend", "season", "variance", "count", "last_day")
+
+    def __init__(self):
+        self.level = 0.0
+        self.trend = 0.0
+        self.season = [0.0] * SEASON
+        self.variance: Optional[float] = None
+        self.count = 0
+        self.last_day: Optional[int] = None
+
+    @classmethod
+    def fit(cls, dates: Sequence[int], prices: Sequence[float]) -> "HoltWinters":
+        """依序以既有的日期與價格訓練模型"""
+        model = cls()
+        for day, price in zip(dates, prices):
+            model.push(day, price)
+        return model
+
+    def push(self, day: int, price: float) -> None:
+        """加入一筆新價格，日期必須晚於已加入的最後一筆"""
+        if not self.count:
+            self.level = price
+            self.count = 1
+            self.last_day = day
+            return
+
+        gap = day - self.last_day
+        dow = _weekday(day)
+        damped = _damped_sum(gap)
+        base = self.level + damped * self.trend
+        error = price - (base + self.season[dow])
+        squared = error * error
+        self.variance = squared if self.variance is None else self.variance + ERROR_WEIGHT * (squared - self.variance)
+
+        level = ALPHA * (price - self.season[dow]) + (1 - ALPHA) * base
+        self.trend = BETA * (level - self.level) / gap + (1 - BETA) * PHI ** gap * self.trend
+        self.level = level
+        self.season[dow] += GAMMA * (price - level - self.season[dow])
+        self.count += 1
+        self.last_day = day
+
+    @property
+    def sigma(self) -> float:
+        """一步預測誤差的標準差估計"""
+        return math.sqrt(self.variance) if self.variance is not None else 0.0
+
+    def forecast(self, horizon: int) -> List[ForecastPoint]:
+        """最後一筆之後 horizon 天的每日預測
+
+        Args:
+            horizon: 預測天數
+
+        Returns:
+            每天的預測值與 95% 預測區間
+        """
+        if not self.count:
+            raise ValueError("尚無價格可供預測")
+        points = []
+        # 第 h 步的誤差變異數 ≈ σ²(1 + Σ_{j<h} (α(1 + φ_j β))²)，φ_j 為 j 步的阻尼累計
+        spread = 0.0
+        sigma = self.sigma
+        for h in range(1, horizon + 1):
+            day = self.last_day + h
+            value = self.level + _damped_sum(h) * self.trend + self.season[_weekday(day)]
+            if h > 1:
+                spread += (ALPHA * (1 + _damped_sum(h - 1) * BETA)) ** 2
+            margin = Z_95 * sigma * math.sqrt(1 + spread)
+            points.append(ForecastPoint(day, value, value - margin, value + margin))
+        return points
+
+
+def _weekday(day: int) -> int:
+    # 1970-01-01 為週四
+    return (day + 3) % SEASON
+
+
+def _damped_sum(steps: int) -> float:
+    """φ + φ² + … + φ^steps"""
+    return PHI * (1 - PHI ** steps) / (1 - PHI)
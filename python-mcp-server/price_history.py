@@ -0,0 +1,308 @@
+import mmap
+import os
+import struct
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+# 價格歷史檔格式（小端序）：
+#
+#   檔頭（64 bytes）：magic、版本、產品數、索引容量、索引位移、資料結尾、序號
+#   索引（每筆 128 bytes）：英文鍵值、中文名稱、單位、資料區塊位移、容量、筆數
+#   資料區塊：每種產品一塊，int32 日期欄（epoch 天數）* 容量，接著 float64 價格欄 * 容量
+#
+# 檔案只會向後追加：區塊容量不足時在檔尾配置兩倍容量的新區塊並更新索引，
+# 舊區塊不回收。檔頭的序號兼作 seqlock：寫入前遞增為奇數、寫完再遞增為偶數，
+# 讀取端可藉此判斷資料是否更新，並在讀到寫入中途（奇數或前後不一致）時重讀。
+MAGIC = b"FPH1"
+FORMAT_VERSION = 1
+HEADER_SIZE = 64
+DEFAULT_INDEX_CAPACITY = 256
+DEFAULT_BLOCK_CAPACITY = 64
+
+_HEADER = struct.Struct("<4sHHIIQQQ")
+_ENTRY = struct.Struct("<40s48s16sQII8x")
+_LENGTH = struct.Struct("<I")
+_SEQUENCE = struct.Struct("<Q")
+_LENGTH_OFFSET = 116  # 索引項目中「筆數」欄位的位移
+_SEQUENCE_OFFSET = 32  # 檔頭中「序號」欄位的位移
+# 唯讀端等候寫入完成的上限（秒）；超過時視為寫入行程在寫入中途結束
+_READ_TIMEOUT = 1.0
+
+T = TypeVar("T")
+
+
+class PriceHistoryError(Exception):
+    """價格歷史檔格式錯誤"""
+
+
+def _encode(text: str, size: int) -> bytes:
+    data = text.encode("utf-8")
+    if len(data) > size:
+        raise ValueError(f"名稱過長（最多 {size} bytes）：{text}")
+    return data
+
+
+def _decode(data: bytes) -> str:
+    return data.rstrip(b"\0").decode("utf-8")
+
+
+class PriceHistoryFile:
+    """記憶體映射的價格歷史檔
+
+    開檔只讀取檔頭與索引，成本與歷史長度無關；價格資料以 memoryview
+    直接指向映射區域，多個行程映射同一個檔案時共用作業系統的頁面快取。
+    一個檔案同時只應有一個寫入行程；其他行程以 readonly 開啟，並以 refresh()
+    依檔頭的序號取得寫入行程新增的產品與價格。唯讀端讀取檔頭與索引項目時
+    以序號檢查一致性，不會讀到寫入行程改寫到一半的項目。
+    """
+
+    def __init__(self, path: str, index_capacity: int = DEFAULT_INDEX_CAPACITY, readonly: bool = False):
+        if sys.byteorder != "little":
+            raise PriceHistoryError("價格歷史檔僅支援小端序平台")
+        self.path = path
+        self.readonly = readonly
+        if readonly:
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                raise PriceHistoryError(f"價格歷史檔不存在或為空，需先由寫入行程建立：{path}")
+            self._fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        else:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        self._mm = None
+        self._view = None
+        if os.fstat(self._fd).st_size == 0:
+            self._initialize(index_capacity)
+        self._remap()
+
+        magic, version = _HEADER.unpack_from(self._mm, 0)[:2]
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise PriceHistoryError(f"不是有效的價格歷史檔：{path}")
+        self._count = 0
+        self._slots = {}
+        self._writing_depth = 0
+        if not readonly and self.sequence % 2:
+            # 上一個寫入行程在寫入中途結束；寫入端只有一個，直接結束該次寫入
+            _SEQUENCE.pack_into(self._mm, _SEQUENCE_OFFSET, self.sequence + 1)
+        self._seen = self._read_index()
+
+    def _read_index(self) -> int:
+        """讀取檔頭與上次讀取後新增的索引項目
+
+        Returns:
+            讀取時的序號
+        """
+        def read():
+            if os.fstat(self._fd).st_size != len(self._mm):
+                self._remap()
+            header = _HEADER.unpack_from(self._mm, 0)
+            slots = {}
+            for slot in range(self._count, header[3]):
+                slots[_decode(_ENTRY.unpack_from(self._mm, self._entry_offset(slot, header[5]))[0])] = slot
+            return header, slots
+
+        ((_, _, _, count, self._index_capacity, self._index_offset, self._data_end, _), slots), sequence = \
+            self._read_consistent(read)
+        self._slots.update(slots)
+        self._count = count
+        return sequence
+
+    def _read_consistent(self, read: Callable[[], T]) -> Tuple[T, int]:
+        """在序號為偶數且前後不變的情況下執行 read()，否則重讀
+
+        寫入端自己的讀取不會與寫入交錯，直接執行。
+
+        Returns:
+            (read() 的結果, 讀取時的序號)
+        """
+        if not self.readonly:
+            value = read()
+            return value, self.sequence
+        deadline = None
+        while True:
+            before = self.sequence
+            if not before % 2:
+                value = read()
+                if self.sequence == before:
+                    return value, before
+            if deadline is None:
+                deadline = time.monotonic() + _READ_TIMEOUT
+            elif time.monotonic() > deadline:
+                raise PriceHistoryError(f"價格歷史檔持續處於寫入中，寫入行程可能已中止：{self.path}")
+            time.sleep(0)
+
+    def refresh(self) -> bool:
+        """序號改變時重新讀取檔頭與索引，取得其他行程新增的產品；檔案變大時重新映射
+
+        Returns:
+            序號是否改變
+        """
+        if self.sequence == self._seen:
+            return False
+        self._seen = self._read_index()
+        return True
+
+    def _initialize(self, index_capacity: int) -> None:
+        data_end = HEADER_SIZE + index_capacity * _ENTRY.size
+        os.ftruncate(self._fd, data_end)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, _HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0, index_capacity, HEADER_SIZE, data_end, 0))
+
+    def _remap(self) -> None:
+        # 不使用 mmap.resize：既有的 memoryview 仍指向舊映射，resize 會失敗；
+        # 改為建立涵蓋新大小的映射，舊映射在其視圖釋放後自動關閉
+        access = mmap.ACCESS_READ if self.readonly else mmap.ACCESS_WRITE
+        self._mm = mmap.mmap(self._fd, os.fstat(self._fd).st_size, access=access)
+        self._view = memoryview(self._mm)
+
+    def _ensure_size(self, end: int) -> None:
+        size = len(self._mm)
+        if end <= size:
+            return
+        new_size = max(end, size * 2)
+        new_size = -(-new_size // mmap.PAGESIZE) * mmap.PAGESIZE
+        os.ftruncate(self._fd, new_size)
+        self._remap()
+
+    def _check_writable(self) -> None:
+        if self.readonly:
+            raise PriceHistoryError(f"價格歷史檔以唯讀方式開啟：{self.path}")
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """寫入期間序號為奇數，結束後為偶數；巢狀的寫入只在最外層遞增"""
+        self._check_writable()
+        if not self._writing_depth:
+            _SEQUENCE.pack_into(self._mm, _SEQUENCE_OFFSET, self.sequence + 1)
+        self._writing_depth += 1
+        try:
+            yield
+        finally:
+            self._writing_depth -= 1
+            if not self._writing_depth:
+                _SEQUENCE.pack_into(self._mm, _SEQUENCE_OFFSET, self.sequence + 1)
+
+    def _write_header(self) -> None:
+        _HEADER.pack_into(self._mm, 0, MAGIC, FORMAT_VERSION, 0, self._count, self._index_capacity,
+                          self._index_offset, self._data_end, self.sequence)
+
+    def _entry_offset(self, slot: int, index_offset: Optional[int] = None) -> int:
+        return (self._index_offset if index_offset is None else index_offset) + slot * _ENTRY.size
+
+    def _allocate(self, size: int) -> int:
+        offset = -(-self._data_end // 8) * 8
+        self._ensure_size(offset + size)
+        self._data_end = offset + size
+        return offset
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slots
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def sequence(self) -> int:
+        """每次寫入遞增的序號，寫入中為奇數"""
+        return _SEQUENCE.unpack_from(self._mm, _SEQUENCE_OFFSET)[0]
+
+    def slot(self, key: str) -> int:
+        return self._slots[key]
+
+    def entries(self) -> Iterator[Tuple[str, str, str, int]]:
+        """逐一列出 (英文鍵值, 中文名稱, 單位, 索引位置)"""
+        for key, slot in self._slots.items():
+            _, zh_name, unit, _, _, _ = _ENTRY.unpack_from(self._mm, self._entry_offset(slot))
+            yield key, _decode(zh_name), _decode(unit), slot
+
+    def add(self, key: str, zh_name: str = "", unit: str = "", capacity: int = DEFAULT_BLOCK_CAPACITY) -> int:
+        """新增產品並配置資料區塊
+
+        Returns:
+            產品的索引位置
+        """
+        if key in self._slots:
+            return self._slots[key]
+        self._check_writable()
+        encoded = (_encode(key, 40), _encode(zh_name, 48), _encode(unit, 16))
+        with self._writing():
+            if self._count == self._index_capacity:
+                self._relocate_index(self._index_capacity * 2)
+
+            capacity = max(capacity, 2)
+            offset = self._allocate(12 * capacity)
+            slot = self._count
+            _ENTRY.pack_into(self._mm, self._entry_offset(slot), *encoded, offset, capacity, 0)
+            self._count += 1
+            self._slots[key] = slot
+            self._write_header()
+        return slot
+
+    def _relocate_index(self, capacity: int) -> None:
+        with self._writing():
+            size = self._count * _ENTRY.size
+            offset = self._allocate(capacity * _ENTRY.size)
+            self._view[offset:offset + size] = self._view[self._index_offset:self._index_offset + size]
+            self._index_offset = offset
+            self._index_capacity = capacity
+            self._write_header()
+
+    def columns(self, slot: int) -> Tuple[memoryview, memoryview, int]:
+        """取得產品的日期欄、價格欄視圖（涵蓋整個容量）與目前筆數"""
+        def read():
+            _, _, _, offset, capacity, length = _ENTRY.unpack_from(self._mm, self._entry_offset(slot))
+            if offset + 12 * capacity > len(self._mm):
+                # 唯讀端讀到寫入行程在上次 refresh() 之後搬移的區塊
+                self._remap()
+            return offset, capacity, length
+
+        (offset, capacity, length), _ = self._read_consistent(read)
+        dates = self._view[offset:offset + 4 * capacity].cast("i")
+        prices = self._view[offset + 4 * capacity:offset + 12 * capacity].cast("d")
+        return dates, prices, length
+
+    def length(self, slot: int) -> int:
+        return self._read_consistent(
+            lambda: _LENGTH.unpack_from(self._mm, self._entry_offset(slot) + _LENGTH_OFFSET)[0])[0]
+
+    def set_length(self, slot: int, length: int) -> None:
+        """提交產品的筆數；資料須先寫入，讀取端才會看到完整的紀錄"""
+        with self._writing():
+            _LENGTH.pack_into(self._mm, self._entry_offset(slot) + _LENGTH_OFFSET, length)
+
+    def grow(self, slot: int, capacity: int, rows: Optional[int] = None) -> Tuple[memoryview, memoryview]:
+        """將產品搬到檔尾容量更大的新區塊，回傳新的日期欄與價格欄視圖
+
+        Args:
+            slot: 產品位置
+            capacity: 新的容量
+            rows: 要搬移的筆數，包含已寫入但尚未以 set_length 提交的筆數；省略時為已提交的筆數
+        """
+        self._check_writable()
+        old_dates, old_prices, length = self.columns(slot)
+        copied = length if rows is None else rows
+        offset = self._allocate(12 * capacity)
+        # 配置可能重新映射，舊視圖仍然有效，可直接複製；新區塊在更新索引前對讀取端不可見
+        dates = self._view[offset:offset + 4 * capacity].cast("i")
+        prices = self._view[offset + 4 * capacity:offset + 12 * capacity].cast("d")
+        dates[:copied] = old_dates[:copied]
+        prices[:copied] = old_prices[:copied]
+
+        # 原地改寫索引項目的位移與容量，期間讀取端會等候並重讀
+        with self._writing():
+            key, zh_name, unit, _, _, _ = _ENTRY.unpack_from(self._mm, self._entry_offset(slot))
+            _ENTRY.pack_into(self._mm, self._entry_offset(slot), key, zh_name, unit, offset, capacity, length)
+            self._write_header()
+        return dates, prices
+
+    def flush(self) -> None:
+        if not self.readonly:
+            self._mm.flush()
+
+    def close(self) -> None:
+        if self._fd is not None:
+            self.flush()
+            self._view = None
+            self._mm = None
+            os.close(self._fd)
+            self._fd = None
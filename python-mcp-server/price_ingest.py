@@ -0,0 +1,118 @@
+import csv
+import io
+import json
+import math
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from price_store import PriceStore, to_epoch_day
+
+# 每筆價格紀錄的欄位：fruit（名稱）、date（YYYY-MM-DD，省略為今天）、price，
+# 新增蔬果時可附上 zh_name 與 unit
+NAME_FIELDS = ("fruit", "name", "product")
+
+
+@dataclass
+class IngestResult:
+    """批次寫入的結果"""
+    accepted: int = 0
+    stale: int = 0  # 日期不晚於既有最後一筆而略過的紀錄
+    products: Dict[str, int] = field(default_factory=dict)
+    created: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+
+def parse_csv(text: str) -> Iterator[dict]:
+    """解析含表頭的 CSV 價格資料"""
+    yield from csv.DictReader(io.StringIO(text))
+
+
+def parse_jsonl(text: str) -> Iterator[dict]:
+    """解析 JSONL 價格資料，每行一筆 JSON 物件"""
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def parse(text: str, format: str) -> Iterator[dict]:
+    """依格式（csv 或 jsonl）解析批次價格資料"""
+    if format == "csv":
+        return parse_csv(text)
+    if format == "jsonl":
+        return parse_jsonl(text)
+    raise ValueError(f"不支援的格式：{format}（可用 csv 或 jsonl）")
+
+
+def load_file(path: str) -> Iterator[dict]:
+    """讀取 CSV 或 JSONL 價格檔，依副檔名判斷格式"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    return parse(text, "csv" if path.lower().endswith(".csv") else "jsonl")
+
+
+def ingest(
+    store: PriceStore,
+    records: Iterable[dict],
+    resolve: Callable[[str], Optional[str]],
+    create: Optional[Callable[[str, str, str], str]] = None,
+) -> IngestResult:
+    """將多種蔬果的價格紀錄批次追加到價格儲存
+
+    同一蔬果同一天的多筆紀錄以最後一筆為準；日期不晚於既有最後一筆的紀錄
+    視為過期並略過。價格必須是正的有限數值、日期不得晚於今天，否則記為錯誤，
+    不寫入價格儲存。每種蔬果的紀錄依日期排序後一次追加並提交，統計索引
+    與滾動統計隨追加逐筆更新，不需重新計算。
+
+    Args:
+        store: 價格儲存
+        records: 價格紀錄
+        resolve: 將名稱轉為英文鍵值的函數，找不到時回傳 None
+        create: 新增蔬果的函數，參數為 (名稱, 中文名稱, 單位)，回傳英文鍵值；
+            為 None 時不新增，找不到的蔬果視為錯誤
+
+    Returns:
+        批次寫入的結果
+    """
+    result = IngestResult()
+    today = date.today()
+    last_valid_day = to_epoch_day(today)
+    batches: Dict[str, Dict[int, float]] = {}
+
+    for line, record in enumerate(records, 1):
+        try:
+            name = next((str(record[f]) for f in NAME_FIELDS if record.get(f)), "")
+            if not name:
+                raise ValueError("缺少 fruit 欄位")
+            price = float(record["price"])
+            if not (math.isfinite(price) and price > 0):
+                raise ValueError(f"價格必須為正數：{record['price']}")
+            day = to_epoch_day(record.get("date") or today)
+            if day > last_valid_day:
+                raise ValueError(f"日期不得晚於今天：{record.get('date')}")
+
+            key = resolve(name)
+            if key is None:
+                if create is None:
+                    raise ValueError(f"找不到 {name}")
+                key = create(name, record.get("zh_name") or "", record.get("unit") or "")
+                result.created.append(key)
+            batches.setdefault(key, {})[day] = price
+        except (AttributeError, KeyError, ValueError, TypeError) as e:
+            result.errors.append(f"第 {line} 筆：{e}")
+
+    for key, ticks in batches.items():
+        series = store[key]
+        last_day = series.last_day
+        days = sorted(ticks)
+        if last_day is not None:
+            fresh = [day for day in days if day > last_day]
+            result.stale += len(days) - len(fresh)
+            days = fresh
+        count = series.extend((day, ticks[day]) for day in days)
+        if count:
+            result.accepted += count
+            result.products[key] = count
+
+    return result
@@ -0,0 +1,78 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from price_analytics import PriceAnalysis
+from price_forecast import ForecastPoint
+from price_store import PriceSeries, from_epoch_day
+
+# 衍生數值（平均、百分比等）保留的小數位數；原始價格不取捨
+DIGITS = 3
+
+
+def dumps(payload: Any) -> str:
+    """緊湊的 JSON：不跳脫中文、不加空白"""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, DIGITS)
+
+
+def analysis_payload(series: PriceSeries, analysis: PriceAnalysis,
+                     around_mean: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+    """價格區間分析結果的數值摘要，直接由分析結果組成，不經過文字渲染
+
+    around_mean 為 count_around_mean 的結果，有提供時才列出高於／低於平均價的天數。
+    """
+    stats = analysis.stats
+    payload = {
+        "start": from_epoch_day(analysis.first_day),
+        "end": from_epoch_day(analysis.last_day),
+        "days": analysis.days,
+        "first": stats.first,
+        "last": stats.last,
+        "mean": _round(stats.mean),
+        "std": _round(stats.std),
+        "min": stats.min,
+        "max": stats.max,
+        "max_change": _round(stats.max_change),
+        "up": stats.up,
+        "down": stats.down,
+        "flat": stats.flat,
+        "change": _round(analysis.change),
+        "percent_change": _round(analysis.percent_change),
+        "volatility": _round(analysis.volatility),
+        "week_change": _round(analysis.week_change),
+        "two_weeks_change": _round(analysis.two_weeks_change),
+        "month_change": _round(analysis.month_change),
+        "missing_days": series.missing_days(analysis.start, analysis.stop),
+        "weekly_avgs": [_round(value) for value in analysis.weekly_avgs],
+        "segments": [{"start": series.date_str(lo), "end": series.date_str(hi - 1), "mean": _round(mean)}
+                     for lo, hi, mean in analysis.segments],
+        "trend": analysis.trend,
+        "recent_trend": analysis.recent_trend,
+        "ewma": _round(analysis.ewma),
+    }
+    if around_mean is not None:
+        payload["above_avg"], payload["below_avg"] = around_mean
+    return payload
+
+
+def points_payload(dates: Sequence[int], columns: Sequence[Sequence[float]],
+                   indices: Iterable[int]) -> Dict[str, List[Any]]:
+    """以欄位排列的資料點：dates 為日期字串，prices 為每個價格欄在同一日期的價格"""
+    indices = list(indices)
+    return {
+        "dates": [from_epoch_day(dates[i]) for i in indices],
+        "prices": [[column[i] for i in indices] for column in columns],
+    }
+
+
+def forecast_payload(points: Sequence[ForecastPoint]) -> Dict[str, List[Any]]:
+    """以欄位排列的每日預測值與 95% 預測區間"""
+    return {
+        "dates": [from_epoch_day(point.day) for point in points],
+        "values": [_round(point.value) for point in points],
+        "lower": [_round(point.lower) for point in points],
+        "upper": [_round(point.upper) for point in points],
+    }
@@ -0,0 +1,44 @@
+from typing import NamedTuple
+
+# EWMA 的跨度為 7 天；由既有歷史建立時，重播最近 30 筆價格作為暖機
+DEFAULT_WINDOW = 30
+DEFAULT_SPAN = 7
+
+
+class RollingSnapshot(NamedTuple):
+    """滾動統計的即時值"""
+    count: int  # 已納入的價格筆數
+    ewma: float
+
+
+class RollingStats:
+    """指數加權移動平均（EWMA），每筆新價格以 O(1) 更新
+
+    區間的平均值、標準差、最小最大值與漲跌次數由 RangeStats 以常數時間查詢，
+    這裡只保存無法由前綴和求得的 EWMA。
+    """
+
+    __slots__ = ("window", "alpha", "_count", "_ewma")
+
+    def __init__(self, window: int = DEFAULT_WINDOW, span: int = DEFAULT_SPAN):
+        self.window = window
+        self.alpha = 2.0 / (span + 1)
+        self._count = 0
+        self._ewma = 0.0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def push(self, price: float) -> None:
+        """加入一筆新價格"""
+        if self._count:
+            self._ewma += self.alpha * (price - self._ewma)
+        else:
+            self._ewma = price
+        self._count += 1
+
+    def snapshot(self) -> RollingSnapshot:
+        """目前的統計"""
+        if not self._count:
+            raise ValueError("滾動視窗為空")
+        return RollingSnapshot(count=self._count, ewma=self._ewma)
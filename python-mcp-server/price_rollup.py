@@ -0,0 +1,182 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+_EPOCH = date(1970, 1, 1)
+PERIODS = ("week", "month")
+
+
+class Bar(NamedTuple):
+    """一個週期（週或月）的價格彙總"""
+    start: int  # 週期第一天（epoch 天數）：週一或每月 1 日
+    first_index: int  # 週期內第一筆價格在序列中的索引
+    stop_index: int  # 週期內最後一筆價格的下一個索引
+    open: float
+    high: float
+    low: float
+    close: float
+    total: float
+
+    @property
+    def count(self) -> int:
+        return self.stop_index - self.first_index
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count
+
+
+def period_start(day: int, period: str) -> int:
+    """包含 day 的週期第一天：週以週一開始（1970-01-01 為週四），月以 1 日開始"""
+    if period == "week":
+        return day - (day + 3) % 7
+    if period == "month":
+        value = _EPOCH + timedelta(days=day)
+        return day - value.day + 1
+    raise ValueError(f"不支援的週期：{period}（可用 {'、'.join(PERIODS)}）")
+
+
+class Rollup:
+    """價格序列的週或月 OHLC 彙總
+
+    每個週期一列，以平行的 array 儲存；追加價格時只更新最後一列或新增一列，O(1)。
+    週期依起始日排序，以二分搜尋取出日期範圍內的週期。
+    """
+
+    __slots__ = ("period", "_starts", "_first", "_stop", "_open", "_high", "_low", "_close", "_total")
+
+    def __init__(self, period: str):
+        period_start(0, period)
+        self.period = period
+        self._starts = array("i")
+        self._first = array("i")
+        self._stop = array("i")
+        self._open = array("d")
+        self._high = array("d")
+        self._low = array("d")
+        self._close = array("d")
+        self._total = array("d")
+
+    @classmethod
+    def build(cls, period: str, dates: Sequence[int], prices: Sequence[float]) -> "Rollup":
+        """由既有的日期與價格建立彙總"""
+        rollup = cls(period)
+        for index, (day, price) in enumerate(zip(dates, prices)):
+            rollup.push(index, day, price)
+        return rollup
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def push(self, index: int, day: int, price: float) -> None:
+        """加入序列中第 index 筆價格，日期必須不早於已加入的最後一筆"""
+        start = period_start(day, self.period)
+        if self._starts and self._starts[-1] == start:
+            self._stop[-1] = index + 1
+            if price > self._high[-1]:
+                self._high[-1] = price
+            if price < self._low[-1]:
+                self._low[-1] = price
+            self._close[-1] = price
+            self._total[-1] += price
+            return
+        self._starts.append(start)
+        self._first.append(index)
+        self._stop.append(index + 1)
+        self._open.append(price)
+        self._high.append(price)
+        self._low.append(price)
+        self._close.append(price)
+        self._total.append(price)
+
+    def __getitem__(self, i: int) -> Bar:
+        return Bar(self._starts[i], self._first[i], self._stop[i], self._open[i], self._high[i], self._low[i],
+                   self._close[i], self._total[i])
+
+    def bars(self, first_day: Optional[int] = None, last_day: Optional[int] = None) -> Iterator[Bar]:
+        """起始日介於 [first_day, last_day] 的週期"""
+        lo = 0 if first_day is None else bisect_left(self._starts, first_day)
+        hi = len(self._starts) if last_day is None else bisect_right(self._starts, last_day)
+        return (self[i] for i in range(lo, hi))
+
+    def complete_bars(self, first_day: int, last_day: int, limit: Optional[int] = None) -> List[Bar]:
+        """完全落在 [first_day, last_day] 內的週期（不含頭尾只涵蓋一部分的週期）"""
+        bars = []
+        for bar in self.bars(first_day, last_day):
+            if self._end(bar.start) > last_day:
+                break
+            bars.append(bar)
+            if limit is not None and len(bars) >= limit:
+                break
+        return bars
+
+    def close_indices(self, start: int, stop: int) -> List[int]:
+        """序列索引範圍 [start, stop) 內各週期最後一筆價格的索引，連同範圍的第一筆
+
+        可作為長序列的顯示候選點：點數為週期數而非天數，且都是實際的價格。
+        """
+        lo = bisect_right(self._stop, start)
+        hi = bisect_left(self._first, stop)
+        indices = [start]
+        for i in range(lo, hi):
+            close = min(self._stop[i], stop) - 1
+            if close > indices[-1]:
+                indices.append(close)
+        return indices
+
+    def _end(self, start: int) -> int:
+        if self.period == "week":
+            return start + 6
+        return period_start(start + 31, "month") - 1
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int,
+                 candidates: Optional[Sequence[int]] = None) -> List[int]:
+    """Largest-Triangle-Three-Buckets 降採樣，回傳保留點的索引
+
+    第一與最後一點一定保留；其餘點分成 threshold - 2 個桶，每桶選出與前一個
+    保留點、下一桶平均點所成三角形面積最大的點，保留走勢的高低點與轉折。
+
+    Args:
+        xs: x 座標（如 epoch 天數）
+        ys: y 座標（價格）
+        threshold: 保留的點數
+        candidates: 只從這些索引中選取（遞增），省略時為全部的點
+
+    Returns:
+        遞增的索引
+    """
+    points = range(len(xs)) if candidates is None else candidates
+    count = len(points)
+    if threshold >= count:
+        return list(points)
+    if threshold < 3:
+        return [points[0], points[-1]]
+
+    selected = [points[0]]
+    size = (count - 2) / (threshold - 2)
+    a = points[0]
+    for bucket in range(threshold - 2):
+        lo = int(bucket * size) + 1
+        hi = int((bucket + 1) * size) + 1
+        # 下一桶的平均點（最後一桶以最後一點為準）
+        next_lo, next_hi = hi, min(int((bucket + 2) * size) + 1, count)
+        if next_lo >= count - 1:
+            avg_x, avg_y = xs[points[-1]], ys[points[-1]]
+        else:
+            span = points[next_lo:next_hi]
+            avg_x = sum(xs[i] for i in span) / len(span)
+            avg_y = sum(ys[i] for i in span) / len(span)
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = points[lo], -1.0
+        for i in points[lo:hi]:
+            area = abs((ax - avg_x) * (ys[i] - ay) - (ax - xs[i]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = i, area
+        selected.append(best)
+        a = best
+    selected.append(points[-1])
+    return selected
+
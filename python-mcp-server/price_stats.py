@@ -0,0 +1,208 @@
+from array import array
+from math import sqrt
+from typing import List, NamedTuple
+
+# 每個區塊的價格筆數。區塊內以線性掃描處理，區塊之間以稀疏表查詢，
+# 因此任意區間的查詢最多掃描 2 * BLOCK_SIZE 筆，與區間長度無關；
+# 稀疏表只建在區塊摘要上，記憶體約為 O(n / BLOCK_SIZE * log n)。
+BLOCK_SIZE = 32
+
+
+class WindowStats(NamedTuple):
+    """價格區間的統計摘要"""
+    count: int
+    first: float
+    last: float
+    mean: float
+    std: float
+    min: float
+    max: float
+    max_change: float  # 最大單日波動（相鄰兩筆價格差的絕對值）
+    up: int  # 區間內上漲的次數
+    down: int  # 區間內下跌的次數
+
+    @property
+    def flat(self) -> int:
+        """區間內持平的次數"""
+        return max(self.count - 1 - self.up - self.down, 0)
+
+
+class RangeStats:
+    """價格序列的區間統計索引
+
+    - 前綴和與前綴平方和：O(1) 求區間平均值與標準差
+    - 上漲／下跌次數的前綴計數：O(1) 求區間漲跌次數
+    - 區塊摘要 + 稀疏表：O(BLOCK_SIZE) 求區間最小值、最大值與最大單日波動
+
+    索引本身不保存價格，查詢時由呼叫端傳入完整的價格欄。
+    追加一筆價格的成本為攤銷 O(1)，每滿一個區塊再加上 O(log n)。
+    """
+
+    __slots__ = ("_ref", "_sum", "_sumsq", "_ups", "_downs", "_last", "_block_min", "_block_max",
+                 "_block_delta", "_length")
+
+    def __init__(self):
+        # 以第一筆價格為基準平移，避免長序列的平方和相減時損失精度
+        self._ref = 0.0
+        self._sum = array("d", [0.0])
+        self._sumsq = array("d", [0.0])
+        # 第 i 項為索引 i 之前（不含）的漲跌次數；單日漲跌歸屬於後一天
+        self._ups = array("i", [0])
+        self._downs = array("i", [0])
+        self._last = 0.0
+        # 稀疏表：第 j 層第 i 項涵蓋區塊 [i, i + 2**j)
+        self._block_min: List[array] = []
+        self._block_max: List[array] = []
+        self._block_delta: List[array] = []
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @classmethod
+    def build(cls, values, length: int = None) -> "RangeStats":
+        """為既有的價格欄建立索引，O(n)"""
+        index = cls()
+        for i in range(len(values) if length is None else length):
+            index.append(values, values[i])
+        return index
+
+    def append(self, values, price: float) -> None:
+        """追加一筆價格
+
+        Args:
+            values: 已包含新價格的完整價格欄
+            price: 新追加的價格
+        """
+        if not self._length:
+            self._ref = price
+            self._last = price
+        shifted = price - self._ref
+        self._sum.append(self._sum[-1] + shifted)
+        self._sumsq.append(self._sumsq[-1] + shifted * shifted)
+        self._ups.append(self._ups[-1] + (price > self._last))
+        self._downs.append(self._downs[-1] + (price < self._last))
+        self._last = price
+        self._length += 1
+
+        if self._length % BLOCK_SIZE == 0:
+            self._seal_block(values, self._length // BLOCK_SIZE - 1)
+
+    def _seal_block(self, values, block: int) -> None:
+        start = block * BLOCK_SIZE
+        stop = start + BLOCK_SIZE
+        chunk = values[start:stop]
+        self._push_block(min(chunk), max(chunk), _max_delta(values, max(start, 1), stop))
+
+    def _push_block(self, lo: float, hi: float, delta: float) -> None:
+        tables = (self._block_min, self._block_max, self._block_delta)
+        if not self._block_min:
+            for table in tables:
+                table.append(array("d"))
+        self._block_min[0].append(lo)
+        self._block_max[0].append(hi)
+        self._block_delta[0].append(delta)
+
+        # 更新各層以新區塊結尾的那一項
+        count = len(self._block_min[0])
+        level = 1
+        while (1 << level) <= count:
+            if level == len(self._block_min):
+                for table in tables:
+                    table.append(array("d"))
+            i = count - (1 << level)
+            half = 1 << (level - 1)
+            self._block_min[level].append(min(self._block_min[level - 1][i], self._block_min[level - 1][i + half]))
+            self._block_max[level].append(max(self._block_max[level - 1][i], self._block_max[level - 1][i + half]))
+            self._block_delta[level].append(max(self._block_delta[level - 1][i], self._block_delta[level - 1][i + half]))
+            level += 1
+
+    def _query_blocks(self, table: List[array], first: int, last: int, op) -> float:
+        """查詢區塊 [first, last) 的摘要，first < last"""
+        level = (last - first).bit_length() - 1
+        return op(table[level][first], table[level][last - (1 << level)])
+
+    def total(self, start: int, stop: int) -> float:
+        """價格區間 [start, stop) 的總和"""
+        return self._sum[stop] - self._sum[start] + self._ref * (stop - start)
+
+    def mean(self, start: int, stop: int) -> float:
+        """價格區間 [start, stop) 的平均值"""
+        return self.total(start, stop) / (stop - start)
+
+    def query(self, values, start: int, stop: int) -> WindowStats:
+        """查詢價格區間 [start, stop) 的統計摘要
+
+        Args:
+            values: 完整的價格欄
+            start: 起始索引（含）
+            stop: 結束索引（不含）
+
+        Returns:
+            區間統計摘要
+        """
+        count = stop - start
+        if count <= 0:
+            raise ValueError("查詢區間為空")
+
+        s = self._sum[stop] - self._sum[start]
+        q = self._sumsq[stop] - self._sumsq[start]
+        mean_shifted = s / count
+        variance = max(q / count - mean_shifted * mean_shifted, 0.0)
+
+        first_block = -(-start // BLOCK_SIZE)
+        last_block = stop // BLOCK_SIZE
+        if first_block < last_block:
+            head = values[start:first_block * BLOCK_SIZE]
+            tail = values[last_block * BLOCK_SIZE:stop]
+            lo = self._query_blocks(self._block_min, first_block, last_block, min)
+            hi = self._query_blocks(self._block_max, first_block, last_block, max)
+            if len(head):
+                lo = min(lo, min(head))
+                hi = max(hi, max(head))
+            if len(tail):
+                lo = min(lo, min(tail))
+                hi = max(hi, max(tail))
+
+            # 單日波動歸屬於後一天；第一個完整區塊的第一項若等於 start，
+            # 其波動跨出了查詢區間，需排除
+            block_start = first_block * BLOCK_SIZE
+            if block_start == start:
+                delta = max(_max_delta(values, start + 1, block_start + BLOCK_SIZE),
+                            self._query_blocks(self._block_delta, first_block + 1, last_block, max)
+                            if first_block + 1 < last_block else 0.0)
+            else:
+                delta = max(_max_delta(values, start + 1, block_start),
+                            self._query_blocks(self._block_delta, first_block, last_block, max))
+            delta = max(delta, _max_delta(values, last_block * BLOCK_SIZE, stop))
+        else:
+            window = values[start:stop]
+            lo = min(window)
+            hi = max(window)
+            delta = _max_delta(values, start + 1, stop)
+
+        return WindowStats(
+            count=count,
+            first=values[start],
+            last=values[stop - 1],
+            mean=self._ref + mean_shifted,
+            std=sqrt(variance),
+            min=lo,
+            max=hi,
+            max_change=delta,
+            up=self._ups[stop] - self._ups[start + 1],
+            down=self._downs[stop] - self._downs[start + 1],
+        )
+
+
+def _max_delta(values, start: int, stop: int) -> float:
+    """索引 [start, stop) 上各點與前一點差值絕對值的最大值，start 至少為 1"""
+    best = 0.0
+    prev = values[start - 1] if start < stop else 0.0
+    for i in range(start, stop):
+        current = values[i]
+        change = abs(current - prev)
+        if change > best:
+            best = change
+        prev = current
+    return best
@@ -0,0 +1,409 @@
+import calendar
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from price_forecast import WARMUP_DAYS, ForecastPoint, HoltWinters
+from price_history import DEFAULT_BLOCK_CAPACITY, PriceHistoryFile
+from price_rolling import RollingSnapshot, RollingStats
+from price_rollup import Rollup
+from price_stats import RangeStats, WindowStats
+
+# 日期欄以「自 1970-01-01 起的天數」儲存（int32），價格欄為 float64
+_EPOCH = date(1970, 1, 1)
+_INITIAL_CAPACITY = 32
+_PERIOD = re.compile(r"^(\d{4})(?:-(?:(\d{1,2})(?:-(\d{1,2}))?|[Qq]([1-4])))?$")
+
+
+def to_epoch_day(value) -> int:
+    """將日期轉換為 epoch 天數
+
+    Args:
+        value: date、datetime、"YYYY-MM-DD" 字串或已是整數的天數
+
+    Returns:
+        自 1970-01-01 起的天數
+    """
+    if isinstance(value, int):
+        return value
+    if isinstance(value, datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        value = date.fromisoformat(value)
+    return (value - _EPOCH).days
+
+
+def parse_period(text: str, end: bool = False) -> int:
+    """將日期或期間轉換為 epoch 天數
+
+    Args:
+        text: "YYYY-MM-DD"、"YYYY-MM"（月）、"YYYY-Qn"（季）或 "YYYY"（年）
+        end: 為 True 時取期間的最後一天，否則取第一天
+
+    Returns:
+        自 1970-01-01 起的天數
+    """
+    match = _PERIOD.match(text.strip())
+    if match is None:
+        raise ValueError(f"無法解析日期：{text}（可用 YYYY-MM-DD、YYYY-MM、YYYY-Qn 或 YYYY）")
+    year, month, day, quarter = match.groups()
+    year = int(year)
+    try:
+        if day is not None:
+            return to_epoch_day(date(year, int(month), int(day)))
+        if quarter is not None:
+            first_month = 3 * (int(quarter) - 1) + 1
+            months = (first_month, first_month + 2)
+        elif month is not None:
+            months = (int(month), int(month))
+        else:
+            months = (1, 12)
+        if end:
+            return to_epoch_day(date(year, months[1], calendar.monthrange(year, months[1])[1]))
+        return to_epoch_day(date(year, months[0], 1))
+    except ValueError:
+        raise ValueError(f"無效的日期：{text}") from None
+
+
+def from_epoch_day(day: int) -> str:
+    """將 epoch 天數轉換為 "YYYY-MM-DD" 字串"""
+    return (_EPOCH + timedelta(days=day)).isoformat()
+
+
+class PriceSeries:
+    """單一蔬果的價格序列，以連續的日期欄與價格欄儲存
+
+    兩個欄位都預留容量，追加時直接寫入既有緩衝區；容量不足時配置新的
+    緩衝區，而不是原地擴張，因此已取得的視圖不會失效，也不會觸發
+    BufferError。每筆追加同時更新區間統計索引、滾動統計，以及已建立的
+    週／月彙總與預測模型。
+
+    每次提交都會推進資料版本 version；同一個 PriceStore 中的序列共用一個
+    遞增的時鐘，因此版本在整個儲存中唯一且單調遞增，可作為快取鍵。
+    """
+
+    __slots__ = ("_dates", "_prices", "_length", "_index", "_rolling", "_rollups", "_forecaster", "_clock",
+                 "version")
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY, clock: Optional[list] = None):
+        self._clock = clock if clock is not None else [0]
+        self.version = self._clock[0]
+        capacity = max(capacity, 1)
+        self._dates = array("i", bytes(4 * capacity))
+        self._prices = array("d", bytes(8 * capacity))
+        self._length = 0
+        self._index = RangeStats()
+        self._rolling = RollingStats()
+        self._rollups: Dict[str, Rollup] = {}
+        self._forecaster: Optional[HoltWinters] = None
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def capacity(self) -> int:
+        return len(self._prices)
+
+    def _grow(self, capacity: int) -> None:
+        dates = array("i", bytes(4 * capacity))
+        prices = array("d", bytes(8 * capacity))
+        n = self._length
+        dates[:n] = self._dates[:n]
+        prices[:n] = self._prices[:n]
+        self._dates = dates
+        self._prices = prices
+
+    def append(self, day: int, price: float) -> None:
+        """追加一筆價格，日期必須晚於目前最後一筆"""
+        self._append(day, price)
+        self._commit()
+
+    def extend(self, ticks: Iterable[Tuple[int, float]]) -> int:
+        """依序追加多筆 (日期, 價格)，最後一次提交
+
+        Returns:
+            追加的筆數
+        """
+        count = 0
+        try:
+            for day, price in ticks:
+                self._append(day, price)
+                count += 1
+        finally:
+            if count:
+                self._commit()
+        return count
+
+    def _commit(self) -> None:
+        """追加完成後的提交動作：推進資料版本"""
+        self._clock[0] += 1
+        self.version = self._clock[0]
+
+    def _append(self, day: int, price: float) -> None:
+        n = self._length
+        if n and day <= self._dates[n - 1]:
+            raise ValueError(f"日期必須遞增：{from_epoch_day(day)} 不晚於 {from_epoch_day(self._dates[n - 1])}")
+        if n == len(self._prices):
+            self._grow(n * 2)
+        self._dates[n] = day
+        self._prices[n] = price
+        self._length = n + 1
+        self._observe(n, day, price)
+
+    def _observe(self, n: int, day: int, price: float) -> None:
+        """第 n 筆價格寫入後，更新已建立的統計索引、滾動統計、彙總與預測模型"""
+        if self._index is not None:
+            self._index.append(self._prices, price)
+        if self._rolling is not None:
+            self._rolling.push(price)
+        for rollup in self._rollups.values():
+            rollup.push(n, day, price)
+        if self._forecaster is not None:
+            self._forecaster.push(day, price)
+
+    def _range_index(self) -> RangeStats:
+        # 由檔案載入的序列在第一次查詢時才建立統計索引
+        if self._index is None:
+            self._index = RangeStats.build(self._prices, self._length)
+        return self._index
+
+    def slice(self, start: int = 0, stop: Optional[int] = None) -> Tuple[memoryview, memoryview]:
+        """取得 [start, stop) 範圍的日期與價格視圖（零複製）"""
+        n = self._length
+        start, stop, _ = slice(start, stop).indices(n)
+        return memoryview(self._dates)[start:stop], memoryview(self._prices)[start:stop]
+
+    def window(self, days: Optional[int] = None) -> Tuple[memoryview, memoryview]:
+        """取得最近 days 天的日期與價格視圖（零複製），days 為 None 時取全部"""
+        return self.slice(self.window_start(days))
+
+    def window_start(self, days: Optional[int] = None) -> int:
+        """最近 days 天的起始索引，days 為 None 時為 0"""
+        if days is None:
+            return 0
+        return max(self._length - max(days, 1), 0)
+
+    def range_indices(self, first_day: int, last_day: int) -> Tuple[int, int]:
+        """日期介於 [first_day, last_day] 的索引範圍 [start, stop)，以二分搜尋定位，O(log n)"""
+        dates = self.dates
+        return bisect_left(dates, first_day), bisect_right(dates, last_day)
+
+    def missing_days(self, start: int = 0, stop: Optional[int] = None) -> int:
+        """[start, stop) 範圍內首尾日期之間缺少價格的天數，O(1)"""
+        start, stop, _ = slice(start, stop).indices(self._length)
+        if stop - start < 2:
+            return 0
+        return self._dates[stop - 1] - self._dates[start] + 1 - (stop - start)
+
+    def gaps(self, start: int = 0, stop: Optional[int] = None) -> List[Tuple[int, int]]:
+        """[start, stop) 範圍內缺少價格的連續日期區間 (第一天, 最後一天)"""
+        start, stop, _ = slice(start, stop).indices(self._length)
+        if not self.missing_days(start, stop):
+            return []
+        dates = self.dates[start:stop]
+        return [(a + 1, b - 1) for a, b in zip(dates, dates[1:]) if b - a > 1]
+
+    def stats(self, start: int = 0, stop: Optional[int] = None) -> WindowStats:
+        """[start, stop) 範圍的統計摘要，與區間長度無關的常數時間"""
+        start, stop, _ = slice(start, stop).indices(self._length)
+        return self._range_index().query(self._prices, start, stop)
+
+    def rolling(self) -> RollingSnapshot:
+        """7 日指數移動平均，O(1)"""
+        if self._rolling is None:
+            # 由檔案載入的序列只需重播最後一個視窗暖機
+            rolling = RollingStats()
+            prices = self._prices
+            for i in range(max(self._length - rolling.window, 0), self._length):
+                rolling.push(prices[i])
+            self._rolling = rolling
+        return self._rolling.snapshot()
+
+    def rollup(self, period: str) -> Rollup:
+        """週（week）或月（month）的 OHLC 彙總，第一次取用時建立，之後隨追加更新"""
+        rollup = self._rollups.get(period)
+        if rollup is None:
+            rollup = self._rollups[period] = Rollup.build(period, self.dates, self.prices)
+        return rollup
+
+    def forecaster(self) -> HoltWinters:
+        """價格的預測模型，第一次取用時以最後 WARMUP_DAYS 筆價格訓練，之後隨追加以 O(1) 更新"""
+        if self._forecaster is None:
+            start = max(self._length - WARMUP_DAYS, 0)
+            dates, prices = self.slice(start)
+            self._forecaster = HoltWinters.fit(dates, prices)
+        return self._forecaster
+
+    def forecast(self, horizon: int) -> List[ForecastPoint]:
+        """最後一筆之後 horizon 天的預測值與 95% 預測區間"""
+        return self.forecaster().forecast(horizon)
+
+    def window_stats(self, days: Optional[int] = None) -> WindowStats:
+        """最近 days 天的統計摘要"""
+        return self.stats(self.window_start(days))
+
+    def mean(self, start: int = 0, stop: Optional[int] = None) -> float:
+        """[start, stop) 範圍的平均價格，O(1)"""
+        start, stop, _ = slice(start, stop).indices(self._length)
+        return self._range_index().mean(start, stop)
+
+    @property
+    def dates(self) -> memoryview:
+        return memoryview(self._dates)[:self._length]
+
+    @property
+    def prices(self) -> memoryview:
+        return memoryview(self._prices)[:self._length]
+
+    @property
+    def last_day(self) -> Optional[int]:
+        return self._dates[self._length - 1] if self._length else None
+
+    @property
+    def last_price(self) -> Optional[float]:
+        return self._prices[self._length - 1] if self._length else None
+
+    def date_str(self, index: int) -> str:
+        """取得第 index 筆的日期字串"""
+        if index < 0:
+            index += self._length
+        return from_epoch_day(self._dates[index])
+
+
+class MappedPriceSeries(PriceSeries):
+    """以價格歷史檔的映射區域為欄位的價格序列，追加時直接寫入檔案"""
+
+    __slots__ = ("_file", "_slot")
+
+    def __init__(self, history: PriceHistoryFile, slot: int, clock: Optional[list] = None):
+        self._clock = clock if clock is not None else [0]
+        self.version = self._clock[0]
+        self._file = history
+        self._slot = slot
+        self._dates, self._prices, self._length = history.columns(slot)
+        self._index = None
+        self._rolling = None
+        self._rollups = {}
+        self._forecaster = None
+
+    def _grow(self, capacity: int) -> None:
+        # 批次追加時新的筆數尚未提交，需連同一起搬移
+        self._dates, self._prices = self._file.grow(self._slot, capacity, self._length)
+
+    def _commit(self) -> None:
+        self._file.set_length(self._slot, self._length)
+        super()._commit()
+
+    def sync(self) -> bool:
+        """讀取其他行程寫入的新價格：重新取得欄位視圖（區塊可能已搬移），
+        新的筆數依序更新統計索引，不需重建
+
+        Returns:
+            是否有新的價格
+        """
+        self._dates, self._prices, length = self._file.columns(self._slot)
+        if length <= self._length:
+            return False
+        for n in range(self._length, length):
+            self._length = n + 1
+            self._observe(n, self._dates[n], self._prices[n])
+        super()._commit()
+        return True
+
+
+class PriceStore:
+    """所有蔬果的價格序列，依英文鍵值索引
+
+    指定價格歷史檔時，序列直接映射檔案內容，新增的產品與價格也寫入檔案。
+    以唯讀方式開啟時不能寫入，改以 refresh() 取得寫入行程的新資料。
+    """
+
+    def __init__(self, history: Optional[PriceHistoryFile] = None):
+        self.history = history
+        self._series: Dict[str, PriceSeries] = {}
+        # 所有序列共用的版本時鐘，新增產品或任何序列追加價格時遞增
+        self._clock = [0]
+        if history is not None:
+            for key, _, _, slot in history.entries():
+                self._series[key] = MappedPriceSeries(history, slot, self._clock)
+
+    @classmethod
+    def open(cls, path: str, readonly: bool = False) -> "PriceStore":
+        """映射（不存在時建立）價格歷史檔；readonly 時檔案須已存在"""
+        return cls(PriceHistoryFile(path, readonly=readonly))
+
+    @property
+    def readonly(self) -> bool:
+        return self.history is not None and self.history.readonly
+
+    def refresh(self) -> List[str]:
+        """價格歷史檔的序號改變時，載入寫入行程新增的產品與價格
+
+        序號未變時只讀取檔頭的 8 bytes。新增的產品建立映射序列，
+        筆數增加的序列以增量方式更新統計索引。
+
+        Returns:
+            新增或有新價格的英文鍵值
+        """
+        if self.history is None or not self.history.refresh():
+            return []
+        changed = []
+        for key, _, _, slot in self.history.entries():
+            series = self._series.get(key)
+            if series is None:
+                self._series[key] = MappedPriceSeries(self.history, slot, self._clock)
+                self._clock[0] += 1
+                changed.append(key)
+            elif self.history.length(slot) != len(series) and series.sync():
+                changed.append(key)
+        return changed
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._series
+
+    def __getitem__(self, key: str) -> PriceSeries:
+        return self._series[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._series)
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    @property
+    def version(self) -> int:
+        """整個儲存的資料版本，任何產品或價格變動都會遞增"""
+        return self._clock[0]
+
+    def get(self, key: str) -> Optional[PriceSeries]:
+        return self._series.get(key)
+
+    def create(self, key: str, zh_name: str = "", unit: str = "") -> PriceSeries:
+        """建立（或取得已存在的）蔬果價格序列
+
+        Args:
+            key: 英文鍵值
+            zh_name: 中文名稱，寫入價格歷史檔供其他行程使用
+            unit: 計價單位
+        """
+        series = self._series.get(key)
+        if series is None:
+            if self.history is not None:
+                slot = self.history.add(key, zh_name, unit, DEFAULT_BLOCK_CAPACITY)
+                series = MappedPriceSeries(self.history, slot, self._clock)
+            else:
+                series = PriceSeries(clock=self._clock)
+            self._series[key] = series
+            self._clock[0] += 1
+        return series
+
+    def metadata(self):
+        """價格歷史檔中記錄的 (英文鍵值, 中文名稱, 單位)"""
+        if self.history is None:
+            return []
+        return [(key, zh_name, unit) for key, zh_name, unit, _ in self.history.entries()]
+
+    def items(self):
+        return self._series.items()
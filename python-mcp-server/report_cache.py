@@ -0,0 +1,94 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class ReportCache:
+    """已渲染報告的 LRU 快取
+
+    快取鍵為（工具名稱, 正規化後的參數），每筆快取另外記錄產生時的資料版本。
+    查詢時版本不同即視為失效並重新渲染、覆寫原項目，因此價格序列一變動，
+    相關報告就不會再被命中，也不會在快取中留下過期的舊版本。
+    以項目數與估計的記憶體用量雙重上限淘汰最久未使用的項目。
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_render(self, key: Hashable, version: Hashable, render: Callable[[], Any]) -> Any:
+        """取得快取的報告，未命中或版本不同時呼叫 render 產生並存入
+
+        Args:
+            key: （工具名稱, 正規化後的參數）
+            version: 報告所依據資料的版本
+            render: 產生報告的函數
+
+        Returns:
+            報告內容
+        """
+        value = self.get(key, version)
+        if value is None:
+            value = render()
+            self.put(key, version, value)
+        return value
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        """取得快取的報告，未命中或版本不同時回傳 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, version: Hashable, value: Any) -> None:
+        """存入報告，覆寫同一鍵的舊版本"""
+        size = sys.getsizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            if size <= self.max_bytes:
+                self._entries[key] = (version, value, size)
+                self._bytes += size
+                self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """命中、未命中、淘汰次數與目前的項目數、記憶體用量"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,84 @@
+import io
+from typing import Iterable, Iterator, Optional, Sequence
+
+from price_rollup import Bar, lttb_indices
+from price_store import from_epoch_day
+
+PRICE_BORDER = "+--------------+--------------+\n"
+COMPARISON_BORDER = "+--------------+--------------+--------------+--------------+\n"
+ROLLUP_BORDER = "+------------+----------+----------+----------+----------+----------+\n"
+
+
+def sample_indices(dates, values, sample_size: Optional[int],
+                   candidates: Optional[Sequence[int]] = None) -> Sequence[int]:
+    """以 LTTB 選擇保留走勢形狀的樣本點索引，sample_size 為 None 時選取全部
+
+    Args:
+        dates: 日期序列（epoch 天數）
+        values: 決定走勢形狀的數值，如價格或兩種價格的差異
+        sample_size: 要顯示的數據點數量
+        candidates: 只從這些索引中選取，如長區間中每週的最後一筆
+
+    Returns:
+        樣本點索引，必定包含第一個與最後一個點
+    """
+    count = len(dates)
+    if sample_size is None or count <= sample_size:
+        return range(count)
+    return lttb_indices(dates, values, sample_size, candidates)
+
+
+def iter_price_table(dates, prices, title: str, indices: Iterable[int], trend: Optional[str] = None) -> Iterator[str]:
+    """逐行產生價格表，不需先組出整張表
+
+    Args:
+        dates: 日期序列（epoch 天數）
+        prices: 價格序列
+        title: 表格標題
+        indices: 要顯示的列索引
+        trend: 表格下方的價格趨勢描述
+    """
+    yield f"【{title}】\n"
+    yield PRICE_BORDER
+    yield "| 日期         | 價格 (元/公斤) |\n"
+    yield PRICE_BORDER
+    for i in indices:
+        yield f"| {from_epoch_day(dates[i])} | {prices[i]:12.1f} |\n"
+    yield PRICE_BORDER
+    if trend is not None:
+        yield f"價格趨勢: {trend}\n"
+
+
+def iter_comparison_table(dates, prices1, prices2, fruit1_name: str, fruit2_name: str,
+                          indices: Iterable[int], avg_price1: float, avg_price2: float) -> Iterator[str]:
+    """逐行產生兩種蔬果的價格比較表"""
+    yield f"【{fruit1_name} vs {fruit2_name} 價格比較】\n"
+    yield COMPARISON_BORDER
+    yield f"| 日期         | {fruit1_name:12} | {fruit2_name:12} | 差異 (元/公斤) |\n"
+    yield COMPARISON_BORDER
+    for i in indices:
+        price1 = prices1[i]
+        price2 = prices2[i]
+        yield f"| {from_epoch_day(dates[i])} | {price1:12.1f} | {price2:12.1f} | {price1 - price2:+12.1f} |\n"
+    yield COMPARISON_BORDER
+    yield f"平均價格:       | {avg_price1:12.1f} | {avg_price2:12.1f} | {avg_price1 - avg_price2:+12.1f} |\n"
+    yield COMPARISON_BORDER
+
+
+def iter_rollup_table(bars: Iterable[Bar], title: str, period_format=from_epoch_day) -> Iterator[str]:
+    """逐行產生週期彙總表（開盤、最高、最低、收盤、平均）"""
+    yield f"【{title}】\n"
+    yield ROLLUP_BORDER
+    yield "| 期間       | 開盤     | 最高     | 最低     | 收盤     | 平均     |\n"
+    yield ROLLUP_BORDER
+    for bar in bars:
+        yield (f"| {period_format(bar.start):10} | {bar.open:8.1f} | {bar.high:8.1f} | {bar.low:8.1f} | "
+               f"{bar.close:8.1f} | {bar.mean:8.1f} |\n")
+    yield ROLLUP_BORDER
+
+
+def render(lines: Iterable[str]) -> str:
+    """將逐行產生的內容寫入 StringIO 後一次取出"""
+    out = io.StringIO()
+    out.writelines(lines)
+    return out.getvalue()
@@ -0,0 +1,52 @@
+import asyncio
+from concurrent.futures import Future
+
+import pytest
+
+import fruit_price_server
+from chart_render import ChartRenderer
+from name_index import NameIndex
+from price_store import PriceStore
+from report_cache import ReportCache
+
+
+def test_lookup_serves_cache_and_inflight():
+    charts = ChartRenderer()
+    assert charts.lookup("apple", 1) is None
+
+    charts.cache.put("apple", 1, b"png")
+    assert charts.lookup("apple", 1).result() == b"png"
+    assert charts.lookup("apple", 2) is None
+
+    pending = Future()
+    charts._inflight[("apple", 2)] = pending
+    assert charts.lookup("apple", 2) is pending
+    assert charts.submit("apple", 2, "", [], []) is pending
+    assert charts.stats() == {"renders": 0, "coalesced": 2, "inflight": 1}
+
+
+def test_cached_chart_skips_downsampling(monkeypatch):
+    store = PriceStore()
+    store.create("apple").extend((day, 10.0 + day % 7) for day in range(100))
+    names = NameIndex()
+    names.add("apple", "蘋果")
+    charts = ChartRenderer()
+    monkeypatch.setattr(fruit_price_server, "PRICES", store)
+    monkeypatch.setattr(fruit_price_server, "FRUITS", {"apple": {"zh_name": "蘋果", "current_price": 0.0,
+                                                                 "unit": "公斤"}})
+    monkeypatch.setattr(fruit_price_server, "NAMES", names)
+    monkeypatch.setattr(fruit_price_server, "REPORTS", ReportCache())
+    monkeypatch.setattr(fruit_price_server, "CHARTS", charts)
+    monkeypatch.setattr(fruit_price_server, "MATPLOTLIB_AVAILABLE", True)
+    charts.cache.put(("apple", 70, 100), store.version, b"\x89PNG cached")
+
+    def fail(*args):
+        raise AssertionError("downsampled a cached chart")
+
+    monkeypatch.setattr(fruit_price_server, "_chart_points", fail)
+    image = asyncio.run(fruit_price_server.get_price_chart("apple", days=30, format="png"))
+    assert image.data == b"\x89PNG cached"
+
+    store["apple"].append(100, 12.0)
+    with pytest.raises(AssertionError):
+        asyncio.run(fruit_price_server.get_price_chart("apple", days=30, format="png"))
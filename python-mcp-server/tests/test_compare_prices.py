@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+
+import fruit_price_server
+from name_index import NameIndex
+from price_store import PriceStore
+from report_cache import ReportCache
+
+
+@pytest.fixture
+def prices(monkeypatch):
+    store = PriceStore()
+    monkeypatch.setattr(fruit_price_server, "PRICES", store)
+    monkeypatch.setattr(fruit_price_server, "FRUITS", {
+        "apple": {"zh_name": "蘋果", "current_price": 0.0, "unit": "公斤"},
+        "banana": {"zh_name": "香蕉", "current_price": 0.0, "unit": "公斤"},
+    })
+    monkeypatch.setattr(fruit_price_server, "REPORTS", ReportCache())
+    names = NameIndex()
+    names.add("apple", "蘋果")
+    names.add("banana", "香蕉")
+    monkeypatch.setattr(fruit_price_server, "NAMES", names)
+    return store
+
+
+def _compare(*args, **kwargs):
+    return asyncio.run(fruit_price_server.compare_prices(*args, **kwargs))
+
+
+def test_pairs_prices_by_date(prices):
+    # 蘋果多了一筆晚三天的價格，香蕉缺了第 3 天
+    prices.create("apple").extend([(1, 10.0), (2, 12.0), (3, 11.0), (4, 13.0), (7, 99.0)])
+    prices.create("banana").extend([(1, 20.0), (2, 21.0), (4, 24.0), (5, 25.0)])
+
+    payload = json.loads(_compare("banana", "apple", days=4, output="json"))
+    assert payload["common_days"] == 2
+    assert payload["points"]["prices"] == [[21.0, 24.0], [12.0, 13.0]]
+    assert payload["current_diff"] == 11.0
+    assert payload["avg_diff"] == 10.0
+
+    text = _compare("banana", "apple", days=4)
+    assert "99" not in text
+    assert "都有價格的 2 天" in text
+    assert "+14.3%" in text and "+8.3%" in text
+
+
+def test_no_common_dates(prices):
+    prices.create("apple").extend([(1, 10.0), (2, 12.0)])
+    prices.create("banana").extend([(5, 20.0)])
+    assert "沒有共同的日期" in _compare("apple", "banana")
+    assert "error" in json.loads(_compare("apple", "banana", output="json"))
+
+    prices["banana"].append(6, 21.0)
+    prices["apple"].extend([(3, 11.0), (7, 13.0)])
+    assert "沒有共同的日期" in _compare("apple", "banana", days=1)
+
+
+def test_compare_many_lists_skipped_fruits(prices, monkeypatch):
+    fruit_price_server.FRUITS["kiwi"] = {"zh_name": "奇異果", "current_price": 0.0, "unit": "公斤"}
+    fruit_price_server.FRUITS["mango"] = {"zh_name": "芒果", "current_price": 0.0, "unit": "公斤"}
+    for key, name in (("kiwi", "奇異果"), ("mango", "芒果")):
+        fruit_price_server.NAMES.add(key, name)
+    prices.create("apple").extend((day, 10.0 + day) for day in range(10, 20))
+    prices.create("banana").extend((day, 20.0 + day) for day in range(10, 20))
+    # 奇異果的價格停在第 5 天，芒果沒有任何價格
+    prices.create("kiwi").extend((day, 30.0) for day in range(6))
+    prices.create("mango")
+
+    text = asyncio.run(fruit_price_server.compare_many(["apple", "banana", "kiwi", "mango"], days=7))
+    assert "最近 7 天沒有價格，已略過：奇異果" in text
+    assert "沒有價格數據，已略過：芒果" in text
+    assert "蘋果" in text and "香蕉" in text
+
+    monkeypatch.setattr(fruit_price_server, "MAX_COMPARE_FRUITS", 2)
+    text = asyncio.run(fruit_price_server.compare_many(["apple", "banana", "kiwi", "mango"], days=7))
+    assert "最多比較 2 種，已略過：kiwi、mango" in text
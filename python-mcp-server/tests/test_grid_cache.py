@@ -0,0 +1,174 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import weather
+from grid_cache import GridCache
+
+PROPERTIES = {"gridId": "OKX", "gridX": 33, "gridY": 35,
+              "forecast": "https://api.weather.gov/gridpoints/OKX/33,35/forecast",
+              "forecastHourly": "https://api.weather.gov/gridpoints/OKX/33,35/forecast/hourly"}
+# A cell straddling several 0.05 degree buckets
+POLYGON = {"type": "Polygon", "coordinates": [[[-74.08, 40.66], [-73.96, 40.66], [-73.96, 40.76],
+                                                [-74.08, 40.76], [-74.08, 40.66]]]}
+
+
+def _cells(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["cells"]
+
+
+def test_lookup_inside_outline():
+    cache = GridCache()
+    cell = cache.add(40.7, -74.0, PROPERTIES, POLYGON)
+    assert cache.lookup(40.75, -73.97) is cell
+    assert cache.lookup(40.67, -74.07) is cell
+    assert cache.lookup(40.8, -74.0) is None
+    assert cache.lookup(40.7, -73.9) is None
+    assert cache.stats() == {"hits": 2, "misses": 2, "cells": 1}
+
+
+def test_cell_without_outline_matches_its_point_only():
+    cache = GridCache()
+    cell = cache.add(40.70001, -74.0, PROPERTIES)
+    assert cache.lookup(40.7, -74.0) is cell
+    assert cache.lookup(40.701, -74.0) is None
+    # A later response without geometry does not replace a known outline
+    outlined = cache.add(40.7, -74.0, PROPERTIES, POLYGON)
+    assert cache.add(40.72, -74.0, PROPERTIES) is outlined
+
+
+def test_expired_cells_are_ignored():
+    cache = GridCache(max_age=0.0)
+    cache.add(40.7, -74.0, PROPERTIES, POLYGON)
+    assert cache.lookup(40.7, -74.0) is None
+
+
+def test_discard_and_replace_clear_every_bucket():
+    cache = GridCache()
+    cell = cache.add(40.7, -74.0, PROPERTIES, POLYGON)
+    assert len(cache._buckets) > 1
+    small = {"type": "Polygon", "coordinates": [[[-74.04, 40.71], [-74.03, 40.71], [-74.03, 40.72], [-74.04, 40.71]]]}
+    cache.add(40.7, -74.0, PROPERTIES, small)
+    assert len(cache._buckets) == 1
+    assert cache.lookup(40.75, -73.97) is None
+
+    cache.discard(cache.lookup(40.712, -74.032))
+    cache.discard(cell)
+    assert len(cache) == 0 and not cache._buckets
+
+
+def test_saved_at_once_outside_an_event_loop(tmp_path):
+    path = str(tmp_path / "cells.json")
+    cache = GridCache(path)
+    cell = cache.add(40.7, -74.0, PROPERTIES, POLYGON)
+    assert [c["grid_x"] for c in _cells(path)] == [33]
+
+    restarted = GridCache(path)
+    assert restarted.lookup(40.75, -73.97) == cell
+    restarted.discard(cell)
+    assert _cells(path) == []
+
+
+def test_writes_are_batched_in_an_event_loop(tmp_path):
+    path = tmp_path / "cells.json"
+
+    async def main():
+        cache = GridCache(str(path), save_delay=0.05)
+        for x in range(5):
+            cache.add(40.7 + x, -74.0, dict(PROPERTIES, gridX=x), POLYGON)
+        assert not path.exists()
+        await asyncio.sleep(0.2)
+        assert len(_cells(path)) == 5
+
+        cache.discard(cache.lookup(40.7, -74.0))
+        await cache.aflush()
+        assert len(_cells(path)) == 4
+        cache.add(50.0, -74.0, dict(PROPERTIES, gridX=9))
+        return cache
+
+    cache = asyncio.run(main())
+    # The write scheduled for the last change never ran; flush() saves it
+    assert len(_cells(path)) == 4
+    cache.flush()
+    assert sorted(c["grid_x"] for c in _cells(path)) == [1, 2, 3, 4, 9]
+
+
+def test_memory_only_cache_writes_nothing(tmp_path):
+    cache = GridCache(None)
+    cache.add(40.7, -74.0, PROPERTIES, POLYGON)
+    cache.flush()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_write_stays_pending(tmp_path):
+    path = tmp_path / "missing" / "cells.json"
+    cache = GridCache(str(path))
+    cache.add(40.7, -74.0, PROPERTIES, POLYGON)
+    assert not path.exists()
+
+    path.parent.mkdir()
+    cache.flush()
+    assert len(_cells(path)) == 1
+
+
+class FakeNWS:
+    """Serves get_json from a URL map; a value that is an exception is raised."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    async def get_json(self, url):
+        self.requests.append(url)
+        response = self.responses[url]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def _status_error(status):
+    request = httpx.Request("GET", PROPERTIES["forecast"])
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+
+FORECAST = {"geometry": POLYGON, "properties": {"periods": [
+    {"name": "Tonight", "temperature": 50, "temperatureUnit": "F", "windSpeed": "5 mph",
+     "windDirection": "N", "detailedForecast": "Clear."}]}}
+
+
+@pytest.mark.parametrize("failure, discarded", [
+    (_status_error(404), True),
+    ({"properties": {}}, True),
+    (_status_error(503), False),
+    (httpx.ReadTimeout("timed out"), False),
+])
+def test_forecast_discards_cell_only_when_it_is_gone(monkeypatch, failure, discarded):
+    cache = GridCache()
+    cell = cache.add(40.7, -74.0, PROPERTIES, POLYGON)
+    points_url = f"{weather.NWS_API_BASE}/points/40.7,-74.0"
+    nws = FakeNWS({cell.forecast: failure, points_url: {"properties": PROPERTIES}})
+    monkeypatch.setattr(weather, "GRID", cache)
+    monkeypatch.setattr(weather, "NWS", nws)
+
+    text = asyncio.run(weather.forecast_for_location(40.7, -74.0))
+    if discarded:
+        # Resolved again through /points; the forecast URL still fails the same way
+        assert nws.requests == [cell.forecast, points_url, cell.forecast]
+        assert len(cache) == 0
+    else:
+        assert nws.requests == [cell.forecast]
+        assert text == "Unable to fetch detailed forecast."
+        assert cache.lookup(40.7, -74.0) == cell
+
+
+def test_forecast_from_known_cell(monkeypatch):
+    cache = GridCache()
+    cell = cache.add(40.7, -74.0, PROPERTIES, POLYGON)
+    nws = FakeNWS({cell.forecast: FORECAST})
+    monkeypatch.setattr(weather, "GRID", cache)
+    monkeypatch.setattr(weather, "NWS", nws)
+    assert "Tonight" in asyncio.run(weather.forecast_for_location(40.75, -73.97))
+    assert nws.requests == [cell.forecast]
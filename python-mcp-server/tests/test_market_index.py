@@ -0,0 +1,50 @@
+import math
+
+import pytest
+
+from market_index import MarketIndex, mean_distance, volatility, week_change
+from price_store import PriceSeries, PriceStore
+
+
+def _series(ticks):
+    series = PriceSeries()
+    series.extend(ticks)
+    return series
+
+
+def test_week_change_uses_the_price_from_seven_days_ago():
+    # 第 13、14 天缺價格：倒數第 8 筆是第 7 天，7 天前（第 12 天）才是正確的基準
+    series = _series([(day, 10.0 + day) for day in range(13)] + [(day, 10.0 + day) for day in range(15, 20)])
+    assert week_change(series, 30) == pytest.approx((29 / 22 - 1) * 100)
+
+    # 7 天前沒有價格時取之前最近的一筆
+    series = _series([(0, 10.0), (5, 20.0), (10, 15.0)])
+    assert week_change(series, 30) == pytest.approx(50.0)
+    assert week_change(_series([(0, 10.0), (6, 12.0)]), 30) is None
+    assert week_change(PriceSeries(), 30) is None
+
+
+def test_window_metrics_match_brute_force():
+    ticks = [(day, 20.0 + (day * 13 % 17) / 3) for day in range(200)]
+    series = _series(ticks)
+    prices = [price for _, price in ticks[-30:]]
+    mean = math.fsum(prices) / len(prices)
+    std = math.sqrt(math.fsum((p - mean) ** 2 for p in prices) / len(prices))
+    assert volatility(series, 30) == pytest.approx(std / mean * 100)
+    assert mean_distance(series, 30) == pytest.approx((prices[-1] / mean - 1) * 100)
+    assert volatility(_series([(0, 1.0)]), 30) is None
+    assert mean_distance(PriceSeries(), 30) is None
+
+
+def test_top_follows_appends():
+    store = PriceStore()
+    for key, step in (("apple", 1.0), ("banana", -0.5), ("kiwi", 0.1)):
+        store.create(key).extend((day, 50.0 + step * day) for day in range(20))
+    market = MarketIndex()
+    assert [key for key, _ in market.top(store, "week_change", k=2)] == ["apple", "banana"]
+    assert [key for key, _ in market.top(store, "week_change", direction="down", k=1)] == ["banana"]
+
+    store["kiwi"].append(20, 500.0)
+    assert market.top(store, "week_change", k=1)[0][0] == "kiwi"
+    with pytest.raises(ValueError):
+        market.top(store, "unknown")
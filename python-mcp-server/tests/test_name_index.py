@@ -0,0 +1,40 @@
+from name_index import NameIndex, normalize
+
+
+def _index():
+    names = NameIndex()
+    names.add("apple", "蘋果", "pingguo")
+    names.add("pineapple", "鳳梨", "菠蘿")
+    names.add("cherry", "櫻桃")
+    names.add("kiwi", "奇異果", "獼猴桃")
+    return names
+
+
+def test_traditional_and_simplified_resolve_to_the_same_key():
+    names = _index()
+    assert normalize("蘋果") == normalize("苹果")
+    for name in ("蘋果", "苹果", "apple", "Apples", "ＡＰＰＬＥ", "píngguǒ", "%E8%98%8B%E6%9E%9C"):
+        assert names.resolve(name) == "apple"
+    assert names.resolve("凤梨") == names.resolve("菠萝") == "pineapple"
+    assert names.resolve("cherries") == names.resolve("樱桃") == "cherry"
+    assert names.resolve("猕猴桃") == "kiwi"
+    assert names.resolve("banana") is None
+
+
+def test_fuzzy_suggestions():
+    names = _index()
+    assert names.suggest("aple")[0][0] == "apple"
+    assert names.suggest("pinapple")[0][0] == "pineapple"
+    assert names.suggest("奇异")[0][0] == "kiwi"
+    scores = [score for _, score in names.suggest("apple")]
+    assert scores == sorted(scores, reverse=True)
+    assert names.suggest("zzzz") == []
+
+
+def test_complete_and_memo_follow_additions():
+    names = _index()
+    assert names.complete("pin") == ["pineapple", "apple"]
+    assert names.resolve("芒果") is None
+    # 新增別名後先前查不到的結果也要更新
+    names.add("mango", "芒果")
+    assert names.resolve("芒果") == "mango"
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import threading
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+from nws_cache import HEURISTIC_MAX_SECONDS, HTTPCache, freshness_lifetime
+
+URL = "https://api.weather.gov/points/40.7,-74.0"
+NOW = 1_700_000_000.0
+
+
+class FakeSend:
+    """Stands in for NWSClient.get: returns queued responses and records request headers."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def __call__(self, url, headers=None):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
+def _response(status=200, body=None, **headers):
+    headers = {name.replace("_", "-"): value for name, value in headers.items()}
+    request = httpx.Request("GET", URL)
+    if body is None:
+        return httpx.Response(status, headers=headers, request=request)
+    return httpx.Response(status, headers=headers, content=json.dumps(body).encode(), request=request)
+
+
+def _fetch(cache, send):
+    return asyncio.run(cache.fetch(URL, send))
+
+
+@pytest.mark.parametrize("headers, lifetime", [
+    ({"cache-control": "max-age=60"}, 60.0),
+    ({"cache-control": "public, s-maxage=30, max-age=60"}, 30.0),
+    ({"cache-control": "max-age=60", "age": "45"}, 15.0),
+    ({"cache-control": "max-age=60", "age": "90"}, 0.0),
+    ({"cache-control": "no-cache, max-age=60"}, 0.0),
+    ({"cache-control": "no-store"}, None),
+    ({"cache-control": "private, max-age=60"}, None),
+    ({"date": formatdate(NOW, usegmt=True), "expires": formatdate(NOW + 120, usegmt=True)}, 120.0),
+    ({"expires": "0"}, 0.0),
+    ({"date": formatdate(NOW, usegmt=True), "last-modified": formatdate(NOW - 1000, usegmt=True)}, 100.0),
+    ({"date": formatdate(NOW, usegmt=True), "last-modified": formatdate(NOW - 10 ** 6, usegmt=True)},
+     HEURISTIC_MAX_SECONDS),
+    ({}, 0.0),
+])
+def test_freshness_lifetime(headers, lifetime):
+    assert freshness_lifetime(headers, NOW) == lifetime
+
+
+def test_fresh_response_is_served_from_memory():
+    cache = HTTPCache()
+    send = FakeSend(_response(body={"n": 1}, cache_control="max-age=60"))
+    assert _fetch(cache, send) == {"n": 1}
+    assert _fetch(cache, send) == {"n": 1}
+    assert len(send.requests) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_stale_response_is_revalidated():
+    cache = HTTPCache()
+    send = FakeSend(_response(body={"n": 1}, cache_control="max-age=0", etag='"v1"'),
+                    _response(304, cache_control="max-age=60", etag='"v2"'),
+                    _response(body={"n": 2}, cache_control="max-age=0", etag='"v3"'))
+    assert _fetch(cache, send) == {"n": 1}
+
+    # 304 keeps the stored body and makes it fresh again
+    assert _fetch(cache, send) == {"n": 1}
+    assert send.requests[1] == {"If-None-Match": '"v1"'}
+    assert _fetch(cache, send) == {"n": 1}
+    assert len(send.requests) == 2
+    assert cache.get(URL).etag == '"v2"'
+
+    cache.get(URL).expires = 0.0
+    assert _fetch(cache, send) == {"n": 2}
+    assert send.requests[2] == {"If-None-Match": '"v2"'}
+    assert cache.stats()["not_modified"] == 1 and cache.stats()["revalidations"] == 2
+
+
+def test_uncacheable_responses_are_not_stored():
+    cache = HTTPCache()
+    send = FakeSend(_response(body={"n": 1}, cache_control="no-store"),
+                    _response(body={"n": 2}))
+    assert _fetch(cache, send) == {"n": 1}
+    assert _fetch(cache, send) == {"n": 2}
+    assert len(cache) == 0
+
+
+def test_error_responses_raise_and_are_not_stored():
+    cache = HTTPCache()
+    send = FakeSend(_response(503, body={"detail": "busy"}, cache_control="max-age=60"))
+    with pytest.raises(httpx.HTTPStatusError):
+        _fetch(cache, send)
+    assert len(cache) == 0
+
+
+def test_lru_evicts_by_entries_and_bytes():
+    cache = HTTPCache(max_entries=2, max_bytes=1000)
+    send = FakeSend(*(_response(body={"n": n}, cache_control="max-age=60") for n in range(3)))
+    for n in range(3):
+        asyncio.run(cache.fetch(f"{URL}/{n}", send))
+    assert cache.get(f"{URL}/0") is None
+    assert len(cache) == 2 and cache.stats()["evictions"] == 1
+
+    small = HTTPCache(max_bytes=10)
+    asyncio.run(small.fetch(URL, FakeSend(_response(body={"long": "x" * 20}, cache_control="max-age=60"))))
+    assert len(small) == 0
+
+
+def test_directory_survives_restart(tmp_path):
+    cache = HTTPCache(directory=str(tmp_path))
+    _fetch(cache, FakeSend(_response(body={"n": 1}, cache_control="max-age=60", etag='"v1"')))
+
+    restarted = HTTPCache(directory=str(tmp_path))
+    assert _fetch(restarted, FakeSend()) == {"n": 1}
+    assert restarted.stats()["disk_hits"] == 1
+
+    restarted.discard(URL)
+    assert HTTPCache(directory=str(tmp_path)).get(URL) is None
+
+
+def test_fetch_keeps_directory_io_off_the_event_loop(tmp_path, monkeypatch):
+    threads = []
+    for name in ("_read", "_write", "_remove"):
+        original = getattr(HTTPCache, name)
+
+        def recorded(self, *args, _original=original, _name=name):
+            threads.append((_name, threading.get_ident()))
+            return _original(self, *args)
+
+        monkeypatch.setattr(HTTPCache, name, recorded)
+
+    async def main():
+        loop_thread = threading.get_ident()
+        cache = HTTPCache(directory=str(tmp_path))
+        send = FakeSend(_response(body={"n": 1}, cache_control="max-age=0", etag='"v1"'),
+                        _response(304, cache_control="max-age=60"),
+                        _response(body={"n": 2}, cache_control="no-store"))
+        assert await cache.fetch(URL, send) == {"n": 1}
+        assert len(list(tmp_path.iterdir())) == 1
+        cache._entries.clear()
+        # Loaded back from the directory and revalidated
+        assert await cache.fetch(URL, send) == {"n": 1}
+        assert cache.stats()["disk_hits"] == 1 and cache.stats()["not_modified"] == 1
+        cache.get(URL).expires = 0.0
+        assert await cache.fetch(URL, send) == {"n": 2}
+        assert list(tmp_path.iterdir()) == []
+        return loop_thread
+
+    loop_thread = asyncio.run(main())
+    assert [name for name, _ in threads] == ["_read", "_write", "_read", "_write", "_remove"]
+    assert all(thread != loop_thread for _, thread in threads)
@@ -0,0 +1,32 @@
+import pytest
+
+from price_analytics import analyze, count_around_mean
+from price_store import PriceSeries
+
+
+def _series(prices):
+    series = PriceSeries()
+    series.extend(enumerate(prices))
+    return series
+
+
+def test_analyze_does_not_scan_the_window(monkeypatch):
+    series = _series([20.0 + (day * 7 % 11) for day in range(400)])
+
+    def fail(*args):
+        raise AssertionError("analyze walked the window")
+
+    monkeypatch.setattr(PriceSeries, "slice", fail)
+    analysis = analyze(series, 10, 390)
+    assert analysis.days == 380
+    assert analysis.week_change == pytest.approx((series.prices[389] / series.prices[382] - 1) * 100)
+    assert analysis.two_weeks_change == pytest.approx((series.prices[389] / series.prices[375] - 1) * 100)
+
+
+def test_count_around_mean_uses_exact_mean():
+    # 前綴和的平均是 35.50000000000001，單日區間不應算成低於平均
+    series = _series([0.1 * (1 + day % 3) for day in range(200)] + [35.5])
+    assert series.mean(200, 201) != 35.5
+    assert count_around_mean(series, 200, 201) == (0, 0)
+    assert count_around_mean(_series([10.0, 20.0, 30.0, 30.0])) == (2, 2)
+    assert count_around_mean(PriceSeries()) == (0, 0)
@@ -0,0 +1,32 @@
+from price_compare import align
+from price_store import PriceSeries
+
+
+def _series(ticks):
+    series = PriceSeries()
+    series.extend(ticks)
+    return series
+
+
+def test_align_without_gaps_returns_views():
+    apple = _series((day, 10.0 + day) for day in range(20))
+    banana = _series((day, 30.0 - day) for day in range(5, 25))
+    dates, (apples, bananas) = align([apple, banana], 7)
+    # 以最早結束的蘋果（第 19 天）為準
+    assert dates == list(range(13, 20))
+    assert list(apples) == [10.0 + day for day in dates]
+    assert list(bananas) == [30.0 - day for day in dates]
+    assert isinstance(apples, memoryview)
+
+
+def test_align_intersects_missing_dates():
+    apple = _series([(1, 10.0), (2, 11.0), (4, 13.0), (5, 14.0), (6, 15.0)])
+    banana = _series([(2, 21.0), (3, 22.0), (5, 24.0), (6, 25.0), (9, 99.0)])
+    kiwi = _series([(2, 31.0), (5, 34.0), (6, 35.0)])
+    dates, columns = align([apple, banana, kiwi], 5)
+    assert dates == [2, 5, 6]
+    assert [list(column) for column in columns] == [[11.0, 14.0, 15.0], [21.0, 24.0, 25.0], [31.0, 34.0, 35.0]]
+
+    dates, columns = align([apple, banana], 1)
+    assert dates == [6] and [list(column) for column in columns] == [[15.0], [25.0]]
+    assert align([apple, _series([(1, 1.0), (3, 3.0)])], 1)[0] == []
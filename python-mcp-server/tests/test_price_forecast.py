@@ -0,0 +1,49 @@
+import pytest
+
+from price_forecast import HoltWinters, _weekday
+
+
+def test_constant_prices_forecast_flat():
+    model = HoltWinters.fit(range(60), [25.0] * 60)
+    points = model.forecast(14)
+    assert [point.day for point in points] == list(range(60, 74))
+    for point in points:
+        assert point.value == pytest.approx(25.0)
+        assert point.lower == pytest.approx(25.0) and point.upper == pytest.approx(25.0)
+
+
+def test_trend_and_weekly_season():
+    # 每天漲 0.5 元，週末另外貴 3 元
+    def price(day):
+        return 20.0 + 0.5 * day + (3.0 if _weekday(day) >= 5 else 0.0)
+
+    model = HoltWinters.fit(range(365), [price(day) for day in range(365)])
+    points = model.forecast(7)
+    # 阻尼趨勢讓預測略低於線性外推
+    for point in points:
+        assert point.value == pytest.approx(price(point.day), abs=2.0)
+        assert point.lower <= point.value <= point.upper
+    # 扣除趨勢後，週末仍比平日貴約 3 元
+    residuals = [(point.value - 0.5 * point.day, _weekday(point.day) >= 5) for point in points]
+    weekend = [value for value, is_weekend in residuals if is_weekend]
+    weekday = [value for value, is_weekend in residuals if not is_weekend]
+    assert min(weekend) - max(weekday) > 2.0
+    # 區間隨預測天數變寬
+    widths = [point.upper - point.lower for point in points]
+    assert widths == sorted(widths)
+
+
+def test_gaps_extend_the_trend():
+    days = [day for day in range(120) if day % 5]
+    model = HoltWinters.fit(days, [10.0 + day for day in days])
+    assert model.last_day == 119 and model.count == len(days)
+    assert model.forecast(1)[0].value == pytest.approx(120.0 + 10.0, rel=0.02)
+
+
+def test_push_matches_fit_and_empty_model_raises():
+    with pytest.raises(ValueError):
+        HoltWinters().forecast(3)
+    model = HoltWinters()
+    for day in range(30):
+        model.push(day, 10.0 + day % 4)
+    assert model.forecast(5) == HoltWinters.fit(range(30), [10.0 + day % 4 for day in range(30)]).forecast(5)
@@ -0,0 +1,187 @@
+import threading
+
+import pytest
+
+import price_history
+from price_history import _ENTRY, _SEQUENCE, _SEQUENCE_OFFSET, PriceHistoryError, PriceHistoryFile
+
+
+def _write(history, slot, rows):
+    dates, prices, length = history.columns(slot)
+    for n, (day, price) in enumerate(rows, start=length):
+        dates[n] = day
+        prices[n] = price
+    history.set_length(slot, length + len(rows))
+
+
+def _rows(history, slot):
+    dates, prices, length = history.columns(slot)
+    return list(zip(dates[:length], prices[:length]))
+
+
+def test_add_and_reopen(tmp_path):
+    path = str(tmp_path / "prices.bin")
+    history = PriceHistoryFile(path)
+    slot = history.add("apple", "蘋果", "公斤", capacity=8)
+    assert history.add("apple") == slot
+    _write(history, slot, [(1, 10.0), (2, 11.5)])
+    history.close()
+
+    history = PriceHistoryFile(path)
+    assert "apple" in history and len(history) == 1
+    assert list(history.entries()) == [("apple", "蘋果", "公斤", slot)]
+    assert _rows(history, slot) == [(1, 10.0), (2, 11.5)]
+    history.close()
+
+
+def test_grow_moves_committed_rows(tmp_path):
+    history = PriceHistoryFile(str(tmp_path / "prices.bin"))
+    slot = history.add("apple", capacity=2)
+    other = history.add("banana", capacity=2)
+    _write(history, slot, [(1, 10.0), (2, 11.0)])
+    _write(history, other, [(1, 30.0)])
+
+    dates, prices = history.grow(slot, 64)
+    assert len(dates) == len(prices) == 64
+    assert _rows(history, slot) == [(1, 10.0), (2, 11.0)]
+    # 搬移後其他產品不受影響
+    assert _rows(history, other) == [(1, 30.0)]
+    history.close()
+
+
+def test_grow_moves_uncommitted_rows(tmp_path):
+    history = PriceHistoryFile(str(tmp_path / "prices.bin"))
+    slot = history.add("apple", capacity=2)
+    dates, prices, _ = history.columns(slot)
+    dates[0], prices[0] = 1, 10.0
+    dates[1], prices[1] = 2, 11.0
+
+    # 尚未提交的兩筆以 rows 一起搬移
+    dates, prices = history.grow(slot, 4, rows=2)
+    assert history.length(slot) == 0
+    dates[2], prices[2] = 3, 12.0
+    history.set_length(slot, 3)
+    assert _rows(history, slot) == [(1, 10.0), (2, 11.0), (3, 12.0)]
+    history.close()
+
+
+def test_index_relocates_when_full(tmp_path):
+    path = str(tmp_path / "prices.bin")
+    history = PriceHistoryFile(path, index_capacity=2)
+    slots = {}
+    for i in range(5):
+        slots[f"fruit{i}"] = slot = history.add(f"fruit{i}", capacity=2)
+        _write(history, slot, [(i, float(i))])
+    history.close()
+
+    history = PriceHistoryFile(path)
+    assert [key for key, _, _, _ in history.entries()] == [f"fruit{i}" for i in range(5)]
+    for i in range(5):
+        assert _rows(history, slots[f"fruit{i}"]) == [(i, float(i))]
+    history.close()
+
+
+def test_every_write_advances_sequence(tmp_path):
+    history = PriceHistoryFile(str(tmp_path / "prices.bin"))
+    start = history.sequence
+    slot = history.add("apple", capacity=2)
+    after_add = history.sequence
+    _write(history, slot, [(1, 1.0)])
+    after_commit = history.sequence
+    history.grow(slot, 8)
+    assert start < after_add < after_commit < history.sequence
+    history.close()
+
+
+def test_readonly(tmp_path):
+    path = str(tmp_path / "prices.bin")
+    with pytest.raises(PriceHistoryError):
+        PriceHistoryFile(path, readonly=True)
+
+    writer = PriceHistoryFile(path)
+    slot = writer.add("apple", capacity=2)
+    reader = PriceHistoryFile(path, readonly=True)
+    with pytest.raises(PriceHistoryError):
+        reader.add("banana")
+    with pytest.raises(PriceHistoryError):
+        reader.set_length(slot, 1)
+    reader.close()
+    writer.close()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"\0" * 128)
+    with pytest.raises(PriceHistoryError):
+        PriceHistoryFile(str(path))
+
+
+def test_reader_sees_grow(tmp_path):
+    path = str(tmp_path / "prices.bin")
+    writer = PriceHistoryFile(path)
+    slot = writer.add("apple", capacity=2)
+    _write(writer, slot, [(1, 10.0), (2, 11.0)])
+    reader = PriceHistoryFile(path, readonly=True)
+    old_dates, _, _ = reader.columns(slot)
+
+    writer.grow(slot, 4096)
+    _write(writer, slot, [(3, 12.0)])
+    assert reader.refresh()
+    dates, prices, length = reader.columns(slot)
+    assert len(dates) == len(prices) == 4096
+    assert list(zip(dates[:length], prices[:length])) == [(1, 10.0), (2, 11.0), (3, 12.0)]
+    # 讀取端先前取得的視圖仍指向舊區塊
+    assert list(old_dates) == [1, 2]
+    reader.close()
+    writer.close()
+
+
+def test_reader_waits_for_write_in_progress(tmp_path):
+    path = str(tmp_path / "prices.bin")
+    writer = PriceHistoryFile(path)
+    slot = writer.add("apple", capacity=2)
+    _write(writer, slot, [(1, 10.0)])
+    reader = PriceHistoryFile(path, readonly=True)
+    results = []
+
+    with writer._writing():
+        assert writer.sequence % 2
+        # 模擬改寫到一半的索引項目：位移已更新、容量仍是舊值
+        entry = list(_ENTRY.unpack_from(writer._mm, writer._entry_offset(slot)))
+        entry[3] = writer._allocate(12 * 8)
+        _ENTRY.pack_into(writer._mm, writer._entry_offset(slot), *entry)
+        thread = threading.Thread(target=lambda: results.append(reader.columns(slot)))
+        thread.start()
+        thread.join(0.05)
+        assert thread.is_alive() and not results
+        entry[4] = 8
+        _ENTRY.pack_into(writer._mm, writer._entry_offset(slot), *entry)
+        writer._write_header()
+    thread.join(1)
+
+    dates, prices, length = results[0]
+    assert (len(dates), len(prices), length) == (8, 8, 1)
+    assert writer.sequence % 2 == 0
+    reader.close()
+    writer.close()
+
+
+def test_interrupted_write(tmp_path, monkeypatch):
+    path = str(tmp_path / "prices.bin")
+    writer = PriceHistoryFile(path)
+    slot = writer.add("apple", capacity=2)
+    # 寫入行程在寫入中途結束，序號停在奇數
+    _SEQUENCE.pack_into(writer._mm, _SEQUENCE_OFFSET, writer.sequence + 1)
+    writer.close()
+
+    monkeypatch.setattr(price_history, "_READ_TIMEOUT", 0.01)
+    with pytest.raises(PriceHistoryError):
+        PriceHistoryFile(path, readonly=True)
+
+    # 重新開啟的寫入行程結束該次寫入，讀取端恢復正常
+    writer = PriceHistoryFile(path)
+    assert writer.sequence % 2 == 0
+    reader = PriceHistoryFile(path, readonly=True)
+    assert reader.length(slot) == 0
+    reader.close()
+    writer.close()
@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+
+import pytest
+
+from price_ingest import ingest, parse
+from price_store import PriceStore, to_epoch_day
+
+TODAY = date.today()
+
+
+def _store():
+    store = PriceStore()
+    store.create("apple").append(to_epoch_day(TODAY) - 10, 30.0)
+    store.create("banana")
+    return store
+
+
+def _resolve(name):
+    return {"apple": "apple", "蘋果": "apple", "banana": "banana"}.get(name)
+
+
+def _day(offset):
+    return (TODAY + timedelta(days=offset)).isoformat()
+
+
+def test_accepts_sorted_batches_and_skips_stale():
+    store = _store()
+    records = [
+        {"fruit": "banana", "date": _day(-2), "price": "20"},
+        {"fruit": "蘋果", "date": _day(-1), "price": 31.5},
+        {"fruit": "apple", "date": _day(-3), "price": 31.0},
+        {"fruit": "apple", "date": _day(-20), "price": 29.0},
+        {"fruit": "banana", "date": _day(-2), "price": "21"},
+        {"fruit": "banana", "price": "22"},
+    ]
+    result = ingest(store, records, _resolve)
+    assert (result.accepted, result.stale, result.errors) == (4, 1, [])
+    assert result.products == {"banana": 2, "apple": 2}
+    assert list(store["apple"].prices) == [30.0, 31.0, 31.5]
+    assert list(store["banana"].prices) == [21.0, 22.0]
+
+
+@pytest.mark.parametrize("price", ["nan", "inf", "-inf", 0, "-5", "abc"])
+def test_rejects_invalid_prices(price):
+    store = _store()
+    version = store.version
+    result = ingest(store, [{"fruit": "banana", "date": _day(-1), "price": price}], _resolve)
+    assert result.accepted == 0 and len(result.errors) == 1
+    assert result.errors[0].startswith("第 1 筆")
+    assert len(store["banana"]) == 0 and store.version == version
+
+
+def test_rejects_future_dates():
+    store = _store()
+    records = [{"fruit": "apple", "date": _day(1), "price": 99},
+               {"fruit": "apple", "date": "2099-01-01", "price": 99},
+               {"fruit": "apple", "date": _day(0), "price": 32}]
+    result = ingest(store, records, _resolve)
+    assert result.accepted == 1
+    assert [e.split("：")[0] for e in result.errors] == ["第 1 筆", "第 2 筆"]
+    assert store["apple"].last_price == 32.0
+
+
+def test_invalid_records_do_not_create_fruits():
+    store = _store()
+    created = []
+
+    def create(name, zh_name, unit):
+        created.append(name)
+        store.create(name)
+        return name
+
+    result = ingest(store, [{"fruit": "kiwi", "price": "nan"}, {"fruit": "mango", "price": "-1"}], _resolve, create)
+    assert created == [] and result.created == []
+    assert "kiwi" not in store and len(result.errors) == 2
+
+
+def test_unknown_fruit_and_missing_fields():
+    result = ingest(_store(), [{"fruit": "kiwi", "price": 1}, {"price": 1}, {"fruit": "apple"}], _resolve)
+    assert result.accepted == 0 and len(result.errors) == 3
+
+
+def test_parse_formats():
+    assert list(parse("fruit,price\napple,1\n", "csv")) == [{"fruit": "apple", "price": "1"}]
+    assert list(parse('{"fruit": "apple", "price": 1}\n\n', "jsonl")) == [{"fruit": "apple", "price": 1}]
+    with pytest.raises(ValueError):
+        parse("", "xml")
@@ -0,0 +1,84 @@
+import pytest
+
+import fruit_price_server
+from name_index import NameIndex
+from price_history import DEFAULT_BLOCK_CAPACITY, PriceHistoryError
+from price_store import PriceStore
+
+
+@pytest.fixture
+def stores(tmp_path):
+    path = str(tmp_path / "prices.bin")
+    writer = PriceStore.open(path)
+    writer.create("apple", "蘋果", "公斤").extend([(1, 10.0), (2, 11.0)])
+    reader = PriceStore.open(path, readonly=True)
+    yield writer, reader
+    reader.history.close()
+    writer.history.close()
+
+
+def test_reader_requires_existing_file(tmp_path):
+    with pytest.raises(PriceHistoryError):
+        PriceStore.open(str(tmp_path / "missing.bin"), readonly=True)
+
+
+def test_refresh_without_changes(stores):
+    _, reader = stores
+    assert list(reader) == ["apple"]
+    version = reader.version
+    assert reader.refresh() == []
+    assert reader.version == version
+
+
+def test_refresh_picks_up_new_rows(stores):
+    writer, reader = stores
+    series = reader["apple"]
+    assert series.stats().count == 2
+    writer["apple"].append(3, 14.0)
+
+    assert reader.refresh() == ["apple"]
+    assert list(series.prices) == [10.0, 11.0, 14.0]
+    # 統計索引以增量方式更新
+    assert series.stats() == writer["apple"].stats()
+
+
+def test_refresh_follows_moved_block(stores):
+    writer, reader = stores
+    series = reader["apple"]
+    series.stats()
+    ticks = [(day, float(day)) for day in range(3, 3 + 2 * DEFAULT_BLOCK_CAPACITY)]
+    writer["apple"].extend(ticks)
+
+    assert reader.refresh() == ["apple"]
+    assert len(series) == 2 + len(ticks)
+    assert list(series.prices) == list(writer["apple"].prices)
+    assert series.stats() == writer["apple"].stats()
+
+
+def test_refresh_over_product_without_rows(stores):
+    writer, reader = stores
+    kiwi = writer.create("kiwi", "奇異果", "公斤")
+
+    # 新增產品會推進序號，但尚未提交任何價格
+    assert reader.refresh() == ["kiwi"]
+    assert len(reader["kiwi"]) == 0
+    assert reader.refresh() == []
+
+    kiwi.append(1, 50.0)
+    assert reader.refresh() == ["kiwi"]
+    assert reader["kiwi"].last_price == 50.0
+    assert reader["kiwi"].stats().count == 1
+
+
+def test_add_fruits_waits_for_first_commit(stores, monkeypatch):
+    writer, reader = stores
+    monkeypatch.setattr(fruit_price_server, "FRUITS", {})
+    monkeypatch.setattr(fruit_price_server, "NAMES", NameIndex())
+    kiwi = writer.create("kiwi", "奇異果", "公斤")
+
+    fruit_price_server._add_fruits(reader, reader.refresh() + ["apple"])
+    assert list(fruit_price_server.FRUITS) == ["apple"]
+
+    kiwi.append(1, 50.0)
+    fruit_price_server._add_fruits(reader, reader.refresh())
+    assert fruit_price_server.FRUITS["kiwi"] == {"zh_name": "奇異果", "current_price": 50.0, "unit": "公斤"}
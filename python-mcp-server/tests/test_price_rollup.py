@@ -0,0 +1,38 @@
+from price_rollup import lttb_indices
+
+
+def _wave(count):
+    return list(range(count)), [float((i * 37) % 23) for i in range(count)]
+
+
+def test_lttb_keeps_endpoints_and_size():
+    xs, ys = _wave(1000)
+    for threshold in (3, 10, 99, 500):
+        indices = lttb_indices(xs, ys, threshold)
+        assert len(indices) == threshold
+        assert indices[0] == 0 and indices[-1] == 999
+        assert indices == sorted(set(indices))
+
+
+def test_lttb_small_inputs():
+    xs, ys = _wave(10)
+    assert lttb_indices(xs, ys, 10) == list(range(10))
+    assert lttb_indices(xs, ys, 50) == list(range(10))
+    assert lttb_indices(xs, ys, 2) == [0, 9]
+
+
+def test_lttb_keeps_spikes():
+    xs = list(range(500))
+    ys = [10.0] * 500
+    ys[123], ys[321] = 90.0, -40.0
+    indices = lttb_indices(xs, ys, 20)
+    assert 123 in indices and 321 in indices
+
+
+def test_lttb_selects_from_candidates():
+    xs, ys = _wave(300)
+    candidates = list(range(5, 295, 3))
+    indices = lttb_indices(xs, ys, 12, candidates)
+    assert len(indices) == 12
+    assert indices[0] == 5 and indices[-1] == candidates[-1]
+    assert set(indices) <= set(candidates)
@@ -0,0 +1,96 @@
+import math
+import random
+from array import array
+
+import pytest
+
+from price_stats import BLOCK_SIZE, RangeStats
+
+
+def _expected(values, start, stop):
+    window = values[start:stop]
+    mean = sum(window) / len(window)
+    changes = [b - a for a, b in zip(window, window[1:])]
+    return {
+        "count": len(window),
+        "first": window[0],
+        "last": window[-1],
+        "mean": mean,
+        "std": math.sqrt(sum((v - mean) ** 2 for v in window) / len(window)),
+        "min": min(window),
+        "max": max(window),
+        "max_change": max((abs(c) for c in changes), default=0.0),
+        "up": sum(c > 0 for c in changes),
+        "down": sum(c < 0 for c in changes),
+    }
+
+
+def _check(index, values, start, stop):
+    stats = index.query(values, start, stop)
+    expected = _expected(values, start, stop)
+    for field in ("count", "first", "last", "min", "max", "max_change", "up", "down"):
+        assert getattr(stats, field) == expected[field], (field, start, stop)
+    assert stats.mean == pytest.approx(expected["mean"])
+    # 前綴平方和相減會留下約 sqrt(eps * sumsq) 的誤差
+    assert stats.std == pytest.approx(expected["std"], abs=1e-5)
+    assert stats.flat == stats.count - 1 - stats.up - stats.down
+
+
+def test_query_matches_brute_force_across_blocks():
+    rng = random.Random(7)
+    values = array("d", (round(rng.uniform(10, 100), 1) for _ in range(5 * BLOCK_SIZE + 7)))
+    index = RangeStats.build(values)
+    n = len(values)
+    # 區塊邊界前後與跨越多個區塊的區間
+    edges = sorted({0, 1, n - 1, n} | {b * BLOCK_SIZE + d for b in range(6) for d in (-1, 0, 1)})
+    edges = [e for e in edges if 0 <= e <= n]
+    for start in edges:
+        for stop in edges:
+            if start < stop:
+                _check(index, values, start, stop)
+
+
+def test_append_matches_build():
+    rng = random.Random(11)
+    values = array("d")
+    index = RangeStats()
+    for _ in range(3 * BLOCK_SIZE + 5):
+        values.append(rng.choice((20.0, 21.5, 19.0, rng.uniform(0, 50))))
+        index.append(values, values[-1])
+    built = RangeStats.build(values)
+    assert len(index) == len(built) == len(values)
+    for start, stop in ((0, len(values)), (3, 2 * BLOCK_SIZE + 1), (BLOCK_SIZE, 3 * BLOCK_SIZE)):
+        assert index.query(values, start, stop) == built.query(values, start, stop)
+        _check(index, values, start, stop)
+
+
+def test_build_with_length_ignores_spare_capacity():
+    values = array("d", [5.0, 6.0, 4.0, 0.0, 0.0, 0.0])
+    index = RangeStats.build(values, 3)
+    assert len(index) == 3
+    stats = index.query(values, 0, 3)
+    assert (stats.min, stats.max, stats.last) == (4.0, 6.0, 4.0)
+
+
+def test_total_and_mean_keep_precision_for_large_prices():
+    values = array("d", [1e9 + 0.1 * i for i in range(100)])
+    index = RangeStats.build(values)
+    assert index.total(10, 20) == pytest.approx(math.fsum(values[10:20]), rel=1e-15)
+    assert index.mean(10, 20) == pytest.approx(math.fsum(values[10:20]) / 10, rel=1e-15)
+    assert index.query(values, 0, 100).std == pytest.approx(math.sqrt((100 ** 2 - 1) / 12) * 0.1)
+
+
+def test_single_value_and_flat_series():
+    values = array("d", [3.0] * (BLOCK_SIZE + 2))
+    index = RangeStats.build(values)
+    one = index.query(values, 5, 6)
+    assert (one.count, one.up, one.down, one.flat, one.max_change, one.std) == (1, 0, 0, 0, 0.0, 0.0)
+    flat = index.query(values, 0, len(values))
+    assert (flat.up, flat.down, flat.flat) == (0, 0, len(values) - 1)
+
+
+def test_empty_range_raises():
+    values = array("d", [1.0, 2.0])
+    index = RangeStats.build(values)
+    with pytest.raises(ValueError):
+        index.query(values, 1, 1)
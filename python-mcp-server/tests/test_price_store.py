@@ -0,0 +1,80 @@
+import pytest
+
+from price_history import DEFAULT_BLOCK_CAPACITY
+from price_store import MappedPriceSeries, PriceSeries, PriceStore
+
+
+def _ticks(count, start=0):
+    return [(start + i, 20.0 + (i * 7 % 11) - 5) for i in range(count)]
+
+
+def test_extend_crosses_grow_on_mapped_series(tmp_path):
+    path = str(tmp_path / "prices.bin")
+    store = PriceStore.open(path)
+    series = store.create("apple", "蘋果", "公斤")
+    assert isinstance(series, MappedPriceSeries)
+    series.append(*_ticks(1)[0])
+    series.stats()
+
+    # 一次批次追加跨越多次搬移，未提交的筆數也要一起搬到新區塊
+    ticks = _ticks(3 * DEFAULT_BLOCK_CAPACITY, start=1)
+    assert series.extend(ticks) == len(ticks)
+    assert series.capacity > DEFAULT_BLOCK_CAPACITY
+
+    expected = PriceSeries()
+    expected.extend(_ticks(1) + ticks)
+    assert list(series.dates) == list(expected.dates)
+    assert list(series.prices) == list(expected.prices)
+    assert series.stats() == expected.stats()
+    assert series.stats(10, 150) == expected.stats(10, 150)
+    store.history.close()
+
+    store = PriceStore.open(path)
+    assert list(store["apple"].prices) == list(expected.prices)
+    assert store["apple"].stats() == expected.stats()
+    store.history.close()
+
+
+def test_extend_commits_rows_before_an_error(tmp_path):
+    store = PriceStore.open(str(tmp_path / "prices.bin"))
+    series = store.create("apple")
+    version = store.version
+    ticks = _ticks(DEFAULT_BLOCK_CAPACITY + 5)
+    with pytest.raises(ValueError):
+        series.extend(ticks + [(0, 1.0)])
+    assert len(series) == len(ticks)
+    assert store.history.length(store.history.slot("apple")) == len(ticks)
+    assert store.version > version
+    store.history.close()
+
+
+def test_create_shares_version_clock():
+    store = PriceStore()
+    apple = store.create("apple")
+    banana = store.create("banana")
+    assert store.create("apple") is apple
+    apple.append(1, 10.0)
+    banana.append(1, 20.0)
+    assert apple.version < banana.version == store.version
+
+
+def test_rolling_ewma_matches_replayed_history(tmp_path):
+    ticks = _ticks(100)
+    alpha = 2.0 / 8
+    expected = ticks[0][1]
+    for _, price in ticks[1:]:
+        expected += alpha * (price - expected)
+
+    series = PriceSeries()
+    series.extend(ticks)
+    assert series.rolling().ewma == pytest.approx(expected)
+    assert series.rolling().count == len(ticks)
+
+    # 由檔案載入的序列重播最近 30 筆，早期價格的權重已可忽略
+    path = str(tmp_path / "prices.bin")
+    store = PriceStore.open(path)
+    store.create("apple").extend(ticks)
+    store.history.close()
+    store = PriceStore.open(path)
+    assert store["apple"].rolling().ewma == pytest.approx(expected, rel=1e-3)
+    store.history.close()
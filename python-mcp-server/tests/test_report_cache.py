@@ -0,0 +1,40 @@
+from report_cache import ReportCache
+
+
+def test_new_version_invalidates_and_overwrites():
+    cache = ReportCache()
+    renders = []
+
+    def render(text):
+        return lambda: renders.append(text) or text
+
+    key = ("get_price_chart", "apple", 30)
+    assert cache.get_or_render(key, 1, render("v1")) == "v1"
+    assert cache.get_or_render(key, 1, render("again")) == "v1"
+    assert cache.get_or_render(key, 2, render("v2")) == "v2"
+    assert renders == ["v1", "v2"]
+    # 舊版本不再命中，也不會留在快取中
+    assert cache.get(key, 1) is None
+    assert cache.get(key, 2) == "v2"
+    assert len(cache) == 1
+    assert cache.stats()["hits"] == 2
+
+
+def test_eviction_by_entries_and_bytes():
+    cache = ReportCache(max_entries=2)
+    cache.put("a", 1, "A")
+    cache.put("b", 1, "B")
+    cache.get("a", 1)
+    cache.put("c", 1, "C")
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) == "A" and cache.get("c", 1) == "C"
+    assert cache.evictions == 1
+
+    cache = ReportCache(max_bytes=1000)
+    cache.put("small", 1, "x" * 10)
+    cache.put("huge", 1, "x" * 5000)
+    assert cache.get("huge", 1) is None
+    assert cache.get("small", 1) == "x" * 10
+    cache.put("big", 1, "x" * 900)
+    assert cache.get("small", 1) is None
+    assert cache.stats()["bytes"] <= 1000
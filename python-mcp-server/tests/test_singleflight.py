@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from nws_client import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    flights = SingleFlight()
+    started = []
+
+    async def fetch():
+        started.append(1)
+        await asyncio.sleep(0.01)
+        return {"n": len(started)}
+
+    async def main():
+        results = await asyncio.gather(*(flights.do("a", fetch) for _ in range(5)), flights.do("b", fetch))
+        return results
+
+    results = asyncio.run(main())
+    assert len(started) == 2
+    assert all(r is results[0] for r in results[:5])
+    assert flights.stats() == {"calls": 2, "coalesced": 4, "in_flight": 0, "max_waiters": 5}
+
+
+def test_finished_calls_are_not_cached():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        return [await flights.do("a", fetch), await flights.do("a", fetch)]
+
+    assert asyncio.run(main()) == [1, 2]
+
+
+def test_exception_reaches_every_caller():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream")
+
+    async def main():
+        return await asyncio.gather(*(flights.do("a", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [type(r) for r in results] == [RuntimeError] * 3
+    assert flights.stats()["calls"] == 1
+
+
+def test_cancelling_one_caller_keeps_the_shared_call():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flights.do("a", fetch))
+        second = asyncio.ensure_future(flights.do("a", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
@@ -0,0 +1,192 @@
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# 延遲直方圖的區間上限（秒），最後一格為 +Inf
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def payload_size(result: Any) -> int:
+    """估計回應的大小（bytes）：字串以 UTF-8 計算，圖片等以其資料計算"""
+    if isinstance(result, str):
+        return len(result.encode("utf-8"))
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    data = getattr(result, "data", None)
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    if isinstance(result, (list, tuple)):
+        return sum(payload_size(item) for item in result)
+    return len(str(result).encode("utf-8")) if result is not None else 0
+
+
+class _Series:
+    """單一工具或資源的呼叫統計"""
+    __slots__ = ("calls", "errors", "seconds", "max_seconds", "bytes", "buckets")
+
+    def __init__(self, bucket_count: int):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.buckets = [0] * (bucket_count + 1)
+
+
+class Metrics:
+    """MCP 工具與資源的延遲、呼叫次數、錯誤次數與回應大小統計
+
+    以裝飾器包裝工具與資源函數，放在 @mcp.tool()／@mcp.resource() 的下方：
+
+        @mcp.tool()
+        @METRICS.tool
+        def get_price_chart(...): ...
+
+    同步與非同步函數都能包裝，包裝後的簽名與原函數相同，FastMCP 仍能推導參數。
+    """
+
+    def __init__(self, server: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.server = server
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def tool(self, fn: Callable) -> Callable:
+        return self.instrument("tool")(fn)
+
+    def resource(self, fn: Callable) -> Callable:
+        return self.instrument("resource")(fn)
+
+    def instrument(self, kind: str, name: Optional[str] = None) -> Callable[[Callable], Callable]:
+        """包裝函數以記錄每次呼叫
+
+        Args:
+            kind: tool 或 resource
+            name: 統計使用的名稱，省略時為函數名稱
+        """
+        def decorator(fn: Callable) -> Callable:
+            label = name or fn.__name__
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        result = await fn(*args, **kwargs)
+                    except BaseException:
+                        self.observe(kind, label, time.perf_counter() - start, 0, error=True)
+                        raise
+                    self.observe(kind, label, time.perf_counter() - start, payload_size(result))
+                    return result
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException:
+                    self.observe(kind, label, time.perf_counter() - start, 0, error=True)
+                    raise
+                self.observe(kind, label, time.perf_counter() - start, payload_size(result))
+                return result
+            return wrapper
+        return decorator
+
+    def observe(self, kind: str, name: str, seconds: float, size: int, error: bool = False) -> None:
+        """記錄一次呼叫"""
+        bucket = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get((kind, name))
+            if series is None:
+                series = self._series[(kind, name)] = _Series(len(self.buckets))
+            series.calls += 1
+            series.errors += error
+            series.seconds += seconds
+            series.bytes += size
+            series.buckets[bucket] += 1
+            if seconds > series.max_seconds:
+                series.max_seconds = seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """各工具與資源的統計複本，鍵為 (kind, name)"""
+        with self._lock:
+            return {
+                key: {
+                    "calls": s.calls,
+                    "errors": s.errors,
+                    "seconds": s.seconds,
+                    "max_seconds": s.max_seconds,
+                    "bytes": s.bytes,
+                    "buckets": list(s.buckets),
+                }
+                for key, s in sorted(self._series.items())
+            }
+
+    def quantile(self, buckets: list, q: float) -> float:
+        """由直方圖估計分位數，回傳所在區間的上限（秒）；落在 +Inf 區間時回傳 inf"""
+        total = sum(buckets)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for bound, count in zip(self.buckets, buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def render_text(self) -> str:
+        """以表格呈現各工具與資源的呼叫統計"""
+        lines = [f"{self.server} 呼叫統計（啟動後 {time.time() - self.started:.0f} 秒）：",
+                 "+----------+------------------------+--------+------+----------+----------+----------+------------+",
+                 "| 類型     | 名稱                   | 次數   | 錯誤 | 平均 ms  | p50≤ ms  | p99≤ ms  | 平均 bytes |",
+                 "+----------+------------------------+--------+------+----------+----------+----------+------------+"]
+        for (kind, name), s in self.snapshot().items():
+            calls = s["calls"]
+            mean_ms = s["seconds"] / calls * 1000
+            p50 = self.quantile(s["buckets"], 0.5) * 1000
+            p99 = self.quantile(s["buckets"], 0.99) * 1000
+            lines.append(f"| {kind:8} | {name:22} | {calls:6d} | {s['errors']:4d} | {mean_ms:8.2f} | "
+                         f"{p50:8.1f} | {p99:8.1f} | {s['bytes'] // calls:10d} |")
+        lines.append("+----------+------------------------+--------+------+----------+----------+----------+------------+")
+        return "\n".join(lines) + "\n"
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文字格式的統計，每個指標的 HELP、TYPE 與樣本連續排列"""
+        server = escape_label(self.server)
+        series = [(f'server="{server}",kind="{kind}",name="{escape_label(name)}"', s)
+                  for (kind, name), s in self.snapshot().items()]
+        lines = []
+        for metric, key, help_text in (("mcp_requests_total", "calls", "MCP tool and resource calls."),
+                                       ("mcp_request_errors_total", "errors",
+                                        "MCP tool and resource calls that raised an exception."),
+                                       ("mcp_response_bytes_total", "bytes", "Size of MCP tool and resource responses.")):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for labels, s in series:
+                lines.append(f"{metric}{{{labels}}} {s[key]}")
+
+        lines.append("# HELP mcp_request_duration_seconds MCP tool and resource latency.")
+        lines.append("# TYPE mcp_request_duration_seconds histogram")
+        for labels, s in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), s["buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'mcp_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"mcp_request_duration_seconds_sum{{{labels}}} {s['seconds']:.6f}")
+            lines.append(f"mcp_request_duration_seconds_count{{{labels}}} {s['calls']}")
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value: str) -> str:
+    """跳脫 Prometheus 標籤值中的反斜線、引號與換行"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
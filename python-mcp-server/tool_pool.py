@@ -0,0 +1,241 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+
+from report_cache import ReportCache
+from tool_metrics import escape_label
+
+MODES = ("thread", "inline")
+DEFAULT_MODE = "thread"
+DEFAULT_MAX_WORKERS = 4
+
+
+class ReadWriteLock:
+    """讀寫鎖：多個讀取者可同時持有，寫入者獨佔；有寫入者等待時新的讀取者需等候"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            self._cond.wait_for(lambda: not self._writer and not self._waiting_writers)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            self._waiting_writers += 1
+            self._cond.wait_for(lambda: not self._writer and not self._readers)
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class _ToolStats:
+    """單一工具的排隊與執行統計"""
+    __slots__ = ("limit", "queued", "running", "max_queued", "completed", "errors", "wait_seconds", "run_seconds")
+
+    def __init__(self, limit: Optional[int]):
+        self.limit = limit
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.errors = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+
+class ToolPool:
+    """在執行緒池中執行耗時的工具，不阻塞 FastMCP 的事件迴圈
+
+    - 每個工具可設定同時執行的上限，超過時在事件迴圈中排隊，不佔用執行緒
+    - 讀取價格的工作可同時執行；寫入價格的工作（exclusive）獨佔執行，
+      等候執行中的讀取完成，期間新的讀取也會等候
+    - render() 先在事件迴圈中查詢報告快取，只有未命中時才交給執行緒池渲染
+
+    mode 為 inline 時直接在呼叫端執行，行為與未使用執行緒池時相同，仍記錄統計。
+    """
+
+    def __init__(self, mode: str = DEFAULT_MODE, max_workers: int = DEFAULT_MAX_WORKERS,
+                 limits: Optional[Dict[str, int]] = None):
+        if mode not in MODES:
+            raise ValueError(f"不支援的執行方式：{mode}（可用 {'、'.join(MODES)}）")
+        self.mode = mode
+        self.max_workers = max(max_workers, 1)
+        self.limits = dict(limits or {})
+        self.lock = ReadWriteLock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._stats: Dict[str, _ToolStats] = {}
+        self._stats_lock = threading.Lock()
+        # 信號量綁定事件迴圈，依迴圈分開保存
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = \
+            weakref.WeakKeyDictionary()
+
+    @classmethod
+    def from_env(cls, prefix: str, limits: Optional[Dict[str, int]] = None) -> "ToolPool":
+        """由環境變數設定：{prefix}_MODE、{prefix}_WORKERS 與 {prefix}_LIMITS（如 compare_many=2,screen_market=1）"""
+        merged = dict(limits or {})
+        for item in os.environ.get(f"{prefix}_LIMITS", "").split(","):
+            name, _, value = item.partition("=")
+            if name.strip() and value.strip():
+                merged[name.strip()] = int(value)
+        return cls(mode=os.environ.get(f"{prefix}_MODE", DEFAULT_MODE),
+                   max_workers=int(os.environ.get(f"{prefix}_WORKERS", str(DEFAULT_MAX_WORKERS))),
+                   limits=merged)
+
+    async def run(self, name: str, fn: Callable[..., Any], *args: Any, exclusive: bool = False) -> Any:
+        """執行 fn(*args)
+
+        Args:
+            name: 工具名稱，用於同時執行上限與統計
+            fn: 要執行的函數
+            args: 函數參數
+            exclusive: 是否獨佔執行（寫入價格時使用）
+
+        Returns:
+            函數的回傳值
+        """
+        stats = self._tool_stats(name)
+        if self.mode == "inline":
+            return self._call(stats, fn, args, exclusive)
+
+        stats.queued += 1
+        stats.max_queued = max(stats.max_queued, stats.queued)
+        queued_at = time.perf_counter()
+        semaphore = self._semaphore(name)
+        try:
+            if semaphore is not None:
+                await semaphore.acquire()
+        finally:
+            stats.queued -= 1
+        stats.wait_seconds += time.perf_counter() - queued_at
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), self._call, stats, fn, args, exclusive)
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+    async def render(self, name: str, cache: ReportCache, key: Hashable, version: Hashable,
+                     render: Callable[[], Any]) -> Any:
+        """取得快取的報告，未命中時在執行緒池中渲染後存入"""
+        value = cache.get(key, version)
+        if value is None:
+            value = await self.run(name, render)
+            cache.put(key, version, value)
+        return value
+
+    def _call(self, stats: _ToolStats, fn: Callable[..., Any], args: tuple, exclusive: bool) -> Any:
+        with self._stats_lock:
+            stats.running += 1
+        start = time.perf_counter()
+        error = False
+        try:
+            with self.lock.write() if exclusive else self.lock.read():
+                return fn(*args)
+        except BaseException:
+            error = True
+            raise
+        finally:
+            with self._stats_lock:
+                stats.run_seconds += time.perf_counter() - start
+                stats.completed += 1
+                stats.errors += error
+                stats.running -= 1
+
+    def _tool_stats(self, name: str) -> _ToolStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats.setdefault(name, _ToolStats(self.limits.get(name)))
+        return stats
+
+    def _semaphore(self, name: str) -> Optional[asyncio.Semaphore]:
+        limit = self.limits.get(name)
+        if not limit:
+            return None
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = semaphores.get(name)
+        if semaphore is None:
+            semaphore = semaphores[name] = asyncio.Semaphore(limit)
+        return semaphore
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+        return self._executor
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各工具的同時執行上限、排隊數、執行中數量、完成次數與平均等待／執行時間"""
+        result = {}
+        with self._stats_lock:
+            items = sorted(self._stats.items())
+        for name, s in items:
+            completed = s.completed
+            result[name] = {
+                "limit": s.limit,
+                "queued": s.queued,
+                "running": s.running,
+                "max_queued": s.max_queued,
+                "completed": completed,
+                "errors": s.errors,
+                "mean_wait_ms": s.wait_seconds / completed * 1000 if completed else 0.0,
+                "mean_run_ms": s.run_seconds / completed * 1000 if completed else 0.0,
+            }
+        return result
+
+    def render_text(self) -> str:
+        """以表格呈現各工具的排隊與執行狀況"""
+        lines = [f"工具執行緒池（{self.mode}，{self.max_workers} 個執行緒）：",
+                 "+------------------------+------+--------+--------+----------+--------+------------+------------+",
+                 "| 工具                   | 上限 | 執行中 | 排隊中 | 最大排隊 | 完成   | 平均等待ms | 平均執行ms |",
+                 "+------------------------+------+--------+--------+----------+--------+------------+------------+"]
+        for name, s in self.stats().items():
+            limit = str(s["limit"]) if s["limit"] else "-"
+            lines.append(f"| {name:22} | {limit:>4} | {s['running']:6d} | {s['queued']:6d} | {s['max_queued']:8d} | "
+                         f"{s['completed']:6d} | {s['mean_wait_ms']:10.2f} | {s['mean_run_ms']:10.2f} |")
+        lines.append("+------------------------+------+--------+--------+----------+--------+------------+------------+")
+        return "\n".join(lines) + "\n"
+
+    def render_prometheus(self, server: str) -> str:
+        """Prometheus 文字格式的排隊深度與執行中數量，每個指標的 HELP、TYPE 與樣本連續排列"""
+        server = escape_label(server)
+        stats = self.stats()
+        lines = []
+        for metric, key, help_text in (("mcp_tool_queue_depth", "queued",
+                                        "Calls waiting for a per-tool concurrency slot."),
+                                       ("mcp_tool_running", "running", "Calls currently running on the tool pool.")):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for name, s in stats.items():
+                lines.append(f'{metric}{{server="{server}",name="{escape_label(name)}"}} {s[key]}')
+        return "\n".join(lines) + "\n"
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -1,27 +1,58 @@
-from typing import Any
+import asyncio
+import atexit
+import functools
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable
 import httpx
-from mcp.server.fastmcp import FastMCP
-
-# Initialize FastMCP server
-mcp = FastMCP("weather", log_level="DEBUG")
+from mcp.server.fastmcp import Context, FastMCP
+from grid_cache import GridCache
+from nws_client import NWSClient
+from tool_metrics import Metrics
 
 # Constants
 NWS_API_BASE = "https://api.weather.gov"
 USER_AGENT = "weather-app/1.0"
 
+# get_forecasts / get_alerts_many: items per call, and items fetched at once per call
+MAX_BATCH_SIZE = 500
+BATCH_CONCURRENCY = int(os.environ.get("NWS_BATCH_CONCURRENCY", "8"))
+
+# One pooled, keep-alive HTTP client for the whole process. Pool limits, timeouts
+# and HTTP/2 are set with NWS_MAX_CONNECTIONS, NWS_MAX_KEEPALIVE, NWS_KEEPALIVE_EXPIRY,
+# NWS_TIMEOUT, NWS_CONNECT_TIMEOUT and NWS_HTTP2. Responses are cached following their
+# Cache-Control/Expires headers and revalidated with ETag/Last-Modified; the cache is
+# sized with NWS_CACHE_ENTRIES (0 disables it) and NWS_CACHE_BYTES, and persisted
+# under NWS_CACHE_DIR when set. Requests that reach the network are paced by a token
+# bucket of NWS_RATE_LIMIT requests per second (0 disables it) and NWS_RATE_BURST
+NWS = NWSClient.from_env(USER_AGENT)
+
+# Grid cells already resolved through /points, so coordinates inside a known cell go
+# straight to the forecast. Saved to NWS_GRID_CACHE (empty keeps them in memory only)
+GRID = GridCache.from_env(os.path.join(os.path.dirname(os.path.abspath(__file__)), "nws_grid_cells.json"))
+atexit.register(GRID.flush)
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Open the shared NWS client with the server and close it on shutdown, saving new grid cells."""
+    async with NWS:
+        try:
+            yield
+        finally:
+            await GRID.aflush()
+
+# Initialize FastMCP server
+mcp = FastMCP("weather", log_level="DEBUG", lifespan=lifespan)
+
+# Per-tool latency, error and response-size metrics
+METRICS = Metrics("weather")
+
 async def make_nws_request(url: str) -> dict[str, Any] | None:
     """Make a request to the NWS API with proper error handling."""
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Accept": "application/geo+json"
-    }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
-        except Exception:
-            return None
+    try:
+        return await NWS.get_json(url)
+    except Exception:
+        return None
 
 def format_alert(feature: dict) -> str:
     """Format an alert feature into a readable string."""
@@ -35,13 +66,17 @@ Instructions: {props.get('instruction', 'No specific instructions provided')}
 """
 
 @mcp.tool()
+@METRICS.tool
 async def get_alerts(state: str) -> str:
     """Get weather alerts for a US state.
 
     Args:
         state: Two-letter US state code (e.g. CA, NY)
     """
-    print(f"Tool registered: get_alerts")  # 添加调试信息
+    return await alerts_for_state(state)
+
+async def alerts_for_state(state: str) -> str:
+    """Active alerts for a US state as readable text."""
     url = f"{NWS_API_BASE}/alerts/active/area/{state}"
     data = await make_nws_request(url)
 
@@ -55,6 +90,7 @@ async def get_alerts(state: str) -> str:
     return "\n---\n".join(alerts)
 
 @mcp.tool()
+@METRICS.tool
 async def get_forecast(latitude: float, longitude: float) -> str:
     """Get weather forecast for a location.
 
@@ -62,20 +98,49 @@ async def get_forecast(latitude: float, longitude: float) -> str:
         latitude: Latitude of the location
         longitude: Longitude of the location
     """
-    print(f"Tool registered: get_forecast")  # 添加调试信息
-    # First get the forecast grid endpoint
-    points_url = f"{NWS_API_BASE}/points/{latitude},{longitude}"
-    points_data = await make_nws_request(points_url)
+    return await forecast_for_location(latitude, longitude)
+
+def has_forecast_periods(data: Any) -> bool:
+    """Whether a forecast response has the periods get_forecast formats."""
+    properties = data.get("properties") if isinstance(data, dict) else None
+    return isinstance(properties, dict) and isinstance(properties.get("periods"), list)
+
+async def forecast_for_location(latitude: float, longitude: float) -> str:
+    """The next five forecast periods for a location as readable text."""
+    # Coordinates inside a known grid cell skip the /points lookup
+    forecast_data = None
+    cell = GRID.lookup(latitude, longitude)
+    if cell is not None:
+        try:
+            forecast_data = await NWS.get_json(cell.forecast)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 404:
+                return "Unable to fetch detailed forecast."
+        except Exception:
+            # Timeouts and connection errors say nothing about the cell
+            return "Unable to fetch detailed forecast."
+        if not has_forecast_periods(forecast_data):
+            # The office may have redrawn its grid; resolve the location again
+            GRID.discard(cell)
+            forecast_data = None
 
-    if not points_data:
-        return "Unable to fetch forecast data for this location."
+    if not forecast_data:
+        # First get the forecast grid endpoint
+        points_url = f"{NWS_API_BASE}/points/{latitude},{longitude}"
+        points_data = await make_nws_request(points_url)
 
-    # Get the forecast URL from the points response
-    forecast_url = points_data["properties"]["forecast"]
-    forecast_data = await make_nws_request(forecast_url)
+        if not points_data:
+            return "Unable to fetch forecast data for this location."
 
-    if not forecast_data:
-        return "Unable to fetch detailed forecast."
+        # Get the forecast URL from the points response
+        forecast_url = points_data["properties"]["forecast"]
+        forecast_data = await make_nws_request(forecast_url)
+
+        if not has_forecast_periods(forecast_data):
+            return "Unable to fetch detailed forecast."
+
+        # The forecast's geometry is the grid cell's outline
+        GRID.add(latitude, longitude, points_data["properties"], forecast_data.get("geometry"))
 
     # Format the periods into a readable forecast
     periods = forecast_data["properties"]["periods"]
@@ -91,6 +156,93 @@ Forecast: {period['detailedForecast']}
 
     return "\n---\n".join(forecasts)
 
+async def run_batch(labels: list[str], fetches: list[Callable[[], Awaitable[str]]], ctx: Context | None) -> str:
+    """Run fetches concurrently, at most BATCH_CONCURRENCY at a time, and join their reports.
+
+    Each report is sent to the client as a log message and a progress update as
+    soon as it completes. A fetch that raises becomes an error entry for that
+    item only.
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(index: int) -> tuple[int, str]:
+        async with semaphore:
+            try:
+                return index, await fetches[index]()
+            except Exception as e:
+                return index, f"Error: {e}"
+
+    reports = [""] * len(fetches)
+    tasks = [asyncio.create_task(run(i)) for i in range(len(fetches))]
+    try:
+        for done, next_report in enumerate(asyncio.as_completed(tasks), 1):
+            index, reports[index] = await next_report
+            if ctx is not None:
+                await ctx.info(f"{labels[index]}:\n{reports[index]}")
+                await ctx.report_progress(done, len(fetches), f"{labels[index]} done")
+    finally:
+        for task in tasks:
+            task.cancel()
+    return "\n\n".join(f"=== {label} ===\n{report}" for label, report in zip(labels, reports))
+
+@mcp.tool()
+@METRICS.tool
+async def get_alerts_many(states: list[str], ctx: Context | None = None) -> str:
+    """Get weather alerts for several US states at once.
+
+    Args:
+        states: Two-letter US state codes (e.g. ["CA", "NY"])
+    """
+    if len(states) > MAX_BATCH_SIZE:
+        return f"Too many states: at most {MAX_BATCH_SIZE} per call."
+    states = [state.strip().upper() for state in states]
+    return await run_batch(states, [functools.partial(alerts_for_state, state) for state in states], ctx)
+
+@mcp.tool()
+@METRICS.tool
+async def get_forecasts(locations: list[dict[str, float]], ctx: Context | None = None) -> str:
+    """Get weather forecasts for several locations at once.
+
+    Args:
+        locations: Locations as {"latitude": ..., "longitude": ...} objects
+    """
+    if len(locations) > MAX_BATCH_SIZE:
+        return f"Too many locations: at most {MAX_BATCH_SIZE} per call."
+    labels = []
+    fetches = []
+    for location in locations:
+        latitude, longitude = location.get("latitude"), location.get("longitude")
+        labels.append(f"{latitude},{longitude}")
+        if latitude is None or longitude is None:
+            fetches.append(functools.partial(_invalid_location, location))
+        else:
+            fetches.append(functools.partial(forecast_for_location, latitude, longitude))
+    return await run_batch(labels, fetches, ctx)
+
+async def _invalid_location(location: dict) -> str:
+    raise ValueError(f"location needs latitude and longitude: {location}")
+
+@mcp.resource("metrics://summary")
+def get_metrics_summary() -> str:
+    """Call counts, errors, latency and response sizes for each tool, and NWS cache and coalescing counters."""
+    parts = [METRICS.render_text(), GRID.render_text(), NWS.flights.render_text()]
+    if NWS.rate_limit is not None:
+        parts.append(NWS.rate_limit.render_text())
+    if NWS.cache is not None:
+        parts.append(NWS.cache.render_text())
+    return "\n".join(parts)
+
+@mcp.resource("metrics://prometheus", mime_type="text/plain; version=0.0.4")
+def get_metrics_prometheus() -> str:
+    """Tool metrics in the Prometheus text exposition format."""
+    text = (METRICS.render_prometheus() + GRID.render_prometheus(METRICS.server)
+            + NWS.flights.render_prometheus(METRICS.server))
+    if NWS.rate_limit is not None:
+        text += NWS.rate_limit.render_prometheus(METRICS.server)
+    if NWS.cache is not None:
+        text += NWS.cache.render_prometheus(METRICS.server)
+    return text
+
 if __name__ == "__main__":
     # Initialize and run the server
     mcp.run(transport='stdio')